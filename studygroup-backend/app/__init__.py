@@ -1,12 +1,31 @@
 from flask import Flask, send_from_directory
 from flask_cors import CORS  # 如果还没安装，运行: pip install flask-cors
-from app.config import FLASK_CONFIG, UPLOAD_CONFIG
+from app.config import FLASK_CONFIG, UPLOAD_CONFIG, SERVER_CONFIG
+from app.utils.db_utils import init_request_db
+from app.utils.sql_metrics import init_sql_metrics
+from app.utils.metrics_utils import init_metrics
+from app.utils.json_utils import FastJSONProvider
+from app.commands import register_commands
 import os
 
 # 初始化Flask应用
 app = Flask(__name__, static_folder='static', template_folder='templates')
 # 加载配置
 app.config.update(FLASK_CONFIG)
+# JSON序列化（orjson可用时启用；datetime/Decimal 统一按前端约定格式输出）
+app.json = FastJSONProvider(app)
+
+# SQL计时与 Server-Timing 响应头（先注册，请求耗时包含事务提交）
+init_sql_metrics(app)
+
+# 运维指标：请求耗时/处理中请求数/响应code，GET /metrics 输出 Prometheus 格式
+init_metrics(app)
+
+# 请求级数据库事务（一次请求一条连接，响应前统一提交）
+init_request_db(app)
+
+# 运维命令（统计对账等）
+register_commands(app)
 
 # 启用CORS（允许跨域请求）
 CORS(app, resources={r"/api/*": {"origins": "*"}})
@@ -30,6 +49,12 @@ app.register_blueprint(group_blueprint, url_prefix='/api/group')
 app.register_blueprint(task_blueprint, url_prefix='/api/task')
 app.register_blueprint(file_blueprint, url_prefix='/api/file')
 
+# 成员统计定期对账（STATS_CONFIG 中配置间隔，默认关闭）
+# pre-fork 部署时主进程不启动线程（fork 时其他线程持有的锁会被子进程继承），由各 worker 在 post_fork 中启动
+from app.utils.stats_utils import start_stats_reconciler
+if not SERVER_CONFIG["PREFORK"]:
+    start_stats_reconciler()
+
 
 # 注册前端页面路由（直接访问HTML页面）
 @app.route('/')
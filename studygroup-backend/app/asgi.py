@@ -0,0 +1,245 @@
+# ASGI 入口（uvicorn asgi:app，或 python run.py --asgi）
+# 可选依赖：pip install -r requirements-server.txt（uvicorn、starlette、anyio、aiomysql）
+# - 文件下载/预览：异步实现（app/file/async_views.py），查库走 aiomysql 连接池，文件由事件循环分块发送
+# - 其余接口（含上传）：请求体先在事件循环中异步收完，再交给线程池执行原 Flask 视图，慢速上传不占用线程
+import re
+import sys
+import time
+from tempfile import SpooledTemporaryFile
+from threading import Event
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+import anyio
+from anyio.from_thread import run as run_in_loop
+from starlette.requests import Request
+
+from app import app as flask_app
+from app.config import ASGI_CONFIG
+from app.file import async_views
+from app.utils import metrics_utils
+from app.utils.async_db import init_async_pool, close_async_pool
+
+Scope = Dict[str, Any]
+Receive = Callable[[], Awaitable[Dict[str, Any]]]
+Send = Callable[[Dict[str, Any]], Awaitable[None]]
+
+# 异步接口：(路径正则, 处理函数, 指标中的端点名)；只处理 GET/HEAD，其他方法（如 OPTIONS 预检）仍交给 Flask
+ASYNC_ROUTES = [
+    (re.compile(r'^/api/file/download/([0-9]+)$'), async_views.download_file, 'file.download_file'),
+    (re.compile(r'^/api/file/preview/([0-9]+)$'), async_views.preview_file, 'file.preview_file'),
+]
+
+class WSGIBridge:
+    """
+    在 ASGI 服务器上运行 Flask（WSGI）应用：
+    - 请求体在事件循环中读完，超过 BODY_SPOOL_KB 写入临时文件；超过 MAX_CONTENT_LENGTH 时不再读取，由 Flask 返回413
+    - 视图在线程池中执行（同时最多 WSGI_THREADS 个），响应体逐块交回事件循环发送
+    - 客户端断开后停止迭代流式响应（如事件推送），释放线程
+    """
+
+    def __init__(self, wsgi_app: Callable, max_body: Optional[int], threads: int, spool_size: int):
+        self.wsgi_app = wsgi_app
+        self.max_body = max_body
+        self.spool_size = spool_size
+        self.limiter = anyio.CapacityLimiter(threads)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        with SpooledTemporaryFile(max_size=self.spool_size) as body:
+            content_length = await self._receive_body(scope, receive, body)
+            if content_length is None:
+                return  # 客户端在发送请求体时断开
+            body.seek(0)
+            environ = build_environ(scope, body, content_length)
+            disconnected = Event()
+            async with anyio.create_task_group() as tg:
+                tg.start_soon(self._watch_disconnect, receive, disconnected)
+                try:
+                    await anyio.to_thread.run_sync(self._run, environ, send, disconnected, limiter=self.limiter)
+                finally:
+                    tg.cancel_scope.cancel()
+
+    async def _receive_body(self, scope: Scope, receive: Receive, body: SpooledTemporaryFile) -> Optional[int]:
+        declared = _header(scope, b'content-length')
+        if declared is not None and declared.isdigit() and self.max_body is not None and int(declared) > self.max_body:
+            return int(declared)
+        received = 0
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                return None
+            chunk = message.get('body', b'')
+            if chunk:
+                received += len(chunk)
+                if self.max_body is not None and received > self.max_body:
+                    return received
+                body.write(chunk)
+            if not message.get('more_body', False):
+                return received
+
+    @staticmethod
+    async def _watch_disconnect(receive: Receive, disconnected: Event) -> None:
+        while (await receive())['type'] != 'http.disconnect':
+            pass
+        disconnected.set()
+
+    def _run(self, environ: Dict[str, Any], send: Send, disconnected: Event) -> None:
+        """在工作线程中执行：调用 WSGI 应用，并把响应头/响应体逐块交给事件循环发送"""
+        response_start: Dict[str, Any] = {}
+
+        def start_response(status: str, headers: Any, exc_info: Any = None) -> Callable[[bytes], None]:
+            response_start.update(
+                type='http.response.start',
+                status=int(status.split(' ', 1)[0]),
+                headers=[(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in headers]
+            )
+            return lambda data: None  # 不支持旧式 write()，Flask 不使用
+
+        result = self.wsgi_app(environ, start_response)
+        started = False
+        try:
+            for chunk in result:
+                if disconnected.is_set():
+                    return
+                if not chunk:
+                    continue
+                if not started:
+                    run_in_loop(send, response_start)
+                    started = True
+                run_in_loop(send, {'type': 'http.response.body', 'body': chunk, 'more_body': True})
+            if not started:
+                run_in_loop(send, response_start)
+            run_in_loop(send, {'type': 'http.response.body', 'body': b'', 'more_body': False})
+        finally:
+            close = getattr(result, 'close', None)
+            if close:
+                close()
+
+def _header(scope: Scope, name: bytes) -> Optional[str]:
+    for key, value in scope['headers']:
+        if key == name:
+            return value.decode('latin-1')
+    return None
+
+def build_environ(scope: Scope, body: Any, content_length: int) -> Dict[str, Any]:
+    """按 PEP 3333 由 ASGI scope 构造 WSGI environ（路径与查询串按 latin-1 传入，与 WSGI 服务器一致）"""
+    root_path = scope.get('root_path', '')
+    path = scope['path']
+    if root_path and path.startswith(root_path):
+        path = path[len(root_path):]
+    server = scope.get('server') or ('localhost', 80)
+    client = scope.get('client') or ('', 0)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': root_path.encode('utf-8').decode('latin-1'),
+        'PATH_INFO': path.encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope['query_string'].decode('latin-1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1]),
+        'SERVER_PROTOCOL': f"HTTP/{scope['http_version']}",
+        'REMOTE_ADDR': client[0],
+        'REMOTE_PORT': str(client[1]),
+        'CONTENT_LENGTH': str(content_length),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': body,
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    for name, value in scope['headers']:
+        key = name.decode('latin-1').upper().replace('-', '_')
+        if key in ('CONTENT_LENGTH', 'TRANSFER_ENCODING'):
+            continue
+        if key != 'CONTENT_TYPE':
+            key = 'HTTP_' + key
+        value = value.decode('latin-1')
+        environ[key] = f"{environ[key]},{value}" if key in environ else value
+    return environ
+
+class AsyncApp:
+    """ASGI 应用：命中 ASYNC_ROUTES 的请求异步处理，其余交给 Flask；lifespan 中创建/关闭异步连接池"""
+
+    def __init__(self, bridge: WSGIBridge):
+        self.bridge = bridge
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+            return
+        if scope['type'] != 'http':
+            return  # 不提供 websocket
+        route = self._match(scope)
+        if route is None:
+            await self.bridge(scope, receive, send)
+            return
+        handler, endpoint, file_id = route
+        await self._handle(handler, endpoint, file_id, scope, receive, send)
+
+    @staticmethod
+    def _match(scope: Scope) -> Optional[Tuple[Callable, str, int]]:
+        if scope['method'] not in ('GET', 'HEAD'):
+            return None
+        for pattern, handler, endpoint in ASYNC_ROUTES:
+            match = pattern.match(scope['path'])
+            if match:
+                return handler, endpoint, int(match.group(1))
+        return None
+
+    async def _handle(self, handler: Callable, endpoint: str, file_id: int,
+                      scope: Scope, receive: Receive, send: Send) -> None:
+        """执行异步接口：补充CORS头（与 flask-cors 对 /api/* 的配置一致），并记录与 Flask 接口相同的指标"""
+        request = Request(scope, receive)
+        response = await handler(request, file_id)
+        response.headers['Access-Control-Allow-Origin'] = '*'
+        if not metrics_utils.ENABLED:
+            await response(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        state = {'status': 500, 'code': '', 'sent': 0}
+        is_json = response.media_type == 'application/json'
+
+        async def observed_send(message: Dict[str, Any]) -> None:
+            if message['type'] == 'http.response.start':
+                state['status'] = message['status']
+            elif message['type'] == 'http.response.body':
+                chunk = message.get('body', b'')
+                if is_json and not state['sent']:
+                    state['code'] = metrics_utils.json_code_from_body(chunk)
+                state['sent'] += len(chunk)
+            await send(message)
+
+        metrics_utils.REQUESTS_IN_FLIGHT.labels('file').inc()
+        try:
+            await response(scope, receive, observed_send)
+        finally:
+            metrics_utils.REQUESTS_IN_FLIGHT.labels('file').dec()
+            metrics_utils.observe_request('file', endpoint, scope['method'], state['status'], state['code'],
+                                          time.perf_counter() - started)
+            if not is_json:
+                metrics_utils.observe_download(state['sent'], endpoint)
+
+    @staticmethod
+    async def _lifespan(receive: Receive, send: Send) -> None:
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                try:
+                    await init_async_pool()
+                except Exception as e:
+                    print(f"异步连接池初始化失败：{str(e)}")
+                    await send({'type': 'lifespan.startup.failed', 'message': str(e)})
+                    return
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await close_async_pool()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+application = AsyncApp(WSGIBridge(
+    flask_app,
+    max_body=flask_app.config.get('MAX_CONTENT_LENGTH'),
+    threads=ASGI_CONFIG["WSGI_THREADS"],
+    spool_size=ASGI_CONFIG["BODY_SPOOL_KB"] * 1024
+))
@@ -0,0 +1,90 @@
+import click
+from flask import Flask
+
+def register_commands(app: Flask) -> None:
+    """注册运维命令（flask --app run <命令>）"""
+
+    @app.cli.command('reconcile-stats')
+    @click.option('--group-id', type=int, default=None, help='只对账指定小组（默认全部）')
+    @click.option('--dry-run', is_flag=True, help='只报告偏差，不修正')
+    def reconcile_stats(group_id, dry_run):
+        """从 sg_task/sg_file 重新计算成员统计并修正 sg_member_stats 的偏差"""
+        from app.utils.stats_utils import reconcile_member_stats
+        report = reconcile_member_stats(group_id=group_id, fix=not dry_run)
+        if report is None:
+            raise click.ClickException("对账查询失败")
+        for item in report['drifted']:
+            click.echo(f"用户{item['user_id']} 小组{item['group_id']}：记录={item['stored']} 实际={item['expected']}")
+        click.echo(f"检查{report['checked']}条，偏差{len(report['drifted'])}条，已修正{report['fixed']}条")
+
+    @app.cli.command('gc-uploads')
+    @click.option('--ttl', type=float, default=None, help='清理超过该秒数无活动的会话（默认 CHUNK_UPLOAD_CONFIG["SESSION_TTL"]）')
+    def gc_uploads(ttl):
+        """清理分片上传暂存目录中被放弃的上传会话"""
+        from app.utils.upload_utils import gc_upload_sessions
+        click.echo(f"已清理过期上传会话{gc_upload_sessions(ttl)}个")
+
+    @app.cli.command('reindex-files')
+    @click.option('--group-id', type=int, default=None, help='只重建指定小组（默认全部）')
+    def reindex_files(group_id):
+        """重建文件搜索索引（首次启用搜索或索引任务丢失后执行）"""
+        from app.utils.db_utils import query_all
+        from app.utils.file_utils import resolve_file_path
+        from app.utils.search_utils import index_file
+        sql = "SELECT * FROM sg_file"
+        params = ()
+        if group_id is not None:
+            sql += " WHERE group_id = %s"
+            params = (group_id,)
+        # 元数据一次取出（正文提取较慢，不在逐行处理期间占用流式游标）
+        file_list = query_all(sql + " ORDER BY file_id", params)
+        if file_list is None:
+            raise click.ClickException("文件查询失败")
+        failed = 0
+        for file_info in file_list:
+            if not index_file(file_info['file_id'], file_info['group_id'], file_info['original_name'], resolve_file_path(file_info)):
+                failed += 1
+        click.echo(f"已索引{len(file_list) - failed}个文件，失败{failed}个")
+
+    @app.cli.command('gc-blobs')
+    @click.option('--dry-run', is_flag=True, help='只统计，不删除')
+    def gc_blobs(dry_run):
+        """回收内容寻址存储中已无 sg_file 引用的文件内容"""
+        from app.utils.file_utils import gc_blobs as run_gc_blobs
+        report = run_gc_blobs(dry_run=dry_run)
+        click.echo(f"检查{report['checked']}个，{'可回收' if dry_run else '已回收'}{report['removed']}个")
+
+    @app.cli.command('prune-changes')
+    @click.option('--days', type=int, default=None, help='保留最近多少天的变更（默认 CHANGES_CONFIG["RETENTION_DAYS"]）')
+    def prune_changes(days):
+        """清理过期的增量同步变更记录（游标早于清理点的客户端会收到 reset 并全量刷新）"""
+        from app.utils.change_utils import prune_changes as run_prune_changes
+        deleted = run_prune_changes(days)
+        if deleted is None:
+            raise click.ClickException("变更记录清理失败")
+        click.echo(f"已清理变更记录{deleted}条")
+
+    @app.cli.command('rebuild-progress')
+    @click.option('--group-id', type=int, default=None, help='只重建指定小组（默认全部）')
+    def rebuild_progress(group_id):
+        """从 sg_task 重新计算 sg_group_progress（回填已有小组或修正偏差）"""
+        from app.utils.progress_utils import rebuild_group_progress
+        if not rebuild_group_progress(group_id):
+            raise click.ClickException("进度计数重建失败")
+        click.echo("进度计数已重建" + (f"（小组{group_id}）" if group_id else "（全部小组）"))
+
+    @app.cli.command('sql-stats')
+    @click.option('--top', type=int, default=20, help='显示前多少条')
+    @click.option('--order-by', type=click.Choice(['total_ms', 'count', 'avg_ms', 'max_ms', 'rows']), default='total_ms')
+    @click.argument('path')
+    def sql_stats(top, order_by, path):
+        """在本进程内请求 PATH（如 /api/task/group/1?page_size=50），按SQL指纹汇总其执行次数与耗时（需 SQL_METRICS_MODE=full）"""
+        from app.utils import sql_metrics
+        if sql_metrics.MODE != 'full':
+            raise click.ClickException("请设置环境变量 SQL_METRICS_MODE=full 后重试")
+        sql_metrics.reset_sql_stats()
+        response = app.test_client().get(path)
+        click.echo(f"GET {path} -> {response.status_code}  Server-Timing: {response.headers.get('Server-Timing', '-')}")
+        for item in sql_metrics.get_sql_stats(top, order_by):
+            click.echo(f"{item['count']:>6} 次  合计{item['total_ms']:>10.2f}ms  平均{item['avg_ms']:>8.2f}ms  "
+                       f"最大{item['max_ms']:>8.2f}ms  行数{item['rows']:>8}  {item['fingerprint'][:160]}")
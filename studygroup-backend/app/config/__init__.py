@@ -10,16 +10,111 @@ MYSQL_CONFIG = {
     "port": int(os.getenv("MYSQL_PORT", 3306)),
     "user": os.getenv("MYSQL_USER", "root"),
     "password": os.getenv("MYSQL_PASSWORD", ""),
-    "db": "study_group_hub",
+    "db": os.getenv("MYSQL_DATABASE", "study_group_hub"),
     "charset": "utf8mb4"
 }
 
+# 数据库连接池配置（所有 query_one/query_all/execute_sql 共用）
+DB_POOL_CONFIG = {
+    "MIN_SIZE": int(os.getenv("DB_POOL_MIN_SIZE", 2)),             # 常驻空闲连接数
+    "MAX_SIZE": int(os.getenv("DB_POOL_MAX_SIZE", 20)),            # 最大连接数（含借出）
+    "CHECKOUT_TIMEOUT": float(os.getenv("DB_POOL_TIMEOUT", 10)),   # 连接耗尽时的最长等待秒数
+    "PING_INTERVAL": float(os.getenv("DB_POOL_PING_INTERVAL", 30)),  # 空闲超过该秒数的连接借出前先ping（0=每次都ping）
+    "IDLE_TIMEOUT": float(os.getenv("DB_POOL_IDLE_TIMEOUT", 300)),   # 超过MIN_SIZE的空闲连接最长保留秒数
+    "MAX_LIFETIME": float(os.getenv("DB_POOL_MAX_LIFETIME", 3600)),  # 连接最长存活秒数（需小于MySQL wait_timeout）
+    "CONNECT_TIMEOUT": int(os.getenv("DB_CONNECT_TIMEOUT", 5))
+}
+
+# 请求级事务配置（一次请求复用一条连接，响应前统一提交，失败整体回滚）
+DB_REQUEST_CONFIG = {
+    "ENABLED": os.getenv("DB_REQUEST_TRANSACTION", "True") == "True"
+}
+
+# SQL执行统计配置（每条SQL计时，慢查询日志，响应头 Server-Timing 附带请求内SQL条数与耗时）
+SQL_METRICS_CONFIG = {
+    # off：关闭；basic：只计时与慢查询日志，开销可忽略，适合生产常开；full：另按SQL指纹累计（flask sql-stats 查看）
+    "MODE": os.getenv("SQL_METRICS_MODE", "basic"),
+    "SLOW_MS": float(os.getenv("SQL_SLOW_MS", 200)),         # 超过该毫秒数的SQL写入慢查询日志
+    "SLOW_LOG_PATH": os.getenv("SQL_SLOW_LOG_PATH", ""),      # 慢查询日志文件（JSON Lines），为空时输出到标准输出
+    "SERVER_TIMING": os.getenv("SQL_SERVER_TIMING", "True") == "True",  # 是否输出 Server-Timing 响应头
+    "MAX_FINGERPRINTS": 500                                    # full 模式最多保留的指纹数，超出的计入 (other)
+}
+
+# 运维指标配置（/metrics 输出 Prometheus 文本格式；安装 prometheus-client 并设置 PROMETHEUS_MULTIPROC_DIR 后汇总多进程）
+METRICS_CONFIG = {
+    "ENABLED": os.getenv("METRICS_ENABLED", "True") == "True",
+    "TOKEN": os.getenv("METRICS_TOKEN", ""),                               # 非空时抓取需带 Authorization: Bearer <TOKEN>
+    "SNAPSHOT_INTERVAL": float(os.getenv("METRICS_SNAPSHOT_INTERVAL", 5))  # 连接池/缓存状态快照的最短刷新间隔（秒）
+}
+
 # 文件上传配置
 UPLOAD_CONFIG = {
-    "BASE_PATH": os.path.join(BASE_DIR, "static/uploads"),
+    "BASE_PATH": os.getenv("UPLOAD_BASE_PATH", os.path.join(BASE_DIR, "static/uploads")),
     "ALLOWED_TYPES": [".docx", ".pdf", ".ppt", ".pptx", ".xlsx", ".xls", ".jpg", ".png", ".txt"],
     "MAX_SIZE_KB": 1024 * 5,  # 5MB
-    "STORE_NAME_RULE": "{group_id}_{timestamp}{suffix}"  # 存储文件名规则
+    "STORE_NAME_RULE": "{group_id}_{timestamp}_{token}{suffix}",  # 存储文件名规则（token 为随机串，同一秒内的上传不重名）
+    # 内容寻址存储：按SHA-256存放文件内容，相同内容只存一份（需先执行 migrations/002_file_content_hash.sql）
+    "DEDUP_ENABLED": os.getenv("UPLOAD_DEDUP_ENABLED", "False") == "True",
+    "BLOB_PATH": os.getenv("UPLOAD_BLOB_PATH", os.path.join(BASE_DIR, "static/uploads/.blobs")),
+    "BLOB_GRACE_SECONDS": float(os.getenv("UPLOAD_BLOB_GRACE_SECONDS", 600)),  # 近期被写入/复用的内容不删除（防止与并发上传竞争）
+    "DOWNLOAD_CACHE_MAX_AGE": int(os.getenv("DOWNLOAD_CACHE_MAX_AGE", 0)),  # 下载/预览的浏览器缓存秒数（0=每次带ETag校验，未变化返回304）
+    # 下载/预览的发送方式：python=由Flask读文件发送；x-accel=交给nginx（X-Accel-Redirect）；x-sendfile=交给Apache/lighttpd（X-Sendfile）
+    "DELIVERY_MODE": os.getenv("FILE_DELIVERY_MODE", "python"),
+    "ACCEL_FILES_PREFIX": os.getenv("ACCEL_FILES_PREFIX", "/_protected/files/"),  # nginx internal location，alias 到 BASE_PATH
+    "ACCEL_BLOBS_PREFIX": os.getenv("ACCEL_BLOBS_PREFIX", "/_protected/blobs/")   # nginx internal location，alias 到 BLOB_PATH
+}
+
+# 分片上传配置（init -> 上传分片（可并行、可断点续传）-> commit 合并入库）
+CHUNK_UPLOAD_CONFIG = {
+    "STAGING_PATH": os.path.join(UPLOAD_CONFIG["BASE_PATH"], ".staging"),      # 分片暂存目录（与正式目录同盘，合并后直接rename）
+    "MAX_SIZE_KB": int(os.getenv("CHUNK_UPLOAD_MAX_SIZE_KB", 1024 * 100)),     # 分片上传的单文件上限（100MB）
+    "CHUNK_SIZE_KB": int(os.getenv("CHUNK_UPLOAD_CHUNK_SIZE_KB", 1024 * 2)),   # 默认分片大小（2MB）
+    "MAX_CHUNK_SIZE_KB": int(os.getenv("CHUNK_UPLOAD_MAX_CHUNK_SIZE_KB", 1024 * 8)),  # 客户端可指定的最大分片（需小于 MAX_CONTENT_LENGTH）
+    "SESSION_TTL": float(os.getenv("CHUNK_UPLOAD_SESSION_TTL", 24 * 3600)),    # 超过该秒数无活动的上传会话被清理
+    "GC_INTERVAL": float(os.getenv("CHUNK_UPLOAD_GC_INTERVAL", 600))           # 两次自动清理的最小间隔（秒）
+}
+
+# 预览生成配置（上传后由后台线程池生成缩略图/文本摘录，预览接口 variant 参数读取）
+RENDITION_CONFIG = {
+    "ENABLED": os.getenv("RENDITION_ENABLED", "True") == "True",
+    "WORKERS": int(os.getenv("RENDITION_WORKERS", 2)),         # 后台生成线程数
+    "QUEUE_SIZE": int(os.getenv("RENDITION_QUEUE_SIZE", 200)),  # 排队+执行中的任务上限，超出时丢弃（访问时再补生成）
+    "THUMB_SIZE": int(os.getenv("RENDITION_THUMB_SIZE", 320)),  # 缩略图最长边（像素）
+    "TEXT_MAX_CHARS": int(os.getenv("RENDITION_TEXT_MAX_CHARS", 5000))  # 文本摘录最大字符数
+}
+
+# 文件搜索配置（sg_file_term 倒排索引：文件名 + txt/docx/pptx/xlsx/pdf 正文）
+SEARCH_CONFIG = {
+    "ENABLED": os.getenv("SEARCH_ENABLED", "False") == "True",  # 需先执行 migrations/003_file_search_index.sql，再用 flask reindex-files 补建已有文件
+    "QUEUE_SIZE": int(os.getenv("SEARCH_QUEUE_SIZE", 1000)),     # 后台索引任务排队上限
+    "MAX_TEXT_CHARS": int(os.getenv("SEARCH_MAX_TEXT_CHARS", 200000)),  # 每个文件最多索引的正文字符数
+    "MAX_TERMS": int(os.getenv("SEARCH_MAX_TERMS", 20000)),      # 每个文件最多保留的词条数
+    "MAX_QUERY_TERMS": 16,
+    "DEFAULT_LIMIT": 20,
+    "MAX_LIMIT": 100
+}
+
+# 增量同步配置（sg_change_log：GET /api/group/<group_id>/changes?since=<cursor>）
+CHANGES_CONFIG = {
+    "ENABLED": os.getenv("CHANGES_ENABLED", "False") == "True",  # 需先执行 migrations/004_group_change_log.sql；未启用时 /changes 始终返回 reset=true
+    "DEFAULT_LIMIT": 500,   # 每次最多返回的变更记录数（has_more 为真时客户端继续拉取）
+    "MAX_LIMIT": 2000,
+    "RETENTION_DAYS": int(os.getenv("CHANGES_RETENTION_DAYS", 30))  # flask prune-changes 默认保留天数
+}
+
+# 小组事件推送配置（SSE：/api/group/<group_id>/events）
+EVENTS_CONFIG = {
+    # memory：进程内发布/订阅，仅适用于单进程部署；多进程/多机部署使用 redis（需 pip install redis）
+    "BACKEND": os.getenv("EVENTS_BACKEND", "memory"),
+    "REDIS_URL": os.getenv("EVENTS_REDIS_URL", "redis://localhost:6379/0"),
+    "REPLAY_SIZE": int(os.getenv("EVENTS_REPLAY_SIZE", 200)),   # 每个小组保留的最近事件数（断线重连时重放）
+    "QUEUE_SIZE": int(os.getenv("EVENTS_QUEUE_SIZE", 100)),     # 每个连接未发送事件上限，超出时断开让客户端重连
+    "HEARTBEAT_INTERVAL": float(os.getenv("EVENTS_HEARTBEAT_INTERVAL", 15)),  # 空闲时心跳间隔（秒），需小于代理的读超时
+    "MAX_STREAM_SECONDS": float(os.getenv("EVENTS_MAX_STREAM_SECONDS", 300)),  # 单个连接最长保持时间，到期后客户端自动重连
+    "RETRY_MS": int(os.getenv("EVENTS_RETRY_MS", 3000)),        # 客户端断线后的重连等待（毫秒）
+    # 每个进程同时保持的连接上限（0 为不限）；每个连接占用一个线程，gunicorn.conf.py 按 SERVER_EVENT_THREADS 设置
+    "MAX_STREAMS": int(os.getenv("EVENTS_MAX_STREAMS", 0)),
+    "BUSY_RETRY_MS": int(os.getenv("EVENTS_BUSY_RETRY_MS", 30000))  # 连接数已满时让客户端等待多久再重连（毫秒）
 }
 
 # Flask应用配置
@@ -30,10 +125,63 @@ FLASK_CONFIG = {
     "JSON_AS_ASCII": False  # 支持中文JSON响应
 }
 
+# 部署方式配置（gunicorn.conf.py 会设置 SERVER_PREFORK=True）
+SERVER_CONFIG = {
+    "PREFORK": os.getenv("SERVER_PREFORK", "False") == "True"  # pre-fork 部署：主进程只预加载应用，后台线程由各 worker 在 fork 后启动
+}
+
+# ASGI 模式配置（python run.py --asgi；下载/预览为异步接口，其余接口在线程池中执行原Flask视图）
+ASGI_CONFIG = {
+    "DB_POOL_MIN_SIZE": int(os.getenv("ASGI_DB_POOL_MIN_SIZE", 2)),    # 异步连接池常驻连接数
+    "DB_POOL_MAX_SIZE": int(os.getenv("ASGI_DB_POOL_MAX_SIZE", 20)),   # 异步连接池最大连接数（与同步连接池分别计数）
+    "WSGI_THREADS": int(os.getenv("ASGI_WSGI_THREADS", 40)),          # 同时执行Flask视图的线程数上限
+    "BODY_SPOOL_KB": int(os.getenv("ASGI_BODY_SPOOL_KB", 1024)),      # 请求体超过该大小时暂存到临时文件
+    "BIND": os.getenv("ASGI_BIND", "127.0.0.1:5000"),
+    "WORKERS": int(os.getenv("ASGI_WORKERS", 1))                       # uvicorn 进程数
+}
+
 # 权限配置（可扩展角色）
 PERMISSION_CONFIG = {
     "REQUIRE_MEMBER": ["file_delete", "task_update", "group_member_query"],
-    "REQUIRE_LEADER": ["group_delete", "task_assign", "member_remove"]
+    "REQUIRE_LEADER": ["group_delete", "task_assign", "member_remove"],
+    # sg_user_group.permission_level 取值：达到 admin 级别可管理他人任务
+    "group": {"member": 1, "admin": 2}
+}
+
+# 进程内缓存配置（多进程部署时各进程独立缓存，跨进程一致性由TTL兜底）
+CACHE_CONFIG = {
+    "MEMBER_ENABLED": os.getenv("MEMBER_CACHE_ENABLED", "True") == "True",  # 成员身份/权限缓存开关
+    "MEMBER_MAX_ENTRIES": int(os.getenv("MEMBER_CACHE_MAX_ENTRIES", 10000)),
+    "MEMBER_TTL": float(os.getenv("MEMBER_CACHE_TTL", 60))  # 秒
+}
+
+# 小组进度计数配置（sg_group_progress 由任务写入在同一事务内增量维护，需先执行 migrations/005_group_progress.sql）
+PROGRESS_CONFIG = {
+    "ENABLED": os.getenv("PROGRESS_ENABLED", "False") == "True",  # 未启用时不维护计数行，进度按 sg_task 实时 COUNT
+    "CACHE_ENABLED": os.getenv("PROGRESS_CACHE_ENABLED", "True") == "True",
+    "CACHE_MAX_ENTRIES": int(os.getenv("PROGRESS_CACHE_MAX_ENTRIES", 10000)),
+    "CACHE_TTL": float(os.getenv("PROGRESS_CACHE_TTL", 30))  # 秒（多进程部署时其他进程的缓存最多滞后该时间）
+}
+
+# 批量任务接口配置（/api/task/bulk-create、/api/task/bulk-status）
+TASK_BULK_CONFIG = {
+    "MAX_ITEMS": int(os.getenv("TASK_BULK_MAX_ITEMS", 200))  # 单次请求最多条数（多行INSERT保持在一条语句内）
+}
+
+# 列表分页配置（文件/任务列表传 page_size 或 cursor 时启用游标分页）
+PAGINATION_CONFIG = {
+    "DEFAULT_PAGE_SIZE": int(os.getenv("PAGE_SIZE_DEFAULT", 50)),
+    "MAX_PAGE_SIZE": int(os.getenv("PAGE_SIZE_MAX", 200))
+}
+
+# 成员统计配置（sg_member_stats 按事件增量维护，定期/按需与源表对账）
+STATS_CONFIG = {
+    "RECONCILE_INTERVAL": float(os.getenv("STATS_RECONCILE_INTERVAL", 0)),  # 秒，0=不启动定期对账（可用 flask reconcile-stats 手动执行）
+    "WRITE_BEHIND": os.getenv("STATS_WRITE_BEHIND", "True") == "True",  # 统计变更交给后台线程合并批量写入，不占用请求耗时
+    "FLUSH_INTERVAL": float(os.getenv("STATS_FLUSH_INTERVAL", 1.0)),   # 后台写入间隔（秒）
+    "MAX_BATCH": int(os.getenv("STATS_MAX_BATCH", 500)),               # 积压达到该行数时立即写入
+    "MAX_RETRIES": int(os.getenv("STATS_MAX_RETRIES", 5)),             # 同一增量写入失败的重试次数，超过后丢弃（由对账修复）
+    "MAX_BACKOFF": float(os.getenv("STATS_MAX_BACKOFF", 60))           # 连续写入失败时的最长重试间隔（秒）
 }
 
 # 前端配置（供前端引用，保持前后端一致）
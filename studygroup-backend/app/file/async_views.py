@@ -0,0 +1,140 @@
+# ASGI 模式下的异步文件接口（由 app/asgi.py 分发；校验规则、返回格式与 views.py 中同名接口一致）
+# 权限查询走异步连接池，文件内容由事件循环分块发送，慢速下载的客户端不占用线程
+import os
+import unicodedata
+from typing import Any, Dict, Optional, Tuple
+from urllib.parse import quote
+
+import anyio
+from starlette.requests import Request
+from starlette.responses import FileResponse, Response
+from werkzeug.http import dump_options_header, parse_date, parse_etags, quote_etag
+
+from app import app as flask_app
+from app.config import UPLOAD_CONFIG
+from app.file.views import PREVIEW_MIME_TYPES, INLINE_PREVIEW_TYPES
+from app.utils.async_db import async_query_one
+from app.utils.file_utils import resolve_file_path, accel_redirect_uri, file_etag
+from app.utils.permission_utils import FILE_WITH_MEMBER_SQL
+from app.utils.rendition_utils import get_rendition, VARIANTS, VARIANT_MIMETYPES
+
+def json_response(payload: Dict[str, Any]) -> Response:
+    """与 jsonify 相同的序列化（orjson/日期格式），HTTP状态码固定200，错误放在 code 中"""
+    return Response(flask_app.json.dumps(payload), media_type='application/json')
+
+def _parse_user_id(request: Request) -> Tuple[Optional[int], Optional[Dict[str, Any]]]:
+    request_user_id = request.query_params.get('user_id')
+    if not request_user_id:
+        return None, {"code": 401, "msg": "请传入user_id"}
+    try:
+        return int(request_user_id), None
+    except ValueError:
+        return None, {"code": 400, "msg": "user_id必须为整数"}
+
+async def _load_file(file_id: int, user_id: int, forbidden_msg: str
+                     ) -> Tuple[Optional[Dict[str, Any]], Optional[str], Optional[Dict[str, Any]]]:
+    """查询文件与成员身份并确认文件存在，返回 (文件信息, 物理路径, None) 或 (None, None, 错误响应)"""
+    file_info = await async_query_one(FILE_WITH_MEMBER_SQL, (user_id, file_id))
+    if not file_info:
+        return None, None, {"code": 404, "msg": "文件不存在"}
+    if not file_info['is_member']:
+        return None, None, {"code": 403, "msg": forbidden_msg}
+    full_path = resolve_file_path(file_info)
+    if not await anyio.to_thread.run_sync(os.path.exists, full_path):
+        return None, None, {"code": 404, "msg": "文件不存在或已被删除"}
+    return file_info, full_path, None
+
+async def download_file(request: Request, file_id: int) -> Response:
+    """文件下载（权限校验）"""
+    request_user_id, err = _parse_user_id(request)
+    if err:
+        return json_response(err)
+    file_info, full_path, err = await _load_file(file_id, request_user_id, "无权限下载，仅小组成员可下载文件")
+    if err:
+        return json_response(err)
+    try:
+        return await _send_stored_file(request, file_info, full_path, as_attachment=True,
+                                       mimetype='application/octet-stream')
+    except Exception as e:
+        return json_response({"code": 500, "msg": f"文件下载失败: {str(e)}"})
+
+async def preview_file(request: Request, file_id: int) -> Response:
+    """文件预览（权限校验）；variant=thumb/text 返回预览缓存，未生成时返回原文件"""
+    if not request.query_params.get('user_id'):
+        return json_response({"code": 401, "msg": "请传入user_id"})
+    variant = request.query_params.get('variant')
+    if variant and variant not in VARIANTS:
+        return json_response({"code": 400, "msg": f"variant可选值：{', '.join(VARIANTS)}"})
+    request_user_id, err = _parse_user_id(request)
+    if err:
+        return json_response(err)
+    file_info, full_path, err = await _load_file(file_id, request_user_id, "无权限预览")
+    if err:
+        return json_response(err)
+
+    if variant:
+        rendition = await anyio.to_thread.run_sync(get_rendition, full_path, file_info['original_name'], variant)
+        if rendition:
+            rendition_name = os.path.splitext(file_info['original_name'])[0] + VARIANTS[variant]
+            try:
+                return await _send_stored_file(
+                    request, dict(file_info, content_hash=None, original_name=rendition_name), rendition,
+                    as_attachment=False, mimetype=VARIANT_MIMETYPES[variant]
+                )
+            except Exception as e:
+                print(f"预览缓存发送失败：{str(e)}")
+
+    file_ext = os.path.splitext(file_info['original_name'])[1].lower()
+    mimetype = PREVIEW_MIME_TYPES.get(file_ext, 'application/octet-stream')
+    try:
+        return await _send_stored_file(request, file_info, full_path,
+                                       as_attachment=file_ext not in INLINE_PREVIEW_TYPES, mimetype=mimetype)
+    except Exception as e:
+        return json_response({"code": 500, "msg": f"文件预览失败: {str(e)}"})
+
+async def _send_stored_file(request: Request, file_info: Dict[str, Any], full_path: str,
+                            as_attachment: bool, mimetype: str) -> Response:
+    """
+    与 views._send_stored_file 相同的缓存语义：强ETag + Last-Modified，命中返回304，Range/If-Range 返回206
+    文件内容由 FileResponse 在线程中分块读取、在事件循环中发送
+    """
+    headers = {
+        'Cache-Control': f"private, max-age={UPLOAD_CONFIG['DOWNLOAD_CACHE_MAX_AGE']}",
+        'Content-Disposition': _content_disposition(file_info['original_name'], as_attachment)
+    }
+    if UPLOAD_CONFIG["DELIVERY_MODE"] in ('x-accel', 'x-sendfile'):
+        return _offload_stored_file(full_path, mimetype, headers)
+    stat, etag = await anyio.to_thread.run_sync(_stat_with_etag, file_info, full_path)
+    headers['ETag'] = quote_etag(etag)
+    if _is_not_modified(request, etag, stat.st_mtime):
+        return Response(status_code=304, headers=headers)
+    return FileResponse(full_path, headers=headers, media_type=mimetype, stat_result=stat)
+
+def _stat_with_etag(file_info: Dict[str, Any], full_path: str) -> Tuple[os.stat_result, str]:
+    return os.stat(full_path), file_etag(file_info, full_path)
+
+def _is_not_modified(request: Request, etag: str, mtime: float) -> bool:
+    """If-None-Match 优先（弱比较），没有时再看 If-Modified-Since（与 werkzeug 的判断一致）"""
+    if_none_match = request.headers.get('if-none-match')
+    if if_none_match:
+        return parse_etags(if_none_match).contains_weak(etag)
+    since = parse_date(request.headers.get('if-modified-since'))
+    return since is not None and int(mtime) <= since.timestamp()
+
+def _content_disposition(filename: str, as_attachment: bool) -> str:
+    """与 flask.send_file 的 Content-Disposition 相同：非ASCII文件名另带 filename*（RFC 5987）"""
+    try:
+        filename.encode('ascii')
+        names = {'filename': filename}
+    except UnicodeEncodeError:
+        simple = unicodedata.normalize('NFKD', filename).encode('ascii', 'ignore').decode('ascii')
+        names = {'filename': simple, 'filename*': f"UTF-8''{quote(filename, safe='!#$&+-.^_`|~')}"}
+    return dump_options_header('attachment' if as_attachment else 'inline', names)
+
+def _offload_stored_file(full_path: str, mimetype: str, headers: Dict[str, str]) -> Response:
+    """交给前端代理发送的空响应（文件内容、Range与协商缓存由代理处理）"""
+    if UPLOAD_CONFIG["DELIVERY_MODE"] == 'x-accel':
+        headers['X-Accel-Redirect'] = accel_redirect_uri(full_path)
+    else:
+        headers['X-Sendfile'] = os.path.abspath(full_path)
+    return Response(status_code=200, headers=headers, media_type=mimetype)
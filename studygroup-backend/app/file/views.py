@@ -1,14 +1,62 @@
-from flask import Blueprint, request, jsonify, send_from_directory, send_file
-from app.utils.db_utils import query_one, query_all, execute_sql
-from app.utils.file_utils import generate_store_name, save_uploaded_file, delete_physical_file, get_file_size_kb
-from app.config import UPLOAD_CONFIG, PERMISSION_CONFIG
-from werkzeug.utils import secure_filename
+from flask import Blueprint, request, jsonify, send_from_directory, send_file, current_app, Response
+from app.utils.db_utils import query_one, query_all, query_stream, execute_sql, on_request_commit, on_request_rollback
+from app.utils.permission_utils import require_group_member, get_file_with_member
+from app.utils.stats_utils import record_stats_delta
+from app.utils.page_utils import parse_page_params, build_select_columns, finish_page
+from app.utils.response_utils import stream_json_response
+from app.utils.archive_utils import stream_zip, unique_arcname
+from app.utils.rendition_utils import schedule_renditions, get_rendition, delete_renditions, VARIANTS, VARIANT_MIMETYPES
+from app.utils.search_utils import schedule_index, remove_file_index, search_files
+from app.utils.event_utils import emit_group_event
+from app.utils.change_utils import record_change, ENTITY_FILE, OP_DELETE
+from app.utils.metrics_utils import observe_upload, observe_download, count_download_bytes
+from app.utils.file_utils import (
+    store_file_content, discard_file_content, resolve_file_path, release_blob, delete_physical_file, get_file_size_kb,
+    accel_redirect_uri, file_etag
+)
+from app.utils.upload_utils import (
+    create_upload_session, load_upload_session, save_chunk, get_received_chunks, assemble_upload,
+    release_upload_lock, delete_upload_session, maybe_gc_upload_sessions
+)
+from app.config import UPLOAD_CONFIG, CHUNK_UPLOAD_CONFIG, PERMISSION_CONFIG, SEARCH_CONFIG
+from werkzeug.utils import secure_filename, send_file as werkzeug_send_file
+from werkzeug.exceptions import HTTPException
 from datetime import datetime
 import os
-from typing import Dict, Any
+from typing import Dict, Any, Optional
+import hashlib
 
 file_blueprint = Blueprint('file', __name__)
 
+# 文件列表可投影字段 -> SQL列
+FILE_LIST_FIELDS = {
+    'file_id': 'f.file_id',
+    'original_name': 'f.original_name',
+    'store_name': 'f.store_name',
+    'file_size': 'f.file_size',
+    'upload_time': 'f.upload_time',
+    'group_id': 'f.group_id',
+    'uploader_id': 'f.uploader_id',
+    'uploader_name': 'u.user_name'
+}
+
+# 预览接口按扩展名返回的MIME类型（其余为 application/octet-stream）；INLINE_PREVIEW_TYPES 在浏览器内直接打开，其他强制下载
+PREVIEW_MIME_TYPES = {
+    '.pdf': 'application/pdf',
+    '.doc': 'application/msword',
+    '.docx': 'application/vnd.openxmlformats-officedocument.wordprocessingml.document',
+    '.xls': 'application/vnd.ms-excel',
+    '.xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    '.ppt': 'application/vnd.ms-powerpoint',
+    '.pptx': 'application/vnd.openxmlformats-officedocument.presentationml.presentation',
+    '.jpg': 'image/jpeg',
+    '.jpeg': 'image/jpeg',
+    '.png': 'image/png',
+    '.gif': 'image/gif',
+    '.txt': 'text/plain',
+}
+INLINE_PREVIEW_TYPES = ('.pdf', '.jpg', '.jpeg', '.png', '.gif')
+
 @file_blueprint.route('/upload', methods=['POST'])
 def upload_file() -> Dict[str, Any]:
     """文件上传"""
@@ -42,125 +90,323 @@ def upload_file() -> Dict[str, Any]:
     if file_size_kb > UPLOAD_CONFIG["MAX_SIZE_KB"]:
         return jsonify({"code": 400, "msg": f"文件最大{UPLOAD_CONFIG['MAX_SIZE_KB']}KB"})
     
-    # 权限与关联数据校验
-    is_member = query_one(
-        "SELECT 1 FROM sg_user_group WHERE user_id = %s AND group_id = %s",
-        (uploader_id, group_id)
-    )
-    if not is_member:
-        return jsonify({"code": 403, "msg": "仅小组成员可上传文件"})
-    
-    group_exist = query_one("SELECT 1 FROM sg_group WHERE group_id = %s", (group_id,))
-    if not group_exist:
-        return jsonify({"code": 404, "msg": f"小组ID={group_id}不存在"})
-    
-    user_exist = query_one("SELECT 1 FROM sg_user WHERE user_id = %s", (uploader_id,))
-    if not user_exist:
-        return jsonify({"code": 404, "msg": f"上传人ID={uploader_id}不存在"})
+    # 权限与关联数据校验（小组、上传人、成员关系一次查询）
+    _, err = require_group_member(uploader_id, group_id, forbidden_msg="仅小组成员可上传文件", user_label="上传人")
+    if err:
+        return jsonify(err)
     
     # 执行上传
+    try:
+        file_id = _store_file(group_id, uploader_id, original_filename, file_size_kb, upload_file)
+    except Exception as e:
+        return jsonify({"code": 500, "msg": f"上传失败：{str(e)}"})
+    # 上传量按请求体字节数计，入库提交后才计入
+    on_request_commit(lambda: observe_upload('single', request.content_length))
+    
+    return jsonify({
+        "code": 200,
+        "msg": "上传成功",
+        "data": {"file_id": file_id, "original_name": original_filename}
+    })
+
+def _store_file(group_id: int, uploader_id: int, original_filename: str, file_size_kb: int,
+                source: Any, content_hash: Optional[str] = None) -> int:
+    """
+    保存文件内容并写入 sg_file（普通上传与分片上传共用）
+    source 为上传文件对象或分片合并后的本地路径；失败抛出异常，已保存的内容会被清理
+    启用去重时相同内容只存一份，重复上传只新增一条记录
+    """
     upload_time = datetime.now()
-    physical_file_path = None
+    stored = store_file_content(source, group_id, original_filename, content_hash)
     
     try:
-        # 生成存储文件名
-        store_name = generate_store_name(
-            group_id=group_id,
-            original_filename=original_filename,
-            rule=UPLOAD_CONFIG["STORE_NAME_RULE"]
-        )
-        
-        # 保存文件
-        physical_file_path = save_uploaded_file(
-            upload_file=upload_file,
-            base_path=UPLOAD_CONFIG["BASE_PATH"],
-            group_id=group_id,
-            store_name=store_name
-        )
-        
-        # 写入数据库
-        insert_sql = """
-            INSERT INTO sg_file (original_name, store_name, file_size, upload_time, group_id, uploader_id)
-            VALUES (%s, %s, %s, %s, %s, %s)
-        """
-        file_success, file_id = execute_sql(
-            insert_sql, (original_filename, store_name, file_size_kb, upload_time, group_id, uploader_id)
-        )
-        
+        # 写入数据库（未启用去重时不写 content_hash，兼容未执行迁移的库）
+        if stored['content_hash']:
+            insert_sql = """
+                INSERT INTO sg_file (original_name, store_name, file_size, content_hash, upload_time, group_id, uploader_id)
+                VALUES (%s, %s, %s, %s, %s, %s, %s)
+            """
+            params = (original_filename, stored['store_name'], file_size_kb, stored['content_hash'], upload_time, group_id, uploader_id)
+        else:
+            insert_sql = """
+                INSERT INTO sg_file (original_name, store_name, file_size, upload_time, group_id, uploader_id)
+                VALUES (%s, %s, %s, %s, %s, %s)
+            """
+            params = (original_filename, stored['store_name'], file_size_kb, upload_time, group_id, uploader_id)
+        file_success, file_id = execute_sql(insert_sql, params)
         if not file_success or not file_id:
             raise Exception("文件信息写入失败")
-        
-        # ⭐ 新增：更新成员统计
-        try:
-            from app.utils.stats_utils import update_stats
-            # 获取任务统计
-            task_sql = """
-                SELECT 
-                    COUNT(*) as total_tasks,
-                    SUM(CASE WHEN status = '完成' THEN 1 ELSE 0 END) as completed_tasks
-                FROM sg_task 
-                WHERE leader_id = %s AND group_id = %s
-            """
-            task_stats = query_one(task_sql, (uploader_id, group_id))
-            
-            # 获取文件统计（包括新上传的文件）
-            file_count_sql = "SELECT COUNT(*) as uploaded_files FROM sg_file WHERE uploader_id = %s AND group_id = %s"
-            file_count = query_one(file_count_sql, (uploader_id, group_id))
-            
-            if task_stats and file_count:
-                update_stats(
-                    user_id=uploader_id,
-                    group_id=group_id,
-                    total_tasks=task_stats['total_tasks'] or 0,
-                    completed_tasks=task_stats['completed_tasks'] or 0,
-                    uploaded_files=file_count['uploaded_files'] or 0
-                )
-        except Exception as e:
-            print(f"更新成员统计失败: {e}")
-            # 不中断主流程
-        
-        return jsonify({
-            "code": 200,
-            "msg": "上传成功",
-            "data": {"file_id": file_id, "original_name": original_filename}
-        })
-        
+    except Exception:
+        # 异常回滚：清理已保存的内容
+        discard_file_content(stored)
+        raise
+    
+    # 请求事务最终回滚（如提交失败）时清理已保存的内容
+    on_request_rollback(lambda: discard_file_content(stored))
+    # 提交后在后台生成缩略图/文本摘录、建立搜索索引（不占用请求耗时）
+    on_request_commit(lambda: schedule_renditions(stored['path'], original_filename))
+    on_request_commit(lambda: schedule_index(file_id, group_id, original_filename, stored['path']))
+    
+    # 更新成员统计（增量，失败不中断主流程）
+    record_stats_delta(uploader_id, group_id, uploaded_files=1)
+    record_change(group_id, ENTITY_FILE, file_id)
+    emit_group_event(group_id, 'file-uploaded', {
+        "file_id": file_id, "original_name": original_filename, "file_size": file_size_kb,
+        "uploader_id": uploader_id, "upload_time": upload_time
+    })
+    return file_id
+
+@file_blueprint.route('/upload/init', methods=['POST'])
+def init_chunk_upload() -> Dict[str, Any]:
+    """分片上传：创建上传会话（JSON：group_id, uploader_id, file_name, file_size(字节), 可选 chunk_size(字节)）"""
+    request_data = request.json or {}
+    group_id = request_data.get('group_id')
+    uploader_id = request_data.get('uploader_id')
+    original_filename = request_data.get('file_name', '').strip()
+    file_size = request_data.get('file_size')
+    chunk_size = request_data.get('chunk_size') or CHUNK_UPLOAD_CONFIG["CHUNK_SIZE_KB"] * 1024
+    
+    # 基础校验
+    if not group_id or not uploader_id or not original_filename or file_size is None:
+        return jsonify({"code": 400, "msg": "小组ID、上传人ID、文件名、文件大小不能为空"})
+    try:
+        group_id = int(group_id)
+        uploader_id = int(uploader_id)
+        file_size = int(file_size)
+        chunk_size = int(chunk_size)
+    except (TypeError, ValueError):
+        return jsonify({"code": 400, "msg": "小组ID、上传人ID、文件大小、分片大小必须为整数"})
+    
+    # 文件合法性校验
+    file_suffix = os.path.splitext(original_filename)[1].lower()
+    if file_suffix not in UPLOAD_CONFIG["ALLOWED_TYPES"]:
+        allowed_str = ", ".join(UPLOAD_CONFIG["ALLOWED_TYPES"])
+        return jsonify({"code": 400, "msg": f"支持文件类型：{allowed_str}"})
+    if file_size <= 0 or file_size > CHUNK_UPLOAD_CONFIG["MAX_SIZE_KB"] * 1024:
+        return jsonify({"code": 400, "msg": f"文件最大{CHUNK_UPLOAD_CONFIG['MAX_SIZE_KB']}KB"})
+    if chunk_size < 64 * 1024 or chunk_size > CHUNK_UPLOAD_CONFIG["MAX_CHUNK_SIZE_KB"] * 1024:
+        return jsonify({"code": 400, "msg": f"分片大小需在64-{CHUNK_UPLOAD_CONFIG['MAX_CHUNK_SIZE_KB']}KB之间"})
+    
+    # 权限与关联数据校验
+    _, err = require_group_member(uploader_id, group_id, forbidden_msg="仅小组成员可上传文件", user_label="上传人")
+    if err:
+        return jsonify(err)
+    
+    # 顺带清理无人继续的过期会话
+    maybe_gc_upload_sessions()
+    try:
+        session = create_upload_session(group_id, uploader_id, original_filename, file_size, chunk_size)
+    except OSError as e:
+        print(f"创建上传会话失败：{str(e)}")
+        return jsonify({"code": 500, "msg": "创建上传会话失败"})
+    
+    return jsonify({
+        "code": 200,
+        "msg": "上传会话已创建",
+        "data": {
+            "upload_id": session['upload_id'],
+            "chunk_size": session['chunk_size'],
+            "total_chunks": session['total_chunks']
+        }
+    })
+
+@file_blueprint.route('/upload/<upload_id>/chunk/<int:index>', methods=['PUT'])
+def upload_chunk(upload_id: str, index: int) -> Dict[str, Any]:
+    """分片上传：上传第 index 个分片（从0开始，请求体为分片原始字节；各分片可并行上传，失败可重传）"""
+    session = load_upload_session(upload_id)
+    if not session:
+        return jsonify({"code": 404, "msg": "上传会话不存在或已过期"})
+    if index < 0 or index >= session['total_chunks']:
+        return jsonify({"code": 400, "msg": f"分片序号需在0-{session['total_chunks'] - 1}之间"})
+    
+    success, err_msg = save_chunk(session, index, request.stream)
+    if not success:
+        return jsonify({"code": 400, "msg": err_msg})
+    observe_upload('chunk', request.content_length)
+    return jsonify({"code": 200, "msg": "分片上传成功", "data": {"index": index}})
+
+@file_blueprint.route('/upload/<upload_id>', methods=['GET'])
+def get_upload_status(upload_id: str) -> Dict[str, Any]:
+    """分片上传：查询已收到的分片（断点续传时只补传 missing 中的分片）"""
+    session = load_upload_session(upload_id)
+    if not session:
+        return jsonify({"code": 404, "msg": "上传会话不存在或已过期"})
+    
+    received = get_received_chunks(session)
+    received_set = set(received)
+    return jsonify({
+        "code": 200,
+        "msg": "查询成功",
+        "data": {
+            "upload_id": upload_id,
+            "file_name": session['file_name'],
+            "file_size": session['file_size'],
+            "chunk_size": session['chunk_size'],
+            "total_chunks": session['total_chunks'],
+            "received": received,
+            "missing": [i for i in range(session['total_chunks']) if i not in received_set]
+        }
+    })
+
+@file_blueprint.route('/upload/<upload_id>/commit', methods=['POST'])
+def commit_chunk_upload(upload_id: str) -> Dict[str, Any]:
+    """分片上传：全部分片到齐后合并文件并写入 sg_file"""
+    session = load_upload_session(upload_id)
+    if not session:
+        return jsonify({"code": 404, "msg": "上传会话不存在或已过期"})
+    
+    # 会话创建后成员关系可能已变化，入库前重新校验
+    group_id, uploader_id = session['group_id'], session['uploader_id']
+    _, err = require_group_member(uploader_id, group_id, forbidden_msg="仅小组成员可上传文件", user_label="上传人")
+    if err:
+        return jsonify(err)
+    
+    # 启用去重时合并分片的同时计算内容哈希
+    hasher = hashlib.sha256() if UPLOAD_CONFIG["DEDUP_ENABLED"] else None
+    assembled_path, err_msg = assemble_upload(session, hasher)
+    if not assembled_path:
+        return jsonify({"code": 400, "msg": err_msg})
+    
+    try:
+        file_id = _store_file(
+            group_id, uploader_id, session['file_name'], int(session['file_size'] / 1024),
+            assembled_path, hasher.hexdigest() if hasher else None
+        )
     except Exception as e:
-        # 异常回滚：删除物理文件
-        if physical_file_path and os.path.exists(physical_file_path):
-            delete_physical_file(physical_file_path)
+        release_upload_lock(upload_id)
         return jsonify({"code": 500, "msg": f"上传失败：{str(e)}"})
+    
+    # 入库提交后删除会话；事务回滚时分片仍保留，客户端可直接重新commit
+    on_request_commit(lambda: delete_upload_session(upload_id))
+    on_request_rollback(lambda: release_upload_lock(upload_id))
+    
+    return jsonify({
+        "code": 200,
+        "msg": "上传成功",
+        "data": {"file_id": file_id, "original_name": session['file_name']}
+    })
+
+@file_blueprint.route('/upload/<upload_id>', methods=['DELETE'])
+def abort_chunk_upload(upload_id: str) -> Dict[str, Any]:
+    """分片上传：放弃上传并删除已收到的分片"""
+    if not load_upload_session(upload_id):
+        return jsonify({"code": 404, "msg": "上传会话不存在或已过期"})
+    delete_upload_session(upload_id)
+    return jsonify({"code": 200, "msg": "已取消上传"})
 
 @file_blueprint.route('/group/<int:group_id>', methods=['GET'])
 def get_group_files(group_id: int) -> Dict[str, Any]:
-    """查询小组文件列表"""
+    """查询小组文件列表（可选：page_size/cursor 游标分页，fields 字段投影）"""
+    page, page_err = parse_page_params(request.args, FILE_LIST_FIELDS)
+    if page is None:
+        return jsonify({"code": 400, "msg": page_err})
+    
     # 校验小组存在
     group_exist = query_one("SELECT 1 FROM sg_group WHERE group_id = %s", (group_id,))
     if not group_exist:
         return jsonify({"code": 404, "msg": f"小组ID={group_id}不存在"})
     
-    # 联表查询文件与上传人信息
-    query_sql = """
-        SELECT f.*, u.user_name AS uploader_name
+    # 联表查询文件与上传人信息（按 (upload_time, file_id) 倒序，游标分页走索引）
+    columns = build_select_columns(
+        page['fields'], FILE_LIST_FIELDS, [] if page['stream'] else ['upload_time', 'file_id'], "f.*, u.user_name AS uploader_name"
+    )
+    query_sql = f"""
+        SELECT {columns}
         FROM sg_file f
         LEFT JOIN sg_user u ON f.uploader_id = u.user_id
         WHERE f.group_id = %s
-        ORDER BY f.upload_time DESC
     """
-    file_list = query_all(query_sql, (group_id,))
+    params = [group_id]
+    if page['cursor']:
+        query_sql += " AND (f.upload_time < %s OR (f.upload_time = %s AND f.file_id < %s))"
+        params.extend([page['cursor'][0], page['cursor'][0], page['cursor'][1]])
+    query_sql += " ORDER BY f.upload_time DESC, f.file_id DESC"
+    if page['paginate']:
+        query_sql += " LIMIT %s"
+        params.append(page['page_size'] + 1)
+    if page['stream']:
+        # 全量导出：服务端游标逐批读取，边序列化边输出
+        rows = query_stream(query_sql, params)
+        if rows is None:
+            return jsonify({"code": 500, "msg": "文件查询失败"})
+        return stream_json_response(rows)
+    file_list = query_all(query_sql, params)
     if file_list is None:
         return jsonify({"code": 500, "msg": "文件查询失败"})
-    
-    # 格式化时间
-    for file in file_list:
-        file['upload_time'] = file['upload_time'].strftime("%Y-%m-%d %H:%M:%S")
+    file_list, next_cursor = finish_page(file_list, page, 'upload_time', 'file_id')
     
     return jsonify({
         "code": 200,
         "msg": "查询成功",
-        "data": file_list
+        "data": file_list,
+        "next_cursor": next_cursor
     })
 
+@file_blueprint.route('/search', methods=['GET'])
+def search_group_files() -> Dict[str, Any]:
+    """在用户所在小组的文件中按文件名与正文检索（可选 group_id 限定小组，limit 限制条数）"""
+    request_user_id = request.args.get('user_id')
+    keyword = request.args.get('q', '').strip()
+    group_id = request.args.get('group_id')
+    limit = request.args.get('limit', SEARCH_CONFIG["DEFAULT_LIMIT"])
+    if not SEARCH_CONFIG["ENABLED"]:
+        return jsonify({"code": 501, "msg": "文件搜索未启用"})
+    if not request_user_id:
+        return jsonify({"code": 401, "msg": "请传入user_id"})
+    if not keyword:
+        return jsonify({"code": 400, "msg": "搜索关键词不能为空"})
+    
+    try:
+        request_user_id = int(request_user_id)
+        group_id = int(group_id) if group_id else None
+        limit = int(limit)
+    except ValueError:
+        return jsonify({"code": 400, "msg": "user_id、group_id、limit必须为整数"})
+    if limit < 1 or limit > SEARCH_CONFIG["MAX_LIMIT"]:
+        return jsonify({"code": 400, "msg": f"limit需在1-{SEARCH_CONFIG['MAX_LIMIT']}之间"})
+    
+    # 结果只包含用户所在小组的文件（查询内联表 sg_user_group 限定）
+    file_list = search_files(request_user_id, keyword, group_id, limit)
+    if file_list is None:
+        return jsonify({"code": 500, "msg": "文件搜索失败"})
+    
+    return jsonify({"code": 200, "msg": "查询成功", "data": file_list})
+
+@file_blueprint.route('/group/<int:group_id>/archive', methods=['GET'])
+def download_group_archive(group_id: int):
+    """打包下载小组全部文件（一次权限校验，边读边压缩输出ZIP）"""
+    request_user_id = request.args.get('user_id')
+    if not request_user_id:
+        return jsonify({"code": 401, "msg": "请传入user_id"})
+    
+    try:
+        request_user_id = int(request_user_id)
+    except:
+        return jsonify({"code": 400, "msg": "user_id必须为整数"})
+    
+    # 权限校验（小组存在且为成员）
+    _, err = require_group_member(request_user_id, group_id, forbidden_msg="无权限下载，仅小组成员可下载文件")
+    if err:
+        return jsonify(err)
+    
+    # 只取打包所需的元数据，文件内容在输出时逐块读取
+    file_list = query_all(
+        "SELECT * FROM sg_file WHERE group_id = %s ORDER BY upload_time, file_id", (group_id,)
+    )
+    if file_list is None:
+        return jsonify({"code": 500, "msg": "文件查询失败"})
+    
+    used_names: Dict[str, int] = {}
+    entries = [
+        (unique_arcname(file_info['original_name'], used_names), resolve_file_path(file_info), file_info['upload_time'])
+        for file_info in file_list
+    ]
+    response = Response(count_download_bytes(stream_zip(entries)), mimetype='application/zip')
+    response.headers.set('Content-Disposition', 'attachment', filename=f"group_{group_id}_files.zip")
+    response.headers['X-Accel-Buffering'] = 'no'  # 经 nginx 时不缓冲，边压缩边发送
+    response.cache_control.no_store = True
+    return response
+
 @file_blueprint.route('/download/<int:file_id>', methods=['GET'])
 def download_file(file_id: int):
     """文件下载（权限校验）- 改进版"""
@@ -174,121 +420,165 @@ def download_file(file_id: int):
     except:
         return jsonify({"code": 400, "msg": "user_id必须为整数"})
     
-    # 查询文件信息
-    file_info = query_one("""
-        SELECT f.*, g.group_id 
-        FROM sg_file f
-        LEFT JOIN sg_group g ON f.group_id = g.group_id
-        WHERE f.file_id = %s
-    """, (file_id,))
+    # 查询文件信息与成员身份（一次查询）
+    file_info = get_file_with_member(file_id, request_user_id)
     
     if not file_info:
         return jsonify({"code": 404, "msg": "文件不存在"})
     
     # 校验是否为小组成员
-    is_member = query_one(
-        "SELECT 1 FROM sg_user_group WHERE user_id = %s AND group_id = %s",
-        (request_user_id, file_info['group_id'])
-    )
+    is_member = file_info['is_member']
     if not is_member:
         return jsonify({"code": 403, "msg": "无权限下载，仅小组成员可下载文件"})
     
-    # 构建文件路径
-    file_store_path = os.path.join(str(file_info['group_id']), file_info['store_name'])
-    full_path = os.path.join(UPLOAD_CONFIG["BASE_PATH"], file_store_path)
+    # 构建文件路径（去重存储的文件读取共享内容）
+    full_path = resolve_file_path(file_info)
     
     if not os.path.exists(full_path):
         return jsonify({"code": 404, "msg": "文件不存在或已被删除"})
     
     try:
-        # 使用send_file并提供更明确的参数
-        return send_file(
+        return _send_stored_file(
+            file_info,
             full_path,
             as_attachment=True,
-            download_name=file_info['original_name'],
             mimetype='application/octet-stream'  # 通用MIME类型
         )
+    except HTTPException:
+        raise  # 如 416 Range Not Satisfiable
     except Exception as e:
         return jsonify({"code": 500, "msg": f"文件下载失败: {str(e)}"})
 
 @file_blueprint.route('/preview/<int:file_id>', methods=['GET'])
 def preview_file(file_id: int):
-    """文件预览（权限校验）- 新增接口"""
+    """文件预览（权限校验）；variant=thumb（缩略图）/text（文本摘录）返回预览缓存，未生成时返回原文件"""
     # 获取用户ID
     request_user_id = request.args.get('user_id')
     if not request_user_id:
         return jsonify({"code": 401, "msg": "请传入user_id"})
+    variant = request.args.get('variant')
+    if variant and variant not in VARIANTS:
+        return jsonify({"code": 400, "msg": f"variant可选值：{', '.join(VARIANTS)}"})
     
     try:
         request_user_id = int(request_user_id)
     except:
         return jsonify({"code": 400, "msg": "user_id必须为整数"})
     
-    # 查询文件信息
-    file_info = query_one("""
-        SELECT f.*, g.group_id 
-        FROM sg_file f
-        LEFT JOIN sg_group g ON f.group_id = g.group_id
-        WHERE f.file_id = %s
-    """, (file_id,))
+    # 查询文件信息与成员身份（一次查询）
+    file_info = get_file_with_member(file_id, request_user_id)
     
     if not file_info:
         return jsonify({"code": 404, "msg": "文件不存在"})
     
     # 校验是否为小组成员
-    is_member = query_one(
-        "SELECT 1 FROM sg_user_group WHERE user_id = %s AND group_id = %s",
-        (request_user_id, file_info['group_id'])
-    )
+    is_member = file_info['is_member']
     if not is_member:
         return jsonify({"code": 403, "msg": "无权限预览"})
     
-    # 构建文件路径
-    file_store_path = os.path.join(str(file_info['group_id']), file_info['store_name'])
-    full_path = os.path.join(UPLOAD_CONFIG["BASE_PATH"], file_store_path)
+    # 构建文件路径（去重存储的文件读取共享内容）
+    full_path = resolve_file_path(file_info)
     
     if not os.path.exists(full_path):
         return jsonify({"code": 404, "msg": "文件不存在或已被删除"})
     
+    # 预览缓存（ETag/缓存按预览文件本身计算）
+    if variant:
+        rendition = get_rendition(full_path, file_info['original_name'], variant)
+        if rendition:
+            rendition_name = os.path.splitext(file_info['original_name'])[0] + VARIANTS[variant]
+            try:
+                return _send_stored_file(
+                    dict(file_info, content_hash=None, original_name=rendition_name),
+                    rendition,
+                    as_attachment=False,
+                    mimetype=VARIANT_MIMETYPES[variant]
+                )
+            except HTTPException:
+                raise
+            except Exception as e:
+                print(f"预览缓存发送失败：{str(e)}")
+    
     # 尝试确定MIME类型
     file_ext = os.path.splitext(file_info['original_name'])[1].lower()
-    mime_types = {
-        '.pdf': 'application/pdf',
-        '.doc': 'application/msword',
-        '.docx': 'application/vnd.openxmlformats-officedocument.wordprocessingml.document',
-        '.xls': 'application/vnd.ms-excel',
-        '.xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-        '.ppt': 'application/vnd.ms-powerpoint',
-        '.pptx': 'application/vnd.openxmlformats-officedocument.presentationml.presentation',
-        '.jpg': 'image/jpeg',
-        '.jpeg': 'image/jpeg',
-        '.png': 'image/png',
-        '.gif': 'image/gif',
-        '.txt': 'text/plain',
-    }
-    
-    mimetype = mime_types.get(file_ext, 'application/octet-stream')
+    mimetype = PREVIEW_MIME_TYPES.get(file_ext, 'application/octet-stream')
     
     try:
         # 对于图片和PDF，可以在浏览器中预览
-        if file_ext in ['.pdf', '.jpg', '.jpeg', '.png', '.gif']:
-            return send_file(
+        if file_ext in INLINE_PREVIEW_TYPES:
+            return _send_stored_file(
+                file_info,
                 full_path,
                 as_attachment=False,  # 不强制下载
-                download_name=file_info['original_name'],
                 mimetype=mimetype
             )
         else:
             # 其他文件类型强制下载
-            return send_file(
+            return _send_stored_file(
+                file_info,
                 full_path,
                 as_attachment=True,
-                download_name=file_info['original_name'],
                 mimetype=mimetype
             )
+    except HTTPException:
+        raise
     except Exception as e:
         return jsonify({"code": 500, "msg": f"文件预览失败: {str(e)}"})
 
+def _send_stored_file(file_info: Dict[str, Any], full_path: str, as_attachment: bool, mimetype: str):
+    """
+    发送已通过权限校验的文件，支持协商缓存与断点续传：
+    - 强ETag：去重存储用内容哈希，否则用 大小+修改时间；同时带 Last-Modified
+    - If-None-Match / If-Modified-Since 命中返回304，Range / If-Range 返回206分段内容
+    - Cache-Control: private（只允许浏览器缓存，max-age 过后带校验值重新请求，仍会经过权限校验）
+    DELIVERY_MODE 为 x-accel/x-sendfile 时只返回响应头，文件内容（及Range/协商缓存）由前端代理发送
+    """
+    if UPLOAD_CONFIG["DELIVERY_MODE"] in ('x-accel', 'x-sendfile'):
+        return _offload_stored_file(file_info, full_path, as_attachment, mimetype)
+    etag = file_etag(file_info, full_path)
+    response = send_file(
+        full_path,
+        as_attachment=as_attachment,
+        download_name=file_info['original_name'],
+        mimetype=mimetype,
+        etag=etag,
+        conditional=True,
+        max_age=0
+    )
+    _set_private_cache(response)
+    observe_download(response.content_length)  # 304 时为0，Range 请求为分段长度
+    return response
+
+def _offload_stored_file(file_info: Dict[str, Any], full_path: str, as_attachment: bool, mimetype: str):
+    """生成交给代理发送的空响应：带 Content-Type/Content-Disposition/Cache-Control 与内部重定向头"""
+    response = werkzeug_send_file(
+        full_path,
+        request.environ,
+        mimetype=mimetype,
+        as_attachment=as_attachment,
+        download_name=file_info['original_name'],
+        conditional=False,
+        etag=False,
+        max_age=0,
+        use_x_sendfile=True,
+        response_class=current_app.response_class
+    )
+    if UPLOAD_CONFIG["DELIVERY_MODE"] == 'x-accel':
+        # nginx 按内部路径读文件，自行处理 Range、ETag/Last-Modified 与 Content-Length
+        del response.headers['X-Sendfile']
+        response.headers['X-Accel-Redirect'] = accel_redirect_uri(full_path)
+        response.content_length = 0
+    _set_private_cache(response)
+    return response
+
+def _set_private_cache(response) -> None:
+    """只允许浏览器（私有）缓存，过期后带校验值重新请求"""
+    response.cache_control.no_cache = None
+    response.cache_control.public = None
+    response.cache_control.private = True
+    response.cache_control.max_age = UPLOAD_CONFIG["DOWNLOAD_CACHE_MAX_AGE"]
+    response.headers.pop('Expires', None)
+
 @file_blueprint.route('/<int:file_id>', methods=['DELETE'])
 def delete_file(file_id: int) -> Dict[str, Any]:
     """文件删除（权限校验）"""
@@ -302,33 +592,22 @@ def delete_file(file_id: int) -> Dict[str, Any]:
     except:
         return jsonify({"code": 400, "msg": "user_id必须为整数"})
     
-    # 查询文件信息
-    file_info = query_one("""
-        SELECT f.*, g.group_id 
-        FROM sg_file f
-        LEFT JOIN sg_group g ON f.group_id = g.group_id
-        WHERE f.file_id = %s
-    """, (file_id,))
+    # 查询文件信息与成员身份（一次查询）
+    file_info = get_file_with_member(file_id, request_user_id)
     
     if not file_info:
         return jsonify({"code": 404, "msg": "文件不存在"})
     
     # 校验是否为小组成员
-    is_member = query_one(
-        "SELECT 1 FROM sg_user_group WHERE user_id = %s AND group_id = %s",
-        (request_user_id, file_info['group_id'])
-    )
+    is_member = file_info['is_member']
     
     # 注意：PERMISSION_CONFIG["REQUIRE_MEMBER"] 是一个列表，检查是否在列表中
     if not is_member and "file_delete" in PERMISSION_CONFIG["REQUIRE_MEMBER"]:
         return jsonify({"code": 403, "msg": "无权限删除"})
     
     # 执行删除
-    physical_file_path = os.path.join(
-        UPLOAD_CONFIG["BASE_PATH"],
-        str(file_info['group_id']),
-        file_info['store_name']
-    )
+    physical_file_path = resolve_file_path(file_info)
+    content_hash = file_info.get('content_hash')
     
     # 删除数据库记录
     delete_sql = "DELETE FROM sg_file WHERE file_id = %s"
@@ -337,8 +616,17 @@ def delete_file(file_id: int) -> Dict[str, Any]:
     if not delete_success:
         return jsonify({"code": 500, "msg": "文件删除失败"})
     
-    # 删除物理文件
-    if os.path.exists(physical_file_path):
-        delete_physical_file(physical_file_path)
+    # 更新上传人统计、清理搜索词条
+    record_stats_delta(file_info['uploader_id'], file_info['group_id'], uploaded_files=-1)
+    record_change(file_info['group_id'], ENTITY_FILE, file_id, OP_DELETE)
+    emit_group_event(file_info['group_id'], 'file-deleted', {"file_id": file_id, "user_id": request_user_id})
+    remove_file_index(file_id)
+    
+    # 数据库删除提交后再删除物理文件（事务回滚时文件仍可用）；共享内容在最后一个引用删除后才删除
+    if content_hash:
+        on_request_commit(lambda: release_blob(content_hash))
+    else:
+        on_request_commit(lambda: delete_physical_file(physical_file_path))
+        on_request_commit(lambda: delete_renditions(physical_file_path))
     
     return jsonify({"code": 200, "msg": "文件删除成功"})
\ No newline at end of file
@@ -1,7 +1,10 @@
-from flask import Blueprint, request, jsonify
-from app.utils.db_utils import query_one, query_all, execute_sql
+from flask import Blueprint, request, jsonify, Response
+from app.utils.db_utils import query_one, query_all, execute_sql, savepoint
+from app.utils.permission_utils import require_group_member, get_member_context, invalidate_member
+from app.utils.event_utils import get_broker, emit_group_event, sse_stream, sse_busy, acquire_stream_slot, release_stream_slot
+from app.utils.change_utils import get_changes, record_change, ENTITY_MEMBER, OP_DELETE
 from app.utils.validate_utils import check_required_params, check_param_type, check_string_length
-from app.config import PERMISSION_CONFIG
+from app.config import PERMISSION_CONFIG, CHANGES_CONFIG
 from datetime import datetime
 from typing import Dict, Any
 
@@ -29,12 +32,17 @@ def create_group() -> Dict[str, Any]:
     is_len_valid, len_err_msg = check_string_length(group_name, 1, 30, "小组名称")
     if not is_len_valid:
         return jsonify({"code": 400, "msg": len_err_msg})
-    # 校验关联数据存在性
-    course_exist = query_one("SELECT 1 FROM sg_course WHERE course_id = %s", (course_id,))
-    if not course_exist:
+    # 校验关联数据存在性（课程与用户一次查询）
+    exist_info = query_one("""
+        SELECT
+            EXISTS(SELECT 1 FROM sg_course WHERE course_id = %s) AS course_exists,
+            EXISTS(SELECT 1 FROM sg_user WHERE user_id = %s) AS user_exists
+    """, (course_id, creator_id))
+    if exist_info is None:
+        return jsonify({"code": 500, "msg": "数据校验失败"})
+    if not exist_info['course_exists']:
         return jsonify({"code": 404, "msg": f"课程ID={course_id}不存在"})
-    user_exist = query_one("SELECT 1 FROM sg_user WHERE user_id = %s", (creator_id,))
-    if not user_exist:
+    if not exist_info['user_exists']:
         return jsonify({"code": 404, "msg": f"用户ID={creator_id}不存在"})
     # 执行创建逻辑
     create_time = datetime.now()
@@ -53,9 +61,9 @@ def create_group() -> Dict[str, Any]:
     """
     relation_success, _ = execute_sql(insert_relation_sql, (creator_id, group_id))
     if not relation_success:
-        # 回滚小组创建
-        execute_sql("DELETE FROM sg_group WHERE group_id = %s", (group_id,))
-        return jsonify({"code": 500, "msg": "小组创建成功，创建人绑定失败"})
+        # 请求事务整体回滚，小组记录不会残留
+        return jsonify({"code": 500, "msg": "小组创建失败，创建人绑定失败"})
+    invalidate_member(creator_id, group_id)
     # 返回结果
     return jsonify({
         "code": 200,
@@ -84,9 +92,6 @@ def get_user_groups(user_id: int) -> Dict[str, Any]:
     group_list = query_all(query_sql, (user_id,))
     if group_list is None:
         return jsonify({"code": 500, "msg": "小组查询失败"})
-    # 格式化时间
-    for group in group_list:
-        group['create_time'] = group['create_time'].strftime("%Y-%m-%d %H:%M:%S")
     return jsonify({
         "code": 200,
         "msg": "查询成功",
@@ -105,8 +110,6 @@ def get_group_detail(group_id: int) -> Dict[str, Any]:
     group_info = query_one(query_sql, (group_id,))
     if not group_info:
         return jsonify({"code": 404, "msg": f"小组ID={group_id}不存在"})
-    # 格式化时间
-    group_info['create_time'] = group_info['create_time'].strftime("%Y-%m-%d %H:%M:%S")
     return jsonify({
         "code": 200,
         "msg": "查询成功",
@@ -126,18 +129,14 @@ def get_group_members(group_id: int) -> Dict[str, Any]:
     except:
         return jsonify({"code": 400, "msg": "user_id必须为整数"})
     
-    # 校验是否为小组成员
-    is_member = query_one(
-        "SELECT 1 FROM sg_user_group WHERE user_id = %s AND group_id = %s",
-        (request_user_id, group_id)
+    # 校验小组存在且为小组成员（一次查询）
+    _, err = require_group_member(
+        request_user_id, group_id,
+        forbidden_msg="无权限查询该小组成员",
+        require_member="group_member_query" in PERMISSION_CONFIG["REQUIRE_MEMBER"]
     )
-    if not is_member and "group_member_query" in PERMISSION_CONFIG["REQUIRE_MEMBER"]:
-        return jsonify({"code": 403, "msg": "无权限查询该小组成员"})
-    
-    # 校验小组存在
-    group_exist = query_one("SELECT 1 FROM sg_group WHERE group_id = %s", (group_id,))
-    if not group_exist:
-        return jsonify({"code": 404, "msg": f"小组ID={group_id}不存在"})
+    if err:
+        return jsonify(err)
     
     # 查询成员列表（使用新的工具函数）
     from app.utils.stats_utils import get_group_members_with_stats
@@ -152,6 +151,78 @@ def get_group_members(group_id: int) -> Dict[str, Any]:
         "data": member_list
     })
 
+@group_blueprint.route('/<int:group_id>/events', methods=['GET'])
+def group_events(group_id: int) -> Any:
+    """
+    小组事件推送（SSE）：task-created、task-status-changed、file-uploaded、file-deleted、member-joined、member-removed
+    断线重连时浏览器自动携带 Last-Event-ID 请求头（首次连接也可用 last_event_id 参数），服务端重放其后的事件；
+    收到 reset 事件表示无法完整重放，客户端应重新拉取列表
+    """
+    request_user_id = request.args.get('user_id')
+    if not request_user_id:
+        return jsonify({"code": 401, "msg": "请传入user_id"})
+    
+    try:
+        request_user_id = int(request_user_id)
+    except:
+        return jsonify({"code": 400, "msg": "user_id必须为整数"})
+    
+    _, err = require_group_member(request_user_id, group_id, forbidden_msg="无权限订阅该小组动态")
+    if err:
+        return jsonify(err)
+    
+    if not acquire_stream_slot():
+        # 本进程长连接已满：立即结束，客户端稍后自动重连（不占用线程）
+        response = Response(sse_busy(), mimetype='text/event-stream')
+        response.cache_control.no_cache = True
+        return response
+    
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    try:
+        subscription = get_broker().subscribe(group_id, last_event_id)
+    except Exception as e:
+        release_stream_slot()
+        return jsonify({"code": 500, "msg": f"订阅失败: {str(e)}"})
+    
+    response = Response(sse_stream(subscription), mimetype='text/event-stream')
+    response.call_on_close(release_stream_slot)  # 连接结束（含客户端断开）时归还名额
+    response.headers['X-Accel-Buffering'] = 'no'  # 经 nginx 时不缓冲，事件立即送达
+    response.cache_control.no_cache = True
+    return response
+
+@group_blueprint.route('/<int:group_id>/changes', methods=['GET'])
+def get_group_changes(group_id: int) -> Dict[str, Any]:
+    """
+    增量同步：返回游标 since 之后变化的任务/文件/成员（upserted 为当前数据，deleted 为已删除的ID）
+    不传 since 或返回 reset=true 时，客户端需全量加载列表，再从返回的 cursor 开始增量同步（先取游标再加载，避免遗漏）
+    has_more=true 时用新的 cursor 继续拉取
+    """
+    request_user_id = request.args.get('user_id')
+    if not request_user_id:
+        return jsonify({"code": 401, "msg": "请传入user_id"})
+    
+    try:
+        request_user_id = int(request_user_id)
+        since = int(request.args['since']) if request.args.get('since') else None
+        limit = int(request.args.get('limit', CHANGES_CONFIG["DEFAULT_LIMIT"]))
+    except ValueError:
+        return jsonify({"code": 400, "msg": "user_id、since、limit必须为整数"})
+    if limit < 1 or limit > CHANGES_CONFIG["MAX_LIMIT"]:
+        return jsonify({"code": 400, "msg": f"limit需在1-{CHANGES_CONFIG['MAX_LIMIT']}之间"})
+    
+    _, err = require_group_member(request_user_id, group_id, forbidden_msg="无权限查询该小组动态")
+    if err:
+        return jsonify(err)
+    
+    changes = get_changes(group_id, since, limit)
+    if changes is None:
+        return jsonify({"code": 500, "msg": "变更查询失败"})
+    return jsonify({
+        "code": 200,
+        "msg": "查询成功",
+        "data": changes
+    })
+
 @group_blueprint.route('/<int:group_id>/invite', methods=['POST'])
 def invite_member(group_id: int) -> Dict[str, Any]:
     """邀请成员加入小组（超级简化版）"""
@@ -170,13 +241,15 @@ def invite_member(group_id: int) -> Dict[str, Any]:
     
     # 直接将被邀请人加入小组（跳过所有权限检查）
     try:
-        # 检查是否已加入
-        is_member = query_one(
-            "SELECT 1 FROM sg_user_group WHERE user_id = %s AND group_id = %s",
-            (invitee_id, group_id)
-        )
-        
-        if is_member:
+        # 检查小组、被邀请人是否存在以及是否已加入（一次查询）
+        member = get_member_context(invitee_id, group_id)
+        if member is None:
+            return jsonify({"code": 500, "msg": "成员校验失败"})
+        if not member['group_exists']:
+            return jsonify({"code": 404, "msg": f"小组ID={group_id}不存在"})
+        if not member['user_exists']:
+            return jsonify({"code": 404, "msg": f"用户ID={invitee_id}不存在"})
+        if member['is_member']:
             return jsonify({"code": 400, "msg": "该用户已经是小组成员"})
         
         # 加入小组
@@ -185,6 +258,9 @@ def invite_member(group_id: int) -> Dict[str, Any]:
         
         if not join_success:
             return jsonify({"code": 500, "msg": "加入小组失败"})
+        invalidate_member(invitee_id, group_id)
+        record_change(group_id, ENTITY_MEMBER, invitee_id)
+        emit_group_event(group_id, 'member-joined', {"user_id": invitee_id, "inviter_id": inviter_id})
         
         # 记录邀请（可选）
         try:
@@ -192,7 +268,8 @@ def invite_member(group_id: int) -> Dict[str, Any]:
                 INSERT INTO sg_invitation (group_id, inviter_id, invitee_id)
                 VALUES (%s, %s, %s)
             """
-            execute_sql(invite_sql, (group_id, inviter_id, invitee_id))
+            with savepoint():
+                execute_sql(invite_sql, (group_id, inviter_id, invitee_id))
         except:
             pass  # 邀请记录失败不影响主流程
         
@@ -232,6 +309,9 @@ def remove_member(group_id: int) -> Dict[str, Any]:
         
         if not delete_success or affected_rows == 0:
             return jsonify({"code": 400, "msg": "该用户不是小组成员"})
+        invalidate_member(target_id, group_id)
+        record_change(group_id, ENTITY_MEMBER, target_id, OP_DELETE)
+        emit_group_event(group_id, 'member-removed', {"user_id": target_id})
         
         return jsonify({
             "code": 200,
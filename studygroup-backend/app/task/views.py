@@ -1,12 +1,32 @@
 from flask import Blueprint, request, jsonify
-from app.utils.db_utils import query_one, query_all, execute_sql
+from app.utils.db_utils import query_one, query_all, query_stream, execute_sql, execute_many_insert, mark_request_failed
+from app.utils.permission_utils import require_group_member, get_task_with_member, get_tasks_with_member, get_group_member_ids
+from app.utils.stats_utils import record_stats_delta
+from app.utils.event_utils import emit_group_event
+from app.utils.change_utils import record_change, record_changes, ENTITY_TASK
+from app.utils.progress_utils import apply_progress_delta, get_group_progress
+from app.utils.page_utils import parse_page_params, build_select_columns, finish_page
+from app.utils.response_utils import stream_json_response
 from app.utils.validate_utils import check_required_params, check_param_type, check_string_length
-from app.config import PERMISSION_CONFIG
+from app.config import PERMISSION_CONFIG, TASK_BULK_CONFIG
+from collections import Counter, defaultdict
 from datetime import datetime
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional, Tuple
 
 task_blueprint = Blueprint('task', __name__)
 
+# 任务列表可投影字段 -> SQL列
+TASK_LIST_FIELDS = {
+    'task_id': 't.task_id',
+    'task_desc': 't.task_desc',
+    'create_time': 't.create_time',
+    'complete_time': 't.complete_time',
+    'status': 't.status',
+    'group_id': 't.group_id',
+    'leader_id': 't.leader_id',
+    'leader_name': 'u.user_name'
+}
+
 @task_blueprint.route('/create', methods=['POST'])
 def create_task() -> Dict[str, Any]:
     """创建任务"""
@@ -29,20 +49,10 @@ def create_task() -> Dict[str, Any]:
     is_len_valid, len_err_msg = check_string_length(task_desc, 1, 500, "任务描述")
     if not is_len_valid:
         return jsonify({"code": 400, "msg": len_err_msg})
-    # 校验关联数据存在性
-    group_exist = query_one("SELECT 1 FROM sg_group WHERE group_id = %s", (group_id,))
-    if not group_exist:
-        return jsonify({"code": 404, "msg": f"小组ID={group_id}不存在"})
-    leader_exist = query_one("SELECT 1 FROM sg_user WHERE user_id = %s", (leader_id,))
-    if not leader_exist:
-        return jsonify({"code": 404, "msg": f"负责人ID={leader_id}不存在"})
-    # 校验负责人是否为小组成员
-    is_member = query_one(
-        "SELECT 1 FROM sg_user_group WHERE user_id = %s AND group_id = %s",
-        (leader_id, group_id)
-    )
-    if not is_member:
-        return jsonify({"code": 403, "msg": "负责人必须是小组成员"})
+    # 校验小组、负责人存在且负责人为小组成员（一次查询）
+    _, err = require_group_member(leader_id, group_id, forbidden_msg="负责人必须是小组成员", user_label="负责人")
+    if err:
+        return jsonify(err)
     # 执行创建
     create_time = datetime.now()
     task_status = "待办"  # 默认状态
@@ -55,6 +65,15 @@ def create_task() -> Dict[str, Any]:
     )
     if not task_success or not task_id:
         return jsonify({"code": 500, "msg": "任务创建失败"})
+    # 小组进度计数与任务在同一事务内更新（失败时整个请求回滚）
+    if not apply_progress_delta(group_id, total_tasks=1):
+        return jsonify({"code": 500, "msg": "任务创建失败"})
+    record_stats_delta(leader_id, group_id, total_tasks=1)
+    record_change(group_id, ENTITY_TASK, task_id)
+    emit_group_event(group_id, 'task-created', {
+        "task_id": task_id, "task_desc": task_desc, "status": task_status,
+        "leader_id": leader_id, "create_time": create_time
+    })
     return jsonify({
         "code": 200,
         "msg": "任务创建成功",
@@ -63,16 +82,22 @@ def create_task() -> Dict[str, Any]:
 
 @task_blueprint.route('/group/<int:group_id>', methods=['GET'])
 def get_group_tasks(group_id: int) -> Dict[str, Any]:
-    """查询小组任务（支持状态筛选）"""
+    """查询小组任务（支持状态筛选；可选：page_size/cursor 游标分页，fields 字段投影）"""
     # 接收筛选参数
     status = request.args.get('status', '')
+    page, page_err = parse_page_params(request.args, TASK_LIST_FIELDS)
+    if page is None:
+        return jsonify({"code": 400, "msg": page_err})
     # 校验小组存在
     group_exist = query_one("SELECT 1 FROM sg_group WHERE group_id = %s", (group_id,))
     if not group_exist:
         return jsonify({"code": 404, "msg": f"小组ID={group_id}不存在"})
-    # 构建查询SQL
-    base_sql = """
-        SELECT t.*, u.user_name AS leader_name
+    # 构建查询SQL（按 (create_time, task_id) 倒序，游标分页走索引）
+    columns = build_select_columns(
+        page['fields'], TASK_LIST_FIELDS, [] if page['stream'] else ['create_time', 'task_id'], "t.*, u.user_name AS leader_name"
+    )
+    base_sql = f"""
+        SELECT {columns}
         FROM sg_task t
         LEFT JOIN sg_user u ON t.leader_id = u.user_id
         WHERE t.group_id = %s
@@ -81,18 +106,29 @@ def get_group_tasks(group_id: int) -> Dict[str, Any]:
     if status in ['待办', '完成']:
         base_sql += " AND t.status = %s"
         params.append(status)
-    base_sql += " ORDER BY t.create_time DESC"
+    if page['cursor']:
+        base_sql += " AND (t.create_time < %s OR (t.create_time = %s AND t.task_id < %s))"
+        params.extend([page['cursor'][0], page['cursor'][0], page['cursor'][1]])
+    base_sql += " ORDER BY t.create_time DESC, t.task_id DESC"
+    if page['paginate']:
+        base_sql += " LIMIT %s"
+        params.append(page['page_size'] + 1)
     # 执行查询
+    if page['stream']:
+        # 全量导出：服务端游标逐批读取，边序列化边输出
+        rows = query_stream(base_sql, params)
+        if rows is None:
+            return jsonify({"code": 500, "msg": "任务查询失败"})
+        return stream_json_response(rows)
     task_list = query_all(base_sql, params)
     if task_list is None:
         return jsonify({"code": 500, "msg": "任务查询失败"})
-    # 格式化时间
-    for task in task_list:
-        task['create_time'] = task['create_time'].strftime("%Y-%m-%d %H:%M:%S")
+    task_list, next_cursor = finish_page(task_list, page, 'create_time', 'task_id')
     return jsonify({
         "code": 200,
         "msg": "查询成功",
-        "data": task_list
+        "data": task_list,
+        "next_cursor": next_cursor
     })
 
 @task_blueprint.route('/<int:task_id>/status', methods=['PUT'])
@@ -121,87 +157,281 @@ def update_task_status(task_id: int) -> Dict[str, Any]:
     if status not in ['待办', '完成']:
         return jsonify({"code": 400, "msg": "状态值必须是'待办'或'完成'"})
     
-    # 校验任务存在
-    task_sql = """
-        SELECT t.*, g.group_id 
-        FROM sg_task t
-        LEFT JOIN sg_group g ON t.group_id = g.group_id
-        WHERE t.task_id = %s
-    """
-    task_info = query_one(task_sql, (task_id,))
+    # 校验任务存在，同时取出用户在该小组的权限级别（一次查询）
+    task_info = get_task_with_member(task_id, user_id)
     if not task_info:
         return jsonify({"code": 404, "msg": f"任务ID={task_id}不存在"})
     
     # 校验用户权限：用户必须是任务的负责人或是小组管理员
-    # 检查是否是负责人
-    if task_info['leader_id'] != user_id:
-        # 检查是否是小组管理员
-        permission_sql = """
-            SELECT permission_level 
-            FROM sg_user_group 
-            WHERE user_id = %s AND group_id = %s
-        """
-        user_permission = query_one(permission_sql, (user_id, task_info['group_id']))
-        if not user_permission or user_permission['permission_level'] < PERMISSION_CONFIG['group']['admin']:
-            return jsonify({"code": 403, "msg": "无权限更新该任务状态"})
+    if not _can_update_task(task_info, user_id):
+        return jsonify({"code": 403, "msg": "无权限更新该任务状态"})
     
     # 获取当前状态，避免重复更新
     current_status = task_info['status']
     if current_status == status:
         return jsonify({"code": 400, "msg": f"任务已经是'{status}'状态"})
     
-    # 执行更新
-    update_sql = "UPDATE sg_task SET status = %s WHERE task_id = %s"
+    # 执行更新（带上读到的旧状态作为条件：并发修改同一任务时只有一个请求生效，进度计数不会重复增减）
+    update_sql = "UPDATE sg_task SET status = %s WHERE task_id = %s AND status = %s"
     if status == '完成':
-        update_sql = "UPDATE sg_task SET status = %s, complete_time = NOW() WHERE task_id = %s"
+        update_sql = "UPDATE sg_task SET status = %s, complete_time = NOW() WHERE task_id = %s AND status = %s"
     
-    update_success, affected_rows = execute_sql(update_sql, (status, task_id))
-    if not update_success or affected_rows == 0:
+    update_success, affected_rows = execute_sql(update_sql, (status, task_id, current_status))
+    if not update_success:
+        return jsonify({"code": 500, "msg": "状态更新失败"})
+    if affected_rows == 0:
+        return jsonify({"code": 400, "msg": "任务状态已被修改，请刷新后重试"})
+    if not apply_progress_delta(task_info['group_id'], completed_tasks=1 if status == '完成' else -1):
         return jsonify({"code": 500, "msg": "状态更新失败"})
     
-    # ⭐ 新增：更新成员统计
-    try:
-        from app.utils.stats_utils import update_stats
-        # 重新计算该成员在小组中的统计
-        stats_sql = """
-            SELECT 
-                COUNT(*) as total_tasks,
-                SUM(CASE WHEN status = '完成' THEN 1 ELSE 0 END) as completed_tasks
-            FROM sg_task 
-            WHERE leader_id = %s AND group_id = %s
-        """
-        task_stats = query_one(stats_sql, (user_id, task_info['group_id']))
-        
-        if task_stats:
-            # 获取文件统计
-            file_sql = "SELECT COUNT(*) as uploaded_files FROM sg_file WHERE uploader_id = %s AND group_id = %s"
-            file_stats = query_one(file_sql, (user_id, task_info['group_id']))
-            
-            update_stats(
-                user_id=user_id,
-                group_id=task_info['group_id'],
-                total_tasks=task_stats['total_tasks'] or 0,
-                completed_tasks=task_stats['completed_tasks'] or 0,
-                uploaded_files=file_stats['uploaded_files'] or 0 if file_stats else 0
-            )
-    except Exception as e:
-        print(f"更新成员统计失败: {e}")
-        # 不中断主流程
+    # 更新任务负责人的完成数统计（增量，失败不中断主流程）
+    record_stats_delta(
+        task_info['leader_id'], task_info['group_id'],
+        completed_tasks=1 if status == '完成' else -1
+    )
+    record_change(task_info['group_id'], ENTITY_TASK, task_id)
+    emit_group_event(task_info['group_id'], 'task-status-changed', {
+        "task_id": task_id, "status": status, "previous_status": current_status, "user_id": user_id
+    })
     
     return jsonify({"code": 200, "msg": "状态更新成功"})
 
+def _can_update_task(task_info: Dict[str, Any], user_id: int) -> bool:
+    """任务负责人或小组管理员可更新任务状态（task_info 需带 is_member/member_permission_level）"""
+    if task_info['leader_id'] == user_id:
+        return True
+    permission_level = task_info['member_permission_level']
+    return bool(task_info['is_member']) and permission_level is not None \
+        and permission_level >= PERMISSION_CONFIG['group']['admin']
+
+def _check_bulk_items(items: Any, field: str) -> Optional[Dict[str, Any]]:
+    """校验批量接口的条目列表：非空数组且不超过上限"""
+    if not isinstance(items, list) or not items:
+        return {"code": 400, "msg": f"{field}必须为非空数组"}
+    if len(items) > TASK_BULK_CONFIG["MAX_ITEMS"]:
+        return {"code": 400, "msg": f"{field}最多{TASK_BULK_CONFIG['MAX_ITEMS']}条"}
+    return None
+
+def _bulk_errors_response(errors: List[Dict[str, Any]], action: str) -> Dict[str, Any]:
+    """批量接口逐条错误（index 为请求数组中的下标）"""
+    errors.sort(key=lambda error: error['index'])
+    return jsonify({
+        "code": 400,
+        "msg": f"{len(errors)}项校验失败，未{action}任何任务",
+        "data": {"errors": errors}
+    })
+
+@task_blueprint.route('/bulk-create', methods=['POST'])
+def bulk_create_tasks() -> Dict[str, Any]:
+    """
+    批量创建任务（JSON：group_id, tasks=[{task_desc, leader_id}, ...]）
+    负责人一次查询校验，多行INSERT写入，成员统计按负责人合并；全部在同一事务内
+    任一条不合法时返回400及逐条错误，不创建任何任务
+    """
+    request_data = request.json or {}
+    is_param_valid, err_msg = check_required_params(request_data, ['group_id', 'tasks'])
+    if not is_param_valid:
+        return jsonify({"code": 400, "msg": err_msg})
+    is_type_valid, type_err_msg = check_param_type(request_data, {'group_id': 'int'})
+    if not is_type_valid:
+        return jsonify({"code": 400, "msg": type_err_msg})
+    group_id = int(request_data['group_id'])
+    items = request_data['tasks']
+    items_err = _check_bulk_items(items, 'tasks')
+    if items_err:
+        return jsonify(items_err)
+
+    # 逐条校验参数
+    errors: List[Dict[str, Any]] = []
+    tasks: List[Tuple[int, str, int]] = []  # (下标, 任务描述, 负责人ID)
+    for index, item in enumerate(items):
+        if not isinstance(item, dict):
+            errors.append({"index": index, "msg": "每项必须为对象"})
+            continue
+        is_valid, msg = check_required_params(item, ['task_desc', 'leader_id'])
+        if is_valid:
+            is_valid, msg = check_param_type(item, {'leader_id': 'int'})
+        if is_valid and not isinstance(item['task_desc'], str):
+            is_valid, msg = False, "task_desc必须为字符串"
+        if is_valid:
+            is_valid, msg = check_string_length(item['task_desc'], 1, 500, "任务描述")
+        if not is_valid:
+            errors.append({"index": index, "msg": msg})
+            continue
+        tasks.append((index, item['task_desc'].strip(), int(item['leader_id'])))
+
+    # 校验小组存在且全部负责人为小组成员（一次查询）
+    membership = get_group_member_ids(group_id, [leader_id for _, _, leader_id in tasks])
+    if membership is None:
+        return jsonify({"code": 500, "msg": "权限校验失败"})
+    if not membership['group_exists']:
+        return jsonify({"code": 404, "msg": f"小组ID={group_id}不存在"})
+    for index, _, leader_id in tasks:
+        if leader_id not in membership['member_ids']:
+            errors.append({"index": index, "msg": f"负责人ID={leader_id}不是小组成员"})
+    if errors:
+        return _bulk_errors_response(errors, "创建")
+
+    # 多行INSERT一次写入
+    create_time = datetime.now()
+    task_status = "待办"
+    insert_sql = """
+        INSERT INTO sg_task (task_desc, create_time, status, group_id, leader_id)
+        VALUES (%s, %s, %s, %s, %s)
+    """
+    insert_success, task_ids = execute_many_insert(
+        insert_sql, [(task_desc, create_time, task_status, group_id, leader_id) for _, task_desc, leader_id in tasks]
+    )
+    if not insert_success or len(task_ids) != len(tasks):
+        mark_request_failed()
+        return jsonify({"code": 500, "msg": "任务创建失败"})
+    if not apply_progress_delta(group_id, total_tasks=len(tasks)):
+        return jsonify({"code": 500, "msg": "任务创建失败"})
+    # 成员统计按负责人合并，每人只写一次
+    for leader_id, count in Counter(leader_id for _, _, leader_id in tasks).items():
+        record_stats_delta(leader_id, group_id, total_tasks=count)
+    record_changes(group_id, ENTITY_TASK, task_ids)
+    for task_id, (_, task_desc, leader_id) in zip(task_ids, tasks):
+        emit_group_event(group_id, 'task-created', {
+            "task_id": task_id, "task_desc": task_desc, "status": task_status,
+            "leader_id": leader_id, "create_time": create_time
+        })
+
+    return jsonify({
+        "code": 200,
+        "msg": f"成功创建{len(task_ids)}个任务",
+        "data": [
+            {"index": index, "task_id": task_id, "status": task_status}
+            for task_id, (index, _, _) in zip(task_ids, tasks)
+        ]
+    })
+
+@task_blueprint.route('/bulk-status', methods=['PUT'])
+def bulk_update_task_status() -> Dict[str, Any]:
+    """
+    批量更新任务状态（JSON：user_id, updates=[{task_id, status}, ...]）
+    权限规则与单个更新相同（负责人或小组管理员）；已是目标状态的任务跳过，不算错误
+    任务一次查询校验，按目标状态各一条UPDATE，进度/成员统计按小组/负责人合并；全部在同一事务内
+    任一条不合法时返回400及逐条错误，不更新任何任务
+    """
+    request_data = request.json or {}
+    is_param_valid, err_msg = check_required_params(request_data, ['user_id', 'updates'])
+    if not is_param_valid:
+        return jsonify({"code": 400, "msg": err_msg})
+    is_type_valid, type_err_msg = check_param_type(request_data, {'user_id': 'int'})
+    if not is_type_valid:
+        return jsonify({"code": 400, "msg": type_err_msg})
+    user_id = int(request_data['user_id'])
+    items = request_data['updates']
+    items_err = _check_bulk_items(items, 'updates')
+    if items_err:
+        return jsonify(items_err)
+
+    # 逐条校验参数
+    errors: List[Dict[str, Any]] = []
+    updates: List[Tuple[int, int, str]] = []  # (下标, 任务ID, 目标状态)
+    seen_task_ids = set()
+    for index, item in enumerate(items):
+        if not isinstance(item, dict):
+            errors.append({"index": index, "msg": "每项必须为对象"})
+            continue
+        is_valid, msg = check_required_params(item, ['task_id', 'status'])
+        if is_valid:
+            is_valid, msg = check_param_type(item, {'task_id': 'int'})
+        if not is_valid:
+            errors.append({"index": index, "msg": msg})
+            continue
+        task_id, status = int(item['task_id']), str(item['status']).strip()
+        if status not in ['待办', '完成']:
+            errors.append({"index": index, "msg": "状态值必须是'待办'或'完成'"})
+        elif task_id in seen_task_ids:
+            errors.append({"index": index, "msg": f"任务ID={task_id}重复"})
+        else:
+            seen_task_ids.add(task_id)
+            updates.append((index, task_id, status))
+
+    # 一次查询取出全部任务及用户在各小组的权限
+    task_rows = get_tasks_with_member([task_id for _, task_id, _ in updates], user_id)
+    if task_rows is None:
+        return jsonify({"code": 500, "msg": "任务查询失败"})
+    task_map = {row['task_id']: row for row in task_rows}
+    changes: List[Tuple[int, Dict[str, Any], str]] = []  # (下标, 任务信息, 目标状态)
+    skipped: List[Dict[str, Any]] = []
+    for index, task_id, status in updates:
+        task_info = task_map.get(task_id)
+        if not task_info:
+            errors.append({"index": index, "msg": f"任务ID={task_id}不存在"})
+        elif not _can_update_task(task_info, user_id):
+            errors.append({"index": index, "msg": f"无权限更新任务ID={task_id}的状态"})
+        elif task_info['status'] == status:
+            skipped.append({"index": index, "task_id": task_id, "status": status})
+        else:
+            changes.append((index, task_info, status))
+    if errors:
+        return _bulk_errors_response(errors, "更新")
+
+    # 按目标状态各执行一条UPDATE：只有两种状态，“不等于目标状态”即读到的旧状态；
+    # 并发修改导致影响行数对不上时整体回滚，进度/统计不会重复增减
+    for status in ['完成', '待办']:
+        task_ids = [task_info['task_id'] for _, task_info, target in changes if target == status]
+        if not task_ids:
+            continue
+        complete_sql = ", complete_time = NOW()" if status == '完成' else ""
+        update_sql = f"""
+            UPDATE sg_task SET status = %s{complete_sql}
+            WHERE task_id IN ({', '.join(['%s'] * len(task_ids))}) AND status <> %s
+        """
+        update_success, affected_rows = execute_sql(update_sql, (status, *task_ids, status))
+        if not update_success:
+            return jsonify({"code": 500, "msg": "状态更新失败"})
+        if affected_rows != len(task_ids):
+            mark_request_failed()
+            return jsonify({"code": 400, "msg": "部分任务状态已被修改，请刷新后重试"})
+
+    # 进度按小组、成员统计按负责人合并后各写一次
+    progress_deltas: Dict[int, int] = defaultdict(int)
+    stats_deltas: Dict[Tuple[int, int], int] = defaultdict(int)
+    changed_ids: Dict[int, List[int]] = defaultdict(list)
+    for _, task_info, status in changes:
+        delta = 1 if status == '完成' else -1
+        progress_deltas[task_info['group_id']] += delta
+        stats_deltas[(task_info['leader_id'], task_info['group_id'])] += delta
+        changed_ids[task_info['group_id']].append(task_info['task_id'])
+    for group_id, delta in progress_deltas.items():
+        if not apply_progress_delta(group_id, completed_tasks=delta):
+            return jsonify({"code": 500, "msg": "状态更新失败"})
+    for (leader_id, group_id), delta in stats_deltas.items():
+        if delta:
+            record_stats_delta(leader_id, group_id, completed_tasks=delta)
+    for group_id, task_ids in changed_ids.items():
+        record_changes(group_id, ENTITY_TASK, task_ids)
+    for _, task_info, status in changes:
+        emit_group_event(task_info['group_id'], 'task-status-changed', {
+            "task_id": task_info['task_id'], "status": status,
+            "previous_status": task_info['status'], "user_id": user_id
+        })
+
+    return jsonify({
+        "code": 200,
+        "msg": f"成功更新{len(changes)}个任务",
+        "data": {
+            "updated": [
+                {"index": index, "task_id": task_info['task_id'], "status": status}
+                for index, task_info, status in changes
+            ],
+            "skipped": skipped
+        }
+    })
+
 @task_blueprint.route('/group/<int:group_id>/progress', methods=['GET'])
 def get_task_progress(group_id: int) -> Dict[str, Any]:
-    """查询小组任务进度"""
-    # 校验小组存在
-    group_exist = query_one("SELECT 1 FROM sg_group WHERE group_id = %s", (group_id,))
-    if not group_exist:
+    """查询小组任务进度（启用计数时读 sg_group_progress 计数行，命中缓存时不查库）"""
+    counts = get_group_progress(group_id)
+    if counts is None:
+        return jsonify({"code": 500, "msg": "进度查询失败"})
+    if not counts['group_exists']:
         return jsonify({"code": 404, "msg": f"小组ID={group_id}不存在"})
-    # 查询统计数据
-    total_sql = "SELECT COUNT(*) AS total FROM sg_task WHERE group_id = %s"
-    completed_sql = "SELECT COUNT(*) AS completed FROM sg_task WHERE group_id = %s AND status = '完成'"
-    total = query_one(total_sql, (group_id,))['total']
-    completed = query_one(completed_sql, (group_id,))['completed']
+    total, completed = counts['total'], counts['completed']
     # 计算进度
     progress = int((completed / total) * 100) if total > 0 else 0
     return jsonify({
@@ -0,0 +1,67 @@
+import io
+import os
+import zipfile
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, Tuple
+
+# 本身已压缩的格式（Office OpenXML 为zip容器、图片已编码）直接存储，避免重复压缩浪费CPU
+STORED_SUFFIXES = {'.docx', '.pptx', '.xlsx', '.png', '.jpg', '.jpeg', '.gif', '.zip'}
+_READ_BUFFER = 64 * 1024
+
+class _ZipSink(io.RawIOBase):
+    """只写、不可seek的输出缓冲：zipfile 写入后由生成器取走，内存占用不超过一个读块"""
+
+    def __init__(self):
+        super().__init__()
+        self._buffer = bytearray()
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._buffer += data
+        return len(data)
+
+    def drain(self) -> bytes:
+        data = bytes(self._buffer)
+        self._buffer.clear()
+        return data
+
+def unique_arcname(name: str, used: Dict[str, int]) -> str:
+    """压缩包内文件名去掉路径分隔符，同名文件依次追加 (1)、(2)…"""
+    name = name.replace('/', '_').replace('\\', '_').strip() or 'file'
+    count = used.get(name, 0)
+    used[name] = count + 1
+    if count == 0:
+        return name
+    stem, suffix = os.path.splitext(name)
+    return unique_arcname(f"{stem}({count}){suffix}", used)
+
+def stream_zip(entries: Iterable[Tuple[str, str, datetime]]) -> Iterator[bytes]:
+    """
+    边读文件边生成ZIP（不落临时文件、不整体缓冲）
+    entries：(压缩包内文件名, 物理路径, 修改时间)；物理文件缺失的条目跳过
+    """
+    sink = _ZipSink()
+    with zipfile.ZipFile(sink, 'w', allowZip64=True) as zf:
+        for arcname, path, mtime in entries:
+            try:
+                src = open(path, 'rb')
+            except OSError as e:
+                print(f"打包跳过文件{arcname}：{str(e)}")
+                continue
+            with src:
+                zinfo = zipfile.ZipInfo(arcname, date_time=(mtime or datetime.now()).timetuple()[:6])
+                suffix = os.path.splitext(arcname)[1].lower()
+                zinfo.compress_type = zipfile.ZIP_STORED if suffix in STORED_SUFFIXES else zipfile.ZIP_DEFLATED
+                zinfo.file_size = os.fstat(src.fileno()).st_size  # 用于判断是否需要ZIP64
+                with zf.open(zinfo, 'w') as dest:
+                    for block in iter(lambda: src.read(_READ_BUFFER), b''):
+                        dest.write(block)
+                        data = sink.drain()
+                        if data:
+                            yield data
+            data = sink.drain()
+            if data:
+                yield data
+    yield sink.drain()
@@ -0,0 +1,76 @@
+import asyncio
+import time
+from typing import Any, Dict, Optional, Tuple
+
+from app.config import MYSQL_CONFIG, DB_POOL_CONFIG, ASGI_CONFIG
+from app.utils import sql_metrics
+
+try:
+    import aiomysql  # 可选依赖：pip install -r requirements-server.txt（仅 ASGI 模式使用）
+except ImportError:
+    aiomysql = None
+
+_pool: Optional[Any] = None
+
+async def init_async_pool() -> None:
+    """创建异步连接池（ASGI 应用启动时在事件循环内调用）"""
+    global _pool
+    if aiomysql is None:
+        raise RuntimeError("未安装aiomysql，请先运行: pip install -r requirements-server.txt")
+    if _pool is not None:
+        return
+    # 与同步连接池相同：自动提交（只读查询不遗留事务快照），连接存活时间不超过 MAX_LIFETIME
+    _pool = await aiomysql.create_pool(
+        host=MYSQL_CONFIG["host"],
+        port=MYSQL_CONFIG["port"],
+        user=MYSQL_CONFIG["user"],
+        password=MYSQL_CONFIG["password"],
+        db=MYSQL_CONFIG.get("database") or MYSQL_CONFIG["db"],
+        charset=MYSQL_CONFIG["charset"],
+        autocommit=True,
+        minsize=ASGI_CONFIG["DB_POOL_MIN_SIZE"],
+        maxsize=ASGI_CONFIG["DB_POOL_MAX_SIZE"],
+        pool_recycle=int(DB_POOL_CONFIG["MAX_LIFETIME"]),
+        connect_timeout=DB_POOL_CONFIG["CONNECT_TIMEOUT"]
+    )
+
+async def close_async_pool() -> None:
+    """关闭异步连接池（等待借出的连接归还）"""
+    global _pool
+    pool, _pool = _pool, None
+    if pool is not None:
+        pool.close()
+        await pool.wait_closed()
+
+async def _fetch_one(sql: str, params: Tuple[Any, ...]) -> Optional[Dict[str, Any]]:
+    pool = _pool
+    if pool is None:
+        raise RuntimeError("异步连接池未初始化")
+    # 连接耗尽时的等待时间与同步连接池一致
+    conn = await asyncio.wait_for(pool.acquire(), DB_POOL_CONFIG["CHECKOUT_TIMEOUT"])
+    try:
+        async with conn.cursor(aiomysql.DictCursor) as cursor:
+            started = time.perf_counter()
+            try:
+                rows = await cursor.execute(sql, params)
+            except aiomysql.MySQLError as e:
+                if sql_metrics.ENABLED:
+                    sql_metrics.record_query(sql, started, None, e)
+                raise
+            if sql_metrics.ENABLED:
+                sql_metrics.record_query(sql, started, rows)
+            return await cursor.fetchone()
+    except asyncio.CancelledError:
+        # 查询中途被取消（如客户端断开）时连接上可能还有未读完的结果，直接断开不再复用
+        conn.close()
+        raise
+    finally:
+        pool.release(conn)
+
+async def async_query_one(sql: str, params: Tuple[Any, ...] = ()) -> Optional[Dict[str, Any]]:
+    """查询单条结果（失败返回None，与 db_utils.query_one 一致）"""
+    try:
+        return await _fetch_one(sql, params)
+    except (aiomysql.MySQLError, asyncio.TimeoutError, RuntimeError) as e:
+        print(f"查询异常：SQL={sql}, Params={params}, Error={str(e)}")
+        return None
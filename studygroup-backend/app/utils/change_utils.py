@@ -0,0 +1,177 @@
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.config import CHANGES_CONFIG
+from app.utils.db_utils import query_all, execute_sql, execute_many, savepoint
+from app.utils.stats_utils import get_group_members_with_stats
+
+# 变更实体与操作类型（客户端按 实体 -> upserted/deleted 合并到本地列表）
+ENTITY_TASK = 'task'
+ENTITY_FILE = 'file'
+ENTITY_MEMBER = 'member'
+OP_UPSERT = 'upsert'
+OP_DELETE = 'delete'
+
+def record_change(group_id: int, entity: str, entity_id: int, op: str = OP_UPSERT) -> Optional[int]:
+    """
+    在当前请求事务内追加一条变更记录，返回分配的序号（失败只回滚本条记录，返回None）
+    分配序号时锁住该小组的序号行直到事务提交，同一小组的写入在此处串行（放在业务写入之后，缩短持锁时间）
+    """
+    return record_changes(group_id, entity, [entity_id], op)
+
+def record_changes(group_id: int, entity: str, entity_ids: List[int], op: str = OP_UPSERT) -> Optional[int]:
+    """批量版 record_change：一次分配 len(entity_ids) 个连续序号并多行插入，返回最后一个序号"""
+    if not CHANGES_CONFIG["ENABLED"] or not entity_ids:
+        return None
+    count = len(entity_ids)
+    try:
+        with savepoint():
+            # LAST_INSERT_ID(expr) 让新序号作为 lastrowid 返回，一次往返完成“加N并读取”
+            seq_success, last_seq = execute_sql("""
+                INSERT INTO sg_group_change_seq (group_id, last_seq) VALUES (%s, LAST_INSERT_ID(%s))
+                ON DUPLICATE KEY UPDATE last_seq = LAST_INSERT_ID(last_seq + %s)
+            """, (group_id, count, count))
+            if not seq_success or not last_seq:
+                raise Exception("变更序号分配失败")
+            change_time = datetime.now()
+            first_seq = last_seq - count + 1
+            log_success, _ = execute_many("""
+                INSERT INTO sg_change_log (group_id, seq, entity, entity_id, op, change_time)
+                VALUES (%s, %s, %s, %s, %s, %s)
+            """, [(group_id, first_seq + i, entity, entity_id, op, change_time) for i, entity_id in enumerate(entity_ids)])
+            if not log_success:
+                raise Exception("变更记录写入失败")
+        return last_seq
+    except Exception as e:
+        print(f"记录变更失败（小组{group_id} {entity}={entity_ids}）：{str(e)}")
+        return None
+
+def get_change_cursor(group_id: int) -> Optional[Tuple[int, int]]:
+    """返回小组的 (当前最大序号, 已清理的最大序号)；查询失败返回None"""
+    # 用 query_all 区分“尚无变更”（空列表）与查询失败（None）
+    rows = query_all("SELECT last_seq, min_seq FROM sg_group_change_seq WHERE group_id = %s", (group_id,))
+    if rows is None:
+        return None
+    if not rows:
+        return 0, 0
+    return rows[0]['last_seq'], rows[0]['min_seq']
+
+def get_changes(group_id: int, since: Optional[int], limit: int) -> Optional[Dict[str, Any]]:
+    """
+    查询序号 since 之后的变更，同一实体只保留最后一次操作；upsert 附带实体当前数据，delete 只返回ID（墓碑）
+    since 为空、早于已清理的序号或大于当前序号时返回 reset=True（客户端需先全量加载，再从返回的 cursor 开始增量同步）
+    未启用变更日志（CHANGES_CONFIG["ENABLED"]=False）时不记录变更，始终返回 reset=True，客户端每次全量加载
+    查询失败返回None
+    """
+    if not CHANGES_CONFIG["ENABLED"]:
+        last_seq, min_seq = 0, 0
+        since = None
+    else:
+        cursor_info = get_change_cursor(group_id)
+        if cursor_info is None:
+            return None
+        last_seq, min_seq = cursor_info
+    result: Dict[str, Any] = {
+        "cursor": str(last_seq),
+        "reset": False,
+        "has_more": False,
+        "tasks": {"upserted": [], "deleted": []},
+        "files": {"upserted": [], "deleted": []},
+        "members": {"upserted": [], "deleted": []}
+    }
+    if since is None or since < min_seq or since > last_seq:
+        result["reset"] = True
+        return result
+    if since == last_seq:
+        return result
+
+    rows = query_all("""
+        SELECT seq, entity, entity_id, op FROM sg_change_log
+        WHERE group_id = %s AND seq > %s
+        ORDER BY seq
+        LIMIT %s
+    """, (group_id, since, limit + 1))
+    if rows is None:
+        return None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        result["has_more"] = True
+    if rows:
+        result["cursor"] = str(rows[-1]['seq'])
+
+    # 同一实体多次变更时以最后一次为准
+    latest: Dict[Tuple[str, int], str] = {}
+    for row in rows:
+        latest[(row['entity'], row['entity_id'])] = row['op']
+    upsert_ids: Dict[str, List[int]] = {ENTITY_TASK: [], ENTITY_FILE: [], ENTITY_MEMBER: []}
+    for (entity, entity_id), op in latest.items():
+        if entity not in upsert_ids:
+            continue
+        if op == OP_UPSERT:
+            upsert_ids[entity].append(entity_id)
+        else:
+            result[entity + "s"]["deleted"].append(entity_id)
+
+    fetched = {
+        ENTITY_TASK: (_fetch_tasks(group_id, upsert_ids[ENTITY_TASK]), 'task_id'),
+        ENTITY_FILE: (_fetch_files(group_id, upsert_ids[ENTITY_FILE]), 'file_id'),
+        ENTITY_MEMBER: (get_group_members_with_stats(group_id, upsert_ids[ENTITY_MEMBER]), 'user_id')
+    }
+    for entity, (entity_rows, id_field) in fetched.items():
+        if entity_rows is None:
+            return None
+        found = {row[id_field] for row in entity_rows}
+        result[entity + "s"]["upserted"] = entity_rows
+        # 记录之后实体已被删除（删除记录在下一页）：直接按删除返回
+        result[entity + "s"]["deleted"].extend(i for i in upsert_ids[entity] if i not in found)
+    return result
+
+def _id_placeholders(ids: List[int]) -> str:
+    return ", ".join(["%s"] * len(ids))
+
+def _fetch_tasks(group_id: int, task_ids: List[int]) -> Optional[List[Dict[str, Any]]]:
+    """与任务列表接口相同的列"""
+    if not task_ids:
+        return []
+    return query_all(f"""
+        SELECT t.*, u.user_name AS leader_name
+        FROM sg_task t
+        LEFT JOIN sg_user u ON t.leader_id = u.user_id
+        WHERE t.group_id = %s AND t.task_id IN ({_id_placeholders(task_ids)})
+    """, (group_id, *task_ids))
+
+def _fetch_files(group_id: int, file_ids: List[int]) -> Optional[List[Dict[str, Any]]]:
+    """与文件列表接口相同的列"""
+    if not file_ids:
+        return []
+    return query_all(f"""
+        SELECT f.*, u.user_name AS uploader_name
+        FROM sg_file f
+        LEFT JOIN sg_user u ON f.uploader_id = u.user_id
+        WHERE f.group_id = %s AND f.file_id IN ({_id_placeholders(file_ids)})
+    """, (group_id, *file_ids))
+
+def prune_changes(days: Optional[int] = None) -> Optional[int]:
+    """
+    清理早于 days 天的变更记录，返回删除条数（失败返回None）
+    先把各小组的 min_seq 推进到待清理的最大序号，再按 min_seq 删除，游标早于 min_seq 的客户端会收到 reset
+    """
+    days = CHANGES_CONFIG["RETENTION_DAYS"] if days is None else days
+    cutoff = datetime.now() - timedelta(days=days)
+    success, _ = execute_sql("""
+        UPDATE sg_group_change_seq s
+        JOIN (
+            SELECT group_id, MAX(seq) AS max_seq FROM sg_change_log
+            WHERE change_time < %s
+            GROUP BY group_id
+        ) c ON c.group_id = s.group_id
+        SET s.min_seq = GREATEST(s.min_seq, c.max_seq)
+    """, (cutoff,))
+    if not success:
+        return None
+    success, deleted = execute_sql("""
+        DELETE l FROM sg_change_log l
+        JOIN sg_group_change_seq s ON s.group_id = l.group_id
+        WHERE l.seq <= s.min_seq
+    """)
+    return deleted if success else None
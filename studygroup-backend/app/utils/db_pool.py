@@ -0,0 +1,276 @@
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict, List, Optional
+
+import pymysql
+from pymysql.constants import SERVER_STATUS
+
+
+class PoolTimeoutError(pymysql.err.OperationalError):
+    """连接池耗尽且等待超时（继承OperationalError，现有的 MySQLError 捕获逻辑无需改动）"""
+
+
+class _PoolEntry:
+    """池内连接的元信息"""
+    __slots__ = ('raw', 'pid', 'created_at', 'last_used')
+
+    def __init__(self, raw: pymysql.connections.Connection):
+        self.raw = raw
+        self.pid = os.getpid()
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+
+
+class PooledConnection:
+    """借出的连接代理：用法与 pymysql 连接一致，close() 时归还连接池而不是断开"""
+
+    def __init__(self, pool: 'ConnectionPool', entry: _PoolEntry):
+        self._pool = pool
+        self._entry = entry
+        self._released = False
+
+    def __getattr__(self, name: str) -> Any:
+        if self._released:
+            raise pymysql.err.InterfaceError("连接已归还连接池")
+        return getattr(self._entry.raw, name)
+
+    @property
+    def open(self) -> bool:
+        return not self._released and self._entry.raw.open
+
+    def close(self) -> None:
+        """归还连接（重复调用无副作用）"""
+        if not self._released:
+            self._released = True
+            self._pool._release(self._entry)
+
+    def discard(self) -> None:
+        """连接已不可信（如协议错误），直接断开不再复用"""
+        if not self._released:
+            self._released = True
+            self._pool._release(self._entry, discard=True)
+
+
+class ConnectionPool:
+    """线程安全的MySQL连接池
+
+    - 借出时对空闲较久的连接做 ping 健康检查
+    - 超过 min_size 的空闲连接在 idle_timeout 后回收
+    - 存活超过 max_lifetime 的连接在借出/归还时重建
+    - fork 后的子进程自动丢弃父进程的连接（预派生多进程部署）
+    """
+
+    def __init__(self, connect: Callable[[], pymysql.connections.Connection],
+                 min_size: int = 2, max_size: int = 20, checkout_timeout: float = 10,
+                 ping_interval: float = 30, idle_timeout: float = 300, max_lifetime: float = 3600):
+        if max_size < 1:
+            raise ValueError("max_size 必须大于0")
+        self._connect = connect
+        self.min_size = max(0, min(min_size, max_size))
+        self.max_size = max_size
+        self.checkout_timeout = checkout_timeout
+        self.ping_interval = ping_interval
+        self.idle_timeout = idle_timeout
+        self.max_lifetime = max_lifetime
+
+        self._cond = threading.Condition()
+        self._idle: deque = deque()  # 右端为最近归还（LIFO借出，保持热连接）
+        self._size = 0               # 已建立的连接数（空闲 + 借出）
+        self._pid = os.getpid()
+        self._stats = self._empty_stats()
+
+    @staticmethod
+    def _empty_stats() -> Dict[str, Any]:
+        return {
+            'checkouts': 0,              # 借出次数
+            'waits': 0,                  # 因连接耗尽而等待的次数
+            'wait_time_total': 0.0,      # 累计等待秒数
+            'timeouts': 0,               # 等待超时次数
+            'created': 0,                # 新建连接数
+            'closed': 0,                 # 断开连接数
+            'health_check_failures': 0,  # ping失败次数
+            'recycled': 0,               # 因 max_lifetime 重建的次数
+            'evicted_idle': 0            # 因 idle_timeout 回收的次数
+        }
+
+    # ---------- 借出 / 归还 ----------
+
+    def acquire(self, timeout: Optional[float] = None) -> PooledConnection:
+        """借出一个健康的连接，连接耗尽时最多等待 timeout 秒"""
+        timeout = self.checkout_timeout if timeout is None else timeout
+        start = time.monotonic()
+        deadline = start + timeout
+        entry = None
+        to_close: List[_PoolEntry] = []
+        waited = False
+
+        with self._cond:
+            self._check_fork()
+            self._stats['checkouts'] += 1
+            while True:
+                to_close.extend(self._evict_idle_locked(time.monotonic()))
+                if self._idle:
+                    entry = self._idle.pop()
+                    break
+                if self._size < self.max_size:
+                    self._size += 1  # 先占位，在锁外建立连接
+                    break
+                if not waited:
+                    waited = True
+                    self._stats['waits'] += 1
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._stats['timeouts'] += 1
+                    self._stats['wait_time_total'] += time.monotonic() - start
+                    raise PoolTimeoutError(f"获取数据库连接超时（{timeout}秒，连接数上限{self.max_size}）")
+                self._cond.wait(remaining)
+            if waited:
+                self._stats['wait_time_total'] += time.monotonic() - start
+
+        self._close_entries(to_close)
+        try:
+            entry = self._create_entry() if entry is None else self._validate(entry)
+        except Exception:
+            with self._cond:
+                self._size -= 1
+                self._cond.notify()
+            raise
+        return PooledConnection(self, entry)
+
+    def _release(self, entry: _PoolEntry, discard: bool = False) -> None:
+        if entry.pid != os.getpid():
+            return  # fork前借出的连接属于父进程，子进程不能关闭也不能复用
+        raw = entry.raw
+        if not discard and raw.open:
+            try:
+                # 未结束的事务（含只读快照）一律回滚，避免下一个借用者读到旧快照
+                if raw.server_status & SERVER_STATUS.SERVER_STATUS_IN_TRANS:
+                    raw.rollback()
+            except pymysql.MySQLError:
+                discard = True
+        now = time.monotonic()
+        if discard or not raw.open or now - entry.created_at >= self.max_lifetime:
+            if not discard and raw.open:
+                with self._cond:
+                    self._stats['recycled'] += 1
+            self._close_entries([entry])
+            with self._cond:
+                self._size -= 1
+                self._cond.notify()
+            return
+        entry.last_used = now
+        with self._cond:
+            self._idle.append(entry)
+            self._cond.notify()
+
+    # ---------- 连接生命周期 ----------
+
+    def _create_entry(self) -> _PoolEntry:
+        raw = self._connect()
+        with self._cond:
+            self._stats['created'] += 1
+        return _PoolEntry(raw)
+
+    def _validate(self, entry: _PoolEntry) -> _PoolEntry:
+        """借出前检查：超龄重建，空闲较久则ping"""
+        now = time.monotonic()
+        if now - entry.created_at >= self.max_lifetime:
+            with self._cond:
+                self._stats['recycled'] += 1
+            self._close_entries([entry])
+            return self._create_entry()
+        if now - entry.last_used >= self.ping_interval:
+            try:
+                entry.raw.ping(reconnect=False)
+            except pymysql.MySQLError:
+                with self._cond:
+                    self._stats['health_check_failures'] += 1
+                self._close_entries([entry])
+                return self._create_entry()
+        return entry
+
+    def _evict_idle_locked(self, now: float) -> List[_PoolEntry]:
+        """从最久未用的一端回收空闲/超龄连接（调用方持有锁）"""
+        evicted = []
+        while self._idle:
+            oldest = self._idle[0]
+            expired = now - oldest.created_at >= self.max_lifetime
+            idle_too_long = now - oldest.last_used >= self.idle_timeout and self._size > self.min_size
+            if not (expired or idle_too_long):
+                break
+            self._idle.popleft()
+            self._size -= 1
+            self._stats['recycled' if expired else 'evicted_idle'] += 1
+            evicted.append(oldest)
+        return evicted
+
+    def _close_entries(self, entries: List[_PoolEntry]) -> None:
+        for entry in entries:
+            try:
+                if entry.raw.open:
+                    entry.raw.close()
+            except Exception:
+                pass
+        if entries:
+            with self._cond:
+                self._stats['closed'] += len(entries)
+
+    def _check_fork(self) -> None:
+        """子进程不能复用父进程的socket：丢弃继承来的连接（不发送QUIT，避免影响父进程）"""
+        if os.getpid() != self._pid:
+            self._pid = os.getpid()
+            self._idle.clear()
+            self._size = 0
+            self._stats = self._empty_stats()
+
+    # ---------- 维护 / 指标 ----------
+
+    def prefill(self) -> None:
+        """预建 min_size 个连接（失败不抛出，首次借出时再重试）"""
+        while True:
+            with self._cond:
+                self._check_fork()
+                if self._size >= self.min_size:
+                    return
+                self._size += 1
+            try:
+                entry = self._create_entry()
+            except pymysql.MySQLError as e:
+                with self._cond:
+                    self._size -= 1
+                print(f"连接池预热失败：{str(e)}")
+                return
+            self._release(entry)
+
+    def evict_idle(self) -> int:
+        """主动回收空闲超时的连接，返回回收数量"""
+        with self._cond:
+            self._check_fork()
+            evicted = self._evict_idle_locked(time.monotonic())
+        self._close_entries(evicted)
+        return len(evicted)
+
+    def close_all(self) -> None:
+        """断开所有空闲连接（借出中的连接归还时照常处理）"""
+        with self._cond:
+            self._check_fork()
+            entries = list(self._idle)
+            self._idle.clear()
+            self._size -= len(entries)
+        self._close_entries(entries)
+
+    def stats(self) -> Dict[str, Any]:
+        """连接池指标快照"""
+        with self._cond:
+            self._check_fork()
+            snapshot = dict(self._stats)
+            snapshot.update({
+                'size': self._size,
+                'idle': len(self._idle),
+                'in_use': self._size - len(self._idle),
+                'min_size': self.min_size,
+                'max_size': self.max_size
+            })
+        return snapshot
@@ -1,49 +1,94 @@
+import threading
+import time
+from contextlib import contextmanager
 import pymysql
-from pymysql.cursors import DictCursor
-from app.config import MYSQL_CONFIG
-from typing import Tuple, Dict, Any, Optional
+from pymysql.cursors import DictCursor, SSDictCursor
+from pymysql.constants import SERVER_STATUS
+from app.config import MYSQL_CONFIG, DB_POOL_CONFIG, DB_REQUEST_CONFIG
+from app.utils.db_pool import ConnectionPool
+from app.utils import sql_metrics
+from flask import Flask, g, has_request_context, jsonify
+from typing import Tuple, Dict, Any, Optional, Callable, Iterator, List, Sequence
+
+_pool: Optional[ConnectionPool] = None
+_pool_lock = threading.Lock()
+
+def _connect() -> pymysql.connections.Connection:
+    """建立一条新的物理连接（仅供连接池调用）"""
+    # 创建配置副本，过滤掉 pymysql.connect 不支持的参数
+    conn_config = MYSQL_CONFIG.copy()
+    
+    # pymysql.connect 支持的参数列表
+    allowed_keys = ['host', 'port', 'user', 'password', 'database', 
+                   'db', 'charset', 'cursorclass', 'autocommit']
+    
+    # 过滤掉不支持的参数
+    filtered_config = {k: v for k, v in conn_config.items() 
+                      if k in allowed_keys and v is not None}
+    
+    # 如果 db 和 database 同时存在，优先使用 database
+    if 'db' in filtered_config and 'database' not in filtered_config:
+        filtered_config['database'] = filtered_config.pop('db')
+    
+    # 池化连接默认自动提交：单条SELECT不会遗留事务快照，归还时无需回滚
+    filtered_config.setdefault('autocommit', True)
+    filtered_config['connect_timeout'] = DB_POOL_CONFIG["CONNECT_TIMEOUT"]
+    return pymysql.connect(**filtered_config)
+
+def get_pool() -> ConnectionPool:
+    """获取进程内共享的连接池（首次调用时创建并预热）"""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                pool = ConnectionPool(
+                    _connect,
+                    min_size=DB_POOL_CONFIG["MIN_SIZE"],
+                    max_size=DB_POOL_CONFIG["MAX_SIZE"],
+                    checkout_timeout=DB_POOL_CONFIG["CHECKOUT_TIMEOUT"],
+                    ping_interval=DB_POOL_CONFIG["PING_INTERVAL"],
+                    idle_timeout=DB_POOL_CONFIG["IDLE_TIMEOUT"],
+                    max_lifetime=DB_POOL_CONFIG["MAX_LIFETIME"]
+                )
+                pool.prefill()
+                _pool = pool
+    return _pool
+
+def get_pool_stats() -> Dict[str, Any]:
+    """连接池指标（借出、等待、超时、空闲/借出连接数等）"""
+    return get_pool().stats()
 
 def get_db_connection() -> Tuple[pymysql.connections.Connection, pymysql.cursors.Cursor]:
-    """获取数据库连接与DictCursor（返回字典格式结果）"""
+    """从连接池借出连接与DictCursor（返回字典格式结果），用完调用 close_db_resource 归还"""
     try:
-        # 创建配置副本，过滤掉 pymysql.connect 不支持的参数
-        conn_config = MYSQL_CONFIG.copy()
-        
-        # pymysql.connect 支持的参数列表
-        allowed_keys = ['host', 'port', 'user', 'password', 'database', 
-                       'db', 'charset', 'cursorclass', 'autocommit']
-        
-        # 过滤掉不支持的参数
-        filtered_config = {k: v for k, v in conn_config.items() 
-                          if k in allowed_keys and v is not None}
-        
-        # 如果 db 和 database 同时存在，优先使用 database
-        if 'db' in filtered_config and 'database' not in filtered_config:
-            filtered_config['database'] = filtered_config.pop('db')
-        
-        conn = pymysql.connect(**filtered_config)
+        conn = get_pool().acquire()
         cursor = conn.cursor(DictCursor)  # 使用 DictCursor 返回字典
         return conn, cursor
     except pymysql.MySQLError as e:
         raise pymysql.MySQLError(f"数据库连接失败：{str(e)}") from e
 
+def _in_transaction(conn: pymysql.connections.Connection) -> bool:
+    """服务端是否有未结束的事务（读取握手/响应包里的状态位，不产生网络往返）"""
+    return bool(conn.server_status & SERVER_STATUS.SERVER_STATUS_IN_TRANS)
+
 def commit_transaction(conn: pymysql.connections.Connection) -> None:
     """提交事务"""
     try:
-        conn.commit()
+        if _in_transaction(conn):
+            conn.commit()
     except pymysql.MySQLError as e:
         raise pymysql.MySQLError(f"事务提交失败：{str(e)}") from e
 
 def rollback_transaction(conn: pymysql.connections.Connection) -> None:
     """回滚事务"""
     try:
-        if conn.open:
+        if conn.open and _in_transaction(conn):
             conn.rollback()
     except pymysql.MySQLError as e:
         print(f"事务回滚警告：{str(e)}")
 
 def close_db_resource(conn: pymysql.connections.Connection, cursor: pymysql.cursors.Cursor) -> None:
-    """关闭游标与连接"""
+    """关闭游标并将连接归还连接池"""
     try:
         if cursor:
             cursor.close()
@@ -56,46 +101,300 @@ def close_db_resource(conn: pymysql.connections.Connection, cursor: pymysql.curs
         except pymysql.MySQLError as e:
             print(f"连接关闭警告：{str(e)}")
 
+# ---------- 请求级事务（一次请求一条连接、一个事务） ----------
+
+class RequestDB:
+    """绑定在 flask.g 上的请求级数据库上下文：首次执行SQL时借出连接并开启事务，请求结束时统一提交或回滚"""
+
+    def __init__(self):
+        self.conn: Optional[pymysql.connections.Connection] = None
+        self.failed = False    # 请求内有SQL执行失败，结束时回滚
+        self.finished = False  # 已提交/回滚，之后的SQL回退为逐条自动提交（如流式响应）
+        self._savepoint_seq = 0
+        self._on_commit: List[Callable[[], None]] = []
+        self._on_rollback: List[Callable[[], None]] = []
+
+    def connection(self) -> pymysql.connections.Connection:
+        if self.conn is None:
+            conn = get_pool().acquire()
+            try:
+                conn.begin()
+            except pymysql.MySQLError:
+                conn.discard()
+                raise
+            self.conn = conn
+        return self.conn
+
+    def next_savepoint(self) -> str:
+        self._savepoint_seq += 1
+        return f"sg_sp_{self._savepoint_seq}"
+
+    def finish(self, commit: bool) -> None:
+        """结束事务并归还连接；提交失败时抛出 MySQLError（已自动回滚）"""
+        if self.finished:
+            return
+        self.finished = True
+        conn, self.conn = self.conn, None
+        committed = False
+        try:
+            if conn is not None and conn.open:
+                if commit and not self.failed:
+                    try:
+                        commit_transaction(conn)
+                        committed = True
+                    except pymysql.MySQLError:
+                        rollback_transaction(conn)
+                        raise
+                else:
+                    rollback_transaction(conn)
+            else:
+                committed = commit and not self.failed
+        finally:
+            if conn is not None:
+                close_db_resource(conn, None)
+            callbacks = self._on_commit if committed else self._on_rollback
+            self._on_commit, self._on_rollback = [], []
+            for callback in callbacks:
+                try:
+                    callback()
+                except Exception as e:
+                    print(f"事务回调执行失败：{str(e)}")
+
+def _request_db() -> Optional[RequestDB]:
+    """当前请求的数据库上下文（非请求环境或已结束时返回None）"""
+    if not DB_REQUEST_CONFIG["ENABLED"] or not has_request_context():
+        return None
+    request_db = g.get('_request_db')
+    if request_db is None:
+        request_db = g._request_db = RequestDB()
+    return None if request_db.finished else request_db
+
+def _acquire_cursor() -> Tuple[pymysql.connections.Connection, pymysql.cursors.Cursor, bool]:
+    """返回 (连接, 游标, 是否独占)：请求内复用请求事务的连接，否则从连接池单独借出"""
+    request_db = _request_db()
+    if request_db is not None:
+        conn = request_db.connection()
+        return conn, conn.cursor(DictCursor), False
+    conn, cursor = get_db_connection()
+    return conn, cursor, True
+
+def on_request_commit(callback: Callable[[], None]) -> None:
+    """注册请求事务提交成功后的回调（如删除物理文件、失效缓存）；不在请求事务中时立即执行"""
+    request_db = _request_db()
+    if request_db is None:
+        callback()
+    else:
+        request_db._on_commit.append(callback)
+
+def on_request_rollback(callback: Callable[[], None]) -> None:
+    """注册请求事务回滚后的回调（如清理已写入磁盘的文件）；不在请求事务中时忽略"""
+    request_db = _request_db()
+    if request_db is not None:
+        request_db._on_rollback.append(callback)
+
+def mark_request_failed() -> None:
+    """标记当前请求事务在结束时回滚（业务校验失败但已有写入时使用）"""
+    request_db = _request_db()
+    if request_db is not None:
+        request_db.failed = True
+
+@contextmanager
+def savepoint() -> Iterator[None]:
+    """可选写入（如统计、日志）：块内SQL失败只回滚到保存点，不影响请求事务的提交"""
+    request_db = _request_db()
+    if request_db is None:
+        yield
+        return
+    name = request_db.next_savepoint()
+    cursor = request_db.connection().cursor()
+    failed_before, request_db.failed = request_db.failed, False
+    try:
+        try:
+            cursor.execute(f"SAVEPOINT {name}")
+        except pymysql.MySQLError:
+            request_db.failed = True
+            raise
+        try:
+            yield
+        except Exception:
+            request_db.failed = True
+            raise
+        finally:
+            try:
+                if request_db.failed:
+                    cursor.execute(f"ROLLBACK TO SAVEPOINT {name}")
+                else:
+                    cursor.execute(f"RELEASE SAVEPOINT {name}")
+                request_db.failed = failed_before
+            except pymysql.MySQLError as e:
+                # 保存点失效（如死锁导致整个事务已回滚），整个请求事务只能回滚
+                print(f"保存点处理异常：{str(e)}")
+                request_db.failed = True
+    finally:
+        cursor.close()
+
+def init_request_db(app: Flask) -> None:
+    """注册请求级事务钩子：响应返回前提交，异常或失败时回滚"""
+
+    @app.after_request
+    def _commit_request_db(response):
+        request_db = g.get('_request_db')
+        if request_db is None or request_db.finished:
+            return response
+        try:
+            request_db.finish(commit=True)
+        except pymysql.MySQLError as e:
+            print(f"请求事务提交失败：{str(e)}")
+            return jsonify({"code": 500, "msg": "数据保存失败，请重试"})
+        return response
+
+    @app.teardown_request
+    def _rollback_request_db(exc):
+        request_db = g.get('_request_db')
+        if request_db is not None and not request_db.finished:
+            request_db.finish(commit=False)
+
+def _execute(cursor: pymysql.cursors.Cursor, sql: str, params: Any, many: bool = False) -> int:
+    """执行SQL并记录耗时/行数（SQL_METRICS_CONFIG["MODE"]=off 时直接执行）"""
+    if not sql_metrics.ENABLED:
+        return cursor.executemany(sql, params) if many else cursor.execute(sql, params)
+    started = time.perf_counter()
+    try:
+        result = cursor.executemany(sql, params) if many else cursor.execute(sql, params)
+    except pymysql.MySQLError as e:
+        sql_metrics.record_query(sql, started, None, e)
+        raise
+    sql_metrics.record_query(sql, started, result)
+    return result
+
 def query_one(sql: str, params: Tuple[Any, ...] = ()) -> Optional[Dict[str, Any]]:
     """查询单条结果"""
-    conn, cursor = None, None
+    conn, cursor, owned = None, None, True
     try:
-        conn, cursor = get_db_connection()
-        cursor.execute(sql, params)
+        conn, cursor, owned = _acquire_cursor()
+        _execute(cursor, sql, params)
         return cursor.fetchone()
     except pymysql.MySQLError as e:
         print(f"查询异常：SQL={sql}, Params={params}, Error={str(e)}")
         return None
     finally:
-        close_db_resource(conn, cursor)
+        close_db_resource(conn if owned else None, cursor)
 
 def query_all(sql: str, params: Tuple[Any, ...] = ()) -> Optional[list[Dict[str, Any]]]:
     """查询多条结果"""
-    conn, cursor = None, None
+    conn, cursor, owned = None, None, True
     try:
-        conn, cursor = get_db_connection()
-        cursor.execute(sql, params)
+        conn, cursor, owned = _acquire_cursor()
+        _execute(cursor, sql, params)
         return cursor.fetchall() or []
     except pymysql.MySQLError as e:
         print(f"查询异常：SQL={sql}, Params={params}, Error={str(e)}")
         return None
     finally:
-        close_db_resource(conn, cursor)
+        close_db_resource(conn if owned else None, cursor)
 
 def execute_sql(sql: str, params: Tuple[Any, ...] = ()) -> Tuple[bool, Optional[int]]:
-    """执行增删改SQL"""
-    conn, cursor = None, None
+    """执行增删改SQL（请求内随请求事务统一提交，否则立即提交）"""
+    conn, cursor, owned = None, None, True
     try:
-        conn, cursor = get_db_connection()
-        affected_rows = cursor.execute(sql, params)
-        commit_transaction(conn)
+        conn, cursor, owned = _acquire_cursor()
+        affected_rows = _execute(cursor, sql, params)
+        if owned:
+            commit_transaction(conn)
         if sql.strip().upper().startswith("INSERT"):
             return True, cursor.lastrowid
         return True, affected_rows
     except pymysql.MySQLError as e:
-        if conn:
+        if not owned:
+            mark_request_failed()
+        elif conn:
             rollback_transaction(conn)
         print(f"执行异常：SQL={sql}, Params={params}, Error={str(e)}")
         return False, None
     finally:
-        close_db_resource(conn, cursor)
\ No newline at end of file
+        close_db_resource(conn if owned else None, cursor)
+
+def execute_many(sql: str, params_list: Sequence[Tuple[Any, ...]]) -> Tuple[bool, Optional[int]]:
+    """
+    批量执行同一条增删改SQL（INSERT ... VALUES 由驱动合并为多行插入，一次往返），返回 (是否成功, 影响行数)
+    """
+    success, affected_rows, _ = _execute_many(sql, params_list)
+    return success, affected_rows
+
+def execute_many_insert(sql: str, params_list: Sequence[Tuple[Any, ...]]) -> Tuple[bool, List[int]]:
+    """
+    多行插入并返回各行自增ID（失败返回 (False, [])）
+    单条多行 INSERT 的自增值连续分配（innodb_autoinc_lock_mode 任意取值下对“行数已知的简单插入”均成立），
+    由第一行ID推算；调用方需控制批量大小，使驱动只生成一条语句（默认上限约1MB）
+    """
+    success, affected_rows, first_id = _execute_many(sql, params_list)
+    if not success or not first_id:
+        return False, []
+    return True, list(range(first_id, first_id + affected_rows))
+
+def _execute_many(sql: str, params_list: Sequence[Tuple[Any, ...]]) -> Tuple[bool, Optional[int], Optional[int]]:
+    if not params_list:
+        return True, 0, None
+    conn, cursor, owned = None, None, True
+    try:
+        conn, cursor, owned = _acquire_cursor()
+        affected_rows = _execute(cursor, sql, params_list, many=True)
+        if owned:
+            commit_transaction(conn)
+        return True, affected_rows, cursor.lastrowid
+    except pymysql.MySQLError as e:
+        if not owned:
+            mark_request_failed()
+        elif conn:
+            rollback_transaction(conn)
+        print(f"批量执行异常：SQL={sql}, 行数={len(params_list)}, Error={str(e)}")
+        return False, None, None
+    finally:
+        close_db_resource(conn if owned else None, cursor)
+
+class StreamingResult:
+    """无缓冲查询结果：逐批从服务端读取行，迭代结束或 close() 时归还连接"""
+
+    def __init__(self, conn: pymysql.connections.Connection, cursor: pymysql.cursors.Cursor, batch_size: int):
+        self._conn = conn
+        self._cursor = cursor
+        self._batch_size = batch_size
+        self._exhausted = False
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        try:
+            while True:
+                rows = self._cursor.fetchmany(self._batch_size)
+                if not rows:
+                    self._exhausted = True
+                    return
+                yield from rows
+        finally:
+            self.close()
+
+    def close(self) -> None:
+        if self._conn is None:
+            return
+        conn, self._conn = self._conn, None
+        if self._exhausted:
+            close_db_resource(conn, self._cursor)
+        else:
+            # 未读完的无缓冲结果需要把剩余行全部读掉才能复用连接，直接断开更省
+            conn.discard()
+
+def query_stream(sql: str, params: Tuple[Any, ...] = (), batch_size: int = 500) -> Optional[StreamingResult]:
+    """
+    流式查询（SSDictCursor，不在内存中缓存整个结果集），查询失败返回None
+    使用独立连接（不参与请求事务），适合响应体边查边写的大列表导出
+    """
+    conn, cursor = None, None
+    try:
+        conn = get_pool().acquire()
+        cursor = conn.cursor(SSDictCursor)
+        _execute(cursor, sql, params)
+        return StreamingResult(conn, cursor, batch_size)
+    except pymysql.MySQLError as e:
+        print(f"查询异常：SQL={sql}, Params={params}, Error={str(e)}")
+        if conn is not None:
+            conn.discard()
+        return None
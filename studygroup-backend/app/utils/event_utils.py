@@ -0,0 +1,247 @@
+import json
+import os
+import queue
+import secrets
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Iterator, List, Optional, Set, Tuple
+
+from app.config import EVENTS_CONFIG
+from app.utils.db_utils import on_request_commit
+from app.utils.json_utils import json_default
+
+try:
+    import redis  # 可选依赖：pip install redis（多进程/多机部署时跨进程推送）
+except ImportError:
+    redis = None
+
+# 事件对象：{'id': 事件ID, 'event': 事件类型, 'data': JSON字符串}
+# 订阅方断线重连时携带 Last-Event-ID，重放其后的事件；无法重放（过旧/服务已重启）时先推送 reset，客户端应全量刷新
+RESET_EVENT = 'reset'
+_CLOSED = object()
+
+# 本进程正在保持的 SSE 连接数（fork 出的 worker 按 pid 重新计数）
+_streams_lock = threading.Lock()
+_open_streams = 0
+_streams_pid = os.getpid()
+
+def _dumps(data: Dict[str, Any]) -> str:
+    return json.dumps(data, default=json_default, ensure_ascii=False, separators=(',', ':'))
+
+class MemorySubscription:
+    """进程内订阅：有界队列，消费过慢导致队列写满时结束推送（客户端带 Last-Event-ID 重连后重放）"""
+
+    def __init__(self, broker: 'MemoryEventBroker', group_id: int, backlog: List[Dict[str, str]]):
+        self._broker = broker
+        self.group_id = group_id
+        self._queue: 'queue.Queue' = queue.Queue(maxsize=max(EVENTS_CONFIG["QUEUE_SIZE"], len(backlog)))
+        self._overflowed = False
+        for event in backlog:
+            self._queue.put_nowait(event)
+
+    def put(self, event: Dict[str, str]) -> None:
+        try:
+            self._queue.put_nowait(event)
+        except queue.Full:
+            self._overflowed = True
+            self._broker._unsubscribe(self)
+
+    def get(self, timeout: float) -> Any:
+        """等待下一条事件：超时返回None，订阅已失效返回 _CLOSED"""
+        if self._overflowed:
+            return _CLOSED
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def close(self) -> None:
+        self._broker._unsubscribe(self)
+
+class MemoryEventBroker:
+    """进程内发布/订阅（单进程部署或开发环境）；每个小组保留最近 REPLAY_SIZE 条事件用于断线续传"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._epoch = secrets.token_hex(4)  # 进程重启后事件ID不可比较，用前缀区分
+        self._seq: Dict[int, int] = {}  # 每个小组独立递增，便于判断重放是否有缺口
+        self._history: Dict[int, Deque[Tuple[int, Dict[str, str]]]] = {}
+        self._subscribers: Dict[int, Set[MemorySubscription]] = {}
+
+    def publish(self, group_id: int, event_type: str, data: Dict[str, Any]) -> str:
+        payload = _dumps(data)
+        with self._lock:
+            seq = self._seq.get(group_id, 0) + 1
+            self._seq[group_id] = seq
+            event = {'id': f"{self._epoch}-{seq}", 'event': event_type, 'data': payload}
+            history = self._history.setdefault(group_id, deque(maxlen=EVENTS_CONFIG["REPLAY_SIZE"]))
+            history.append((seq, event))
+            subscribers = list(self._subscribers.get(group_id, ()))
+        for subscription in subscribers:
+            subscription.put(event)
+        return event['id']
+
+    def subscribe(self, group_id: int, last_event_id: Optional[str] = None) -> MemorySubscription:
+        with self._lock:
+            backlog = self._replay(group_id, last_event_id) if last_event_id else []
+            subscription = MemorySubscription(self, group_id, backlog)
+            self._subscribers.setdefault(group_id, set()).add(subscription)
+        return subscription
+
+    def _replay(self, group_id: int, last_event_id: str) -> List[Dict[str, str]]:
+        history = self._history.get(group_id, ())
+        epoch, _, last_seq = last_event_id.partition('-')
+        if epoch != self._epoch or not last_seq.isdigit() or int(last_seq) > self._seq.get(group_id, 0):
+            return [_reset_event()]
+        last_seq = int(last_seq)
+        # 最早保留的事件之前还有未收到的事件（已被淘汰）：无法完整重放
+        if history and history[0][0] > last_seq + 1:
+            return [_reset_event()]
+        return [event for seq, event in history if seq > last_seq]
+
+    def _unsubscribe(self, subscription: MemorySubscription) -> None:
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.group_id)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[subscription.group_id]
+
+class RedisSubscription:
+    """基于 Redis Stream 的订阅：XREAD BLOCK 从上次收到的事件ID之后读取"""
+
+    def __init__(self, client: Any, key: str, last_id: str, backlog: List[Dict[str, str]]):
+        self._client = client
+        self._key = key
+        self._last_id = last_id
+        self._buffer: Deque[Dict[str, str]] = deque(backlog)
+
+    def get(self, timeout: float) -> Any:
+        if not self._buffer:
+            result = self._client.xread({self._key: self._last_id}, count=100, block=int(timeout * 1000))
+            for _, entries in result or ():
+                for entry_id, fields in entries:
+                    self._last_id = entry_id
+                    self._buffer.append({'id': entry_id, 'event': fields['event'], 'data': fields['data']})
+        return self._buffer.popleft() if self._buffer else None
+
+    def close(self) -> None:
+        pass
+
+class RedisEventBroker:
+    """Redis Stream 发布/订阅（多进程/多机部署）：每个小组一个 stream，保留约 REPLAY_SIZE 条"""
+
+    def __init__(self, url: str):
+        self._client = redis.Redis.from_url(url, decode_responses=True)
+
+    @staticmethod
+    def _key(group_id: int) -> str:
+        return f"sg:events:{group_id}"
+
+    def publish(self, group_id: int, event_type: str, data: Dict[str, Any]) -> str:
+        return self._client.xadd(
+            self._key(group_id), {'event': event_type, 'data': _dumps(data)},
+            maxlen=EVENTS_CONFIG["REPLAY_SIZE"], approximate=True
+        )
+
+    def subscribe(self, group_id: int, last_event_id: Optional[str] = None) -> RedisSubscription:
+        key = self._key(group_id)
+        if not last_event_id:
+            # 从当前最新事件之后开始（'$' 在重复调用时会漏掉两次读取之间的事件，这里取定具体ID）
+            latest = self._client.xrevrange(key, count=1)
+            return RedisSubscription(self._client, key, latest[0][0] if latest else '0-0', [])
+        backlog = []
+        # stream ID 不连续，只能判断：客户端最后收到的事件已被裁剪掉（且更早于现存最旧事件）时无法完整重放
+        if not _valid_stream_id(last_event_id) or self._trimmed_since(key, last_event_id):
+            backlog.append(_reset_event())
+            latest = self._client.xrevrange(key, count=1)
+            last_event_id = latest[0][0] if latest else '0-0'
+        return RedisSubscription(self._client, key, last_event_id, backlog)
+
+    def _trimmed_since(self, key: str, last_event_id: str) -> bool:
+        if self._client.xrange(key, min=last_event_id, max=last_event_id, count=1):
+            return False
+        oldest = self._client.xrange(key, count=1)
+        return bool(oldest) and _stream_id(oldest[0][0]) > _stream_id(last_event_id)
+
+def _valid_stream_id(event_id: str) -> bool:
+    ms, _, seq = event_id.partition('-')
+    return ms.isdigit() and seq.isdigit()
+
+def _stream_id(event_id: str) -> tuple:
+    ms, _, seq = event_id.partition('-')
+    return int(ms), int(seq)
+
+def _reset_event() -> Dict[str, str]:
+    return {'id': '', 'event': RESET_EVENT, 'data': '{}'}
+
+
+_broker: Any = None
+_broker_pid: Optional[int] = None
+_broker_lock = threading.Lock()
+
+def get_broker() -> Any:
+    """按 EVENTS_CONFIG["BACKEND"] 创建的进程内单例（redis 未安装时退回内存实现）"""
+    global _broker, _broker_pid
+    if _broker is None or _broker_pid != os.getpid():
+        with _broker_lock:
+            if _broker is None or _broker_pid != os.getpid():
+                if EVENTS_CONFIG["BACKEND"] == 'redis' and redis is not None:
+                    _broker = RedisEventBroker(EVENTS_CONFIG["REDIS_URL"])
+                else:
+                    if EVENTS_CONFIG["BACKEND"] == 'redis':
+                        print("未安装redis，事件推送退回进程内实现（多进程部署时仅同进程订阅者可收到）")
+                    _broker = MemoryEventBroker()
+                _broker_pid = os.getpid()
+    return _broker
+
+def emit_group_event(group_id: int, event_type: str, data: Dict[str, Any]) -> None:
+    """在请求事务提交后向小组订阅者推送事件（事务回滚则不推送）；推送失败不影响业务"""
+    def publish() -> None:
+        try:
+            get_broker().publish(int(group_id), event_type, data)
+        except Exception as e:
+            print(f"事件推送失败（{event_type}）：{str(e)}")
+    on_request_commit(publish)
+
+def acquire_stream_slot() -> bool:
+    """占用一个 SSE 连接名额；本进程连接数已达 MAX_STREAMS 时返回False（长连接不会占满处理普通请求的线程）"""
+    global _open_streams, _streams_pid
+    with _streams_lock:
+        if _streams_pid != os.getpid():
+            _open_streams, _streams_pid = 0, os.getpid()
+        if EVENTS_CONFIG["MAX_STREAMS"] and _open_streams >= EVENTS_CONFIG["MAX_STREAMS"]:
+            return False
+        _open_streams += 1
+        return True
+
+def release_stream_slot() -> None:
+    global _open_streams
+    with _streams_lock:
+        if _streams_pid == os.getpid() and _open_streams > 0:
+            _open_streams -= 1
+
+def sse_busy() -> str:
+    """连接数已满时的 SSE 响应体：不推送事件，只让客户端 BUSY_RETRY_MS 后重连"""
+    return f"retry: {EVENTS_CONFIG['BUSY_RETRY_MS']}\n\n"
+
+def sse_stream(subscription: Any) -> Iterator[str]:
+    """
+    SSE 输出：事件按 id/event/data 格式输出，空闲 HEARTBEAT_INTERVAL 秒发送注释行保活
+    连接最长保持 MAX_STREAM_SECONDS 秒后主动结束，客户端（EventSource）自动带 Last-Event-ID 重连
+    """
+    deadline = time.monotonic() + EVENTS_CONFIG["MAX_STREAM_SECONDS"]
+    try:
+        yield f"retry: {EVENTS_CONFIG['RETRY_MS']}\n\n"
+        while time.monotonic() < deadline:
+            event = subscription.get(timeout=EVENTS_CONFIG["HEARTBEAT_INTERVAL"])
+            if event is _CLOSED:
+                break
+            if event is None:
+                yield ": ping\n\n"
+                continue
+            id_line = f"id: {event['id']}\n" if event['id'] else ""
+            yield f"{id_line}event: {event['event']}\ndata: {event['data']}\n\n"
+    finally:
+        subscription.close()
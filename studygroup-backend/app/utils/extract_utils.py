@@ -0,0 +1,141 @@
+import os
+import re
+import zipfile
+from typing import Iterator, List, Optional
+from xml.etree import ElementTree as ET
+
+try:
+    from pypdf import PdfReader  # 可选依赖：pip install pypdf（未安装时不提取PDF文本）
+except ImportError:
+    PdfReader = None
+
+# 可提取文本的文件类型（docx/pptx/xlsx 为zip+XML，标准库即可解析）
+TEXT_SUFFIXES = {'.txt', '.docx', '.pptx', '.xlsx', '.pdf'}
+
+_W = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}'
+_A = '{http://schemas.openxmlformats.org/drawingml/2006/main}'
+_S = '{http://schemas.openxmlformats.org/spreadsheetml/2006/main}'
+_PART_NUMBER_RE = re.compile(r'(\d+)\.xml$')
+
+def extract_text(path: str, suffix: str, first_page_only: bool = False, max_chars: int = 100000) -> Optional[str]:
+    """
+    提取文档文本（最多 max_chars 个字符）
+    first_page_only：只取第一页/第一张幻灯片/第一个工作表（docx 取到第一个分页符为止）
+    不支持的类型、缺少依赖或解析失败时返回None
+    """
+    suffix = suffix.lower()
+    try:
+        if suffix == '.txt':
+            return _read_txt(path, max_chars)
+        if suffix == '.docx':
+            return _join_limited(_docx_lines(path, first_page_only), max_chars)
+        if suffix == '.pptx':
+            return _join_limited(_pptx_lines(path, first_page_only), max_chars)
+        if suffix == '.xlsx':
+            return _join_limited(_xlsx_lines(path, first_page_only), max_chars)
+        if suffix == '.pdf' and PdfReader is not None:
+            return _join_limited(_pdf_lines(path, first_page_only), max_chars)
+    except Exception as e:
+        print(f"文本提取失败（{os.path.basename(path)}）：{str(e)}")
+    return None
+
+def _join_limited(lines: Iterator[str], max_chars: int) -> str:
+    """逐行拼接，达到上限后停止解析（大文档不必全部读完）"""
+    parts: List[str] = []
+    total = 0
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        parts.append(line)
+        total += len(line) + 1
+        if total >= max_chars:
+            break
+    return "\n".join(parts)[:max_chars]
+
+def _read_txt(path: str, max_chars: int) -> str:
+    with open(path, 'rb') as f:
+        raw = f.read(max_chars * 4)
+    for encoding in ('utf-8-sig', 'gb18030'):
+        try:
+            return raw.decode(encoding)[:max_chars]
+        except UnicodeDecodeError:
+            continue
+    return raw.decode('utf-8', errors='replace')[:max_chars]
+
+def _numbered_parts(zf: zipfile.ZipFile, prefix: str) -> List[str]:
+    """按序号排序的部件名，如 ppt/slides/slide1.xml、slide2.xml…"""
+    names = [name for name in zf.namelist() if name.startswith(prefix) and _PART_NUMBER_RE.search(name)]
+    return sorted(names, key=lambda name: int(_PART_NUMBER_RE.search(name).group(1)))
+
+def _docx_lines(path: str, first_page_only: bool) -> Iterator[str]:
+    with zipfile.ZipFile(path) as zf, zf.open('word/document.xml') as xml:
+        buffer: List[str] = []
+        for event, elem in ET.iterparse(xml, events=('start', 'end')):
+            if event == 'start':
+                if first_page_only and (elem.tag == f'{_W}lastRenderedPageBreak' or
+                                        (elem.tag == f'{_W}br' and elem.get(f'{_W}type') == 'page')):
+                    yield ''.join(buffer)
+                    return
+                continue
+            if elem.tag == f'{_W}t':
+                buffer.append(elem.text or '')
+            elif elem.tag == f'{_W}tab':
+                buffer.append('\t')
+            elif elem.tag == f'{_W}p':
+                yield ''.join(buffer)
+                buffer = []
+                elem.clear()
+        yield ''.join(buffer)
+
+def _pptx_lines(path: str, first_page_only: bool) -> Iterator[str]:
+    with zipfile.ZipFile(path) as zf:
+        slides = _numbered_parts(zf, 'ppt/slides/slide')
+        for slide in slides[:1] if first_page_only else slides:
+            with zf.open(slide) as xml:
+                buffer: List[str] = []
+                for _, elem in ET.iterparse(xml):
+                    if elem.tag == f'{_A}t':
+                        buffer.append(elem.text or '')
+                    elif elem.tag == f'{_A}p':
+                        yield ''.join(buffer)
+                        buffer = []
+                        elem.clear()
+
+def _xlsx_lines(path: str, first_page_only: bool) -> Iterator[str]:
+    with zipfile.ZipFile(path) as zf:
+        shared: List[str] = []
+        if 'xl/sharedStrings.xml' in zf.namelist():
+            with zf.open('xl/sharedStrings.xml') as xml:
+                for _, elem in ET.iterparse(xml):
+                    if elem.tag == f'{_S}si':
+                        shared.append(''.join(t.text or '' for t in elem.iter(f'{_S}t')))
+                        elem.clear()
+        sheets = _numbered_parts(zf, 'xl/worksheets/sheet')
+        for sheet in sheets[:1] if first_page_only else sheets:
+            with zf.open(sheet) as xml:
+                for _, elem in ET.iterparse(xml):
+                    if elem.tag != f'{_S}row':
+                        continue
+                    cells = []
+                    for cell in elem.iter(f'{_S}c'):
+                        cell_type = cell.get('t')
+                        if cell_type == 'inlineStr':
+                            cells.append(''.join(t.text or '' for t in cell.iter(f'{_S}t')))
+                            continue
+                        value = cell.find(f'{_S}v')
+                        if value is None or value.text is None:
+                            continue
+                        if cell_type == 's':
+                            index = int(value.text)
+                            cells.append(shared[index] if index < len(shared) else '')
+                        else:
+                            cells.append(value.text)
+                    yield '\t'.join(cells)
+                    elem.clear()
+
+def _pdf_lines(path: str, first_page_only: bool) -> Iterator[str]:
+    reader = PdfReader(path)
+    pages = reader.pages[:1] if first_page_only else reader.pages
+    for page in pages:
+        yield from (page.extract_text() or '').splitlines()
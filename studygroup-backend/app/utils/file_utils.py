@@ -1,16 +1,31 @@
+import hashlib
 import os
+import re
+import secrets
+import shutil
+import time
 from datetime import datetime
+from typing import Any, Dict, List, Optional
 
 from app.config import UPLOAD_CONFIG
+from app.utils.rendition_utils import delete_renditions
+
+_COPY_BUFFER = 64 * 1024
+_HASH_RE = re.compile(r'^[0-9a-f]{64}$')
 
 def generate_store_name(group_id: int, original_filename: str, rule: str) -> str:
     """生成唯一存储文件名（按配置规则）"""
     suffix = os.path.splitext(original_filename)[1].lower()
     timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
+    # 时间戳只精确到秒，同一小组同一秒的上传靠随机串区分
+    token = secrets.token_hex(4)
+    if '{token}' not in rule:
+        rule = rule.replace('{suffix}', '_{token}{suffix}') if '{suffix}' in rule else rule + '_{token}'
     # 替换规则中的占位符
     return rule.format(
         group_id=group_id,
         timestamp=timestamp,
+        token=token,
         suffix=suffix
     )
 
@@ -20,9 +35,32 @@ def save_uploaded_file(upload_file, base_path: str, group_id: int, store_name: s
     group_dir = os.path.join(base_path, str(group_id))
     if not os.path.exists(group_dir):
         os.makedirs(group_dir)
-    # 保存文件
+    # 保存文件（同名文件已存在时抛出 FileExistsError，不覆盖其他记录的文件）
     file_path = os.path.join(group_dir, store_name)
-    upload_file.save(file_path)
+    with open(file_path, 'xb') as f:
+        upload_file.save(f)
+    return file_path
+
+def move_file_to_group(src_path: str, base_path: str, group_id: int, store_name: str) -> str:
+    """
+    把暂存目录中已合并的文件移入小组目录（同一文件系统内，不复制数据）
+    目标已存在时抛出 FileExistsError 且源文件保留（不覆盖其他记录的文件，分片可重新提交）
+    """
+    group_dir = os.path.join(base_path, str(group_id))
+    if not os.path.exists(group_dir):
+        os.makedirs(group_dir)
+    file_path = os.path.join(group_dir, store_name)
+    try:
+        # 硬链接在目标存在时失败，检查与放置是原子的
+        os.link(src_path, file_path)
+    except FileExistsError:
+        raise
+    except OSError:
+        # 文件系统不支持硬链接：先独占创建目标占位，再用rename替换自己创建的占位文件
+        os.close(os.open(file_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+        os.replace(src_path, file_path)
+        return file_path
+    os.remove(src_path)
     return file_path
 
 def delete_physical_file(file_path: str) -> bool:
@@ -47,4 +85,183 @@ def get_file_size_kb(file_obj) -> int:
     else:
         # 本地文件路径
         size_byte = os.path.getsize(file_obj)
-    return int(size_byte / 1024)  # 转为KB
\ No newline at end of file
+    return int(size_byte / 1024)  # 转为KB
+
+# ---------- 内容寻址存储（UPLOAD_CONFIG["DEDUP_ENABLED"]） ----------
+
+def blob_path(content_hash: str) -> str:
+    """内容哈希 -> 存储路径（两级目录散列，避免单目录文件过多）"""
+    return os.path.join(UPLOAD_CONFIG["BLOB_PATH"], content_hash[:2], content_hash[2:4], content_hash)
+
+def resolve_file_path(file_info: Dict[str, Any]) -> str:
+    """sg_file 记录 -> 物理文件路径（有 content_hash 的读共享内容，否则读小组目录）"""
+    if file_info.get('content_hash'):
+        return blob_path(file_info['content_hash'])
+    return os.path.join(UPLOAD_CONFIG["BASE_PATH"], str(file_info['group_id']), file_info['store_name'])
+
+def file_etag(file_info: Dict[str, Any], full_path: str) -> str:
+    """下载用强ETag：去重存储用内容哈希，否则用 大小+修改时间（文件不存在时抛出 OSError）"""
+    if file_info.get('content_hash'):
+        return file_info['content_hash']
+    stat = os.stat(full_path)
+    return f"{stat.st_size:x}-{stat.st_mtime_ns:x}"
+
+def accel_redirect_uri(full_path: str) -> str:
+    """物理路径 -> nginx internal location 中的URI（BLOB_PATH 默认位于 BASE_PATH 下，先匹配）"""
+    for root, prefix in ((UPLOAD_CONFIG["BLOB_PATH"], UPLOAD_CONFIG["ACCEL_BLOBS_PREFIX"]),
+                         (UPLOAD_CONFIG["BASE_PATH"], UPLOAD_CONFIG["ACCEL_FILES_PREFIX"])):
+        rel_path = os.path.relpath(os.path.abspath(full_path), os.path.abspath(root))
+        if not rel_path.startswith(os.pardir):
+            # 存储文件名均由系统生成（小组ID/时间戳/哈希），无需再做URL编码
+            return prefix.rstrip('/') + '/' + rel_path.replace(os.sep, '/')
+    raise ValueError(f"文件不在上传目录中：{full_path}")
+
+def _blob_tmp_path() -> str:
+    tmp_dir = os.path.join(UPLOAD_CONFIG["BLOB_PATH"], ".tmp")
+    os.makedirs(tmp_dir, exist_ok=True)
+    return os.path.join(tmp_dir, secrets.token_hex(16))
+
+def _commit_blob(tmp_path: str, content_hash: str) -> bool:
+    """把已算好哈希的临时文件放入内容存储；内容已存在时丢弃临时文件。返回是否新写入"""
+    target = blob_path(content_hash)
+    try:
+        # 刷新已有内容的mtime，使其在宽限期内不会被并发的删除回收
+        os.utime(target)
+        os.remove(tmp_path)
+        return False
+    except FileNotFoundError:
+        pass
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    os.replace(tmp_path, target)
+    return True
+
+def save_blob_from_stream(stream) -> Dict[str, Any]:
+    """边读上传流边计算SHA-256并写入临时文件，再按哈希入库；返回 {'content_hash', 'path', 'created'}"""
+    tmp_path = _blob_tmp_path()
+    hasher = hashlib.sha256()
+    try:
+        with open(tmp_path, 'wb') as f:
+            while True:
+                block = stream.read(_COPY_BUFFER)
+                if not block:
+                    break
+                hasher.update(block)
+                f.write(block)
+        content_hash = hasher.hexdigest()
+        created = _commit_blob(tmp_path, content_hash)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return {'content_hash': content_hash, 'path': blob_path(content_hash), 'created': created}
+
+def save_blob_from_file(src_path: str, content_hash: str) -> Dict[str, Any]:
+    """把已知哈希的本地文件（如分片合并结果）移入内容存储；返回 {'content_hash', 'path', 'created'}"""
+    tmp_path = _blob_tmp_path()
+    shutil.move(src_path, tmp_path)  # BLOB_PATH 可能在另一块磁盘上
+    try:
+        created = _commit_blob(tmp_path, content_hash)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return {'content_hash': content_hash, 'path': blob_path(content_hash), 'created': created}
+
+def _blob_in_grace(path: str) -> bool:
+    try:
+        return os.path.getmtime(path) > time.time() - UPLOAD_CONFIG["BLOB_GRACE_SECONDS"]
+    except OSError:
+        return False
+
+def release_blob(content_hash: str) -> bool:
+    """
+    sg_file 不再引用该内容时删除（在删除记录的事务提交后调用）
+    宽限期内写入/复用过的内容暂不删除，由 flask gc-blobs 回收；返回是否已删除
+    """
+    from app.utils.db_utils import query_one
+
+    row = query_one("SELECT COUNT(*) AS refs FROM sg_file WHERE content_hash = %s", (content_hash,))
+    if row is None or row['refs'] > 0:
+        return False
+    path = blob_path(content_hash)
+    if _blob_in_grace(path):
+        return False
+    delete_renditions(path)
+    return delete_physical_file(path)
+
+def gc_blobs(dry_run: bool = False) -> Dict[str, int]:
+    """回收未被 sg_file 引用且超过宽限期的内容（以及中断上传遗留的临时文件）"""
+    from app.utils.db_utils import query_all
+
+    blob_root = UPLOAD_CONFIG["BLOB_PATH"]
+    report = {'checked': 0, 'removed': 0}
+    if not os.path.isdir(blob_root):
+        return report
+    candidates: List[str] = []
+    for dir_path, dir_names, file_names in os.walk(blob_root):
+        for name in file_names:
+            path = os.path.join(dir_path, name)
+            if _blob_in_grace(path):
+                continue
+            if os.path.basename(dir_path) == '.tmp':
+                if dry_run or delete_physical_file(path):
+                    report['removed'] += 1
+            elif _HASH_RE.match(name):
+                candidates.append(name)  # 预览缓存（<hash>.thumb.jpg 等）随内容一起删除
+    report['checked'] = len(candidates)
+    for offset in range(0, len(candidates), 500):
+        chunk = candidates[offset:offset + 500]
+        placeholders = ", ".join(["%s"] * len(chunk))
+        rows = query_all(f"SELECT DISTINCT content_hash FROM sg_file WHERE content_hash IN ({placeholders})", chunk)
+        if rows is None:
+            continue
+        referenced = {row['content_hash'] for row in rows}
+        for content_hash in chunk:
+            if content_hash in referenced:
+                continue
+            if dry_run:
+                report['removed'] += 1
+                continue
+            delete_renditions(blob_path(content_hash))
+            if delete_physical_file(blob_path(content_hash)):
+                report['removed'] += 1
+    return report
+
+def store_file_content(source: Any, group_id: int, original_filename: str,
+                       content_hash: Optional[str] = None) -> Dict[str, Any]:
+    """
+    按当前存储模式保存文件内容
+    source：Flask上传文件对象，或本地文件路径（如分片合并结果，会被移走；content_hash 为其已知哈希）
+    返回：{'store_name', 'content_hash'(未启用去重时为None), 'path', 'created'}
+    """
+    if UPLOAD_CONFIG["DEDUP_ENABLED"]:
+        if isinstance(source, str):
+            if content_hash is None:
+                content_hash = _hash_file(source)
+            stored = save_blob_from_file(source, content_hash)
+        else:
+            stored = save_blob_from_stream(source.stream)
+        suffix = os.path.splitext(original_filename)[1].lower()
+        stored['store_name'] = f"{stored['content_hash']}{suffix}"
+        return stored
+
+    store_name = generate_store_name(group_id=group_id, original_filename=original_filename, rule=UPLOAD_CONFIG["STORE_NAME_RULE"])
+    if isinstance(source, str):
+        path = move_file_to_group(source, UPLOAD_CONFIG["BASE_PATH"], group_id, store_name)
+    else:
+        path = save_uploaded_file(source, UPLOAD_CONFIG["BASE_PATH"], group_id, store_name)
+    return {'store_name': store_name, 'content_hash': None, 'path': path, 'created': True}
+
+def discard_file_content(stored: Dict[str, Any]) -> None:
+    """写库失败/事务回滚时清理 store_file_content 保存的内容（共享内容按引用计数处理）"""
+    if stored.get('content_hash'):
+        release_blob(stored['content_hash'])
+    else:
+        delete_physical_file(stored['path'])
+
+def _hash_file(path: str) -> str:
+    hasher = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(_COPY_BUFFER), b''):
+            hasher.update(block)
+    return hasher.hexdigest()
\ No newline at end of file
@@ -0,0 +1,316 @@
+import bisect
+import hmac
+import os
+import re
+import threading
+import time
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from flask import Flask, Response, g, request
+
+from app.config import METRICS_CONFIG
+
+try:
+    # 可选依赖：pip install prometheus-client
+    # 设置环境变量 PROMETHEUS_MULTIPROC_DIR 后各 worker 进程把指标写入该目录下的 mmap 文件，/metrics 汇总所有进程
+    import prometheus_client
+    from prometheus_client import multiprocess
+except ImportError:
+    prometheus_client = None
+
+# 请求耗时/上传耗时/SQL耗时的直方图分桶（秒）
+REQUEST_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+DB_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+UPLOAD_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+MULTIPROCESS = prometheus_client is not None and bool(os.getenv("PROMETHEUS_MULTIPROC_DIR"))
+ENABLED = METRICS_CONFIG["ENABLED"]
+
+class _LocalMetric:
+    """
+    未安装 prometheus_client 时的进程内实现（只统计当前进程，多进程部署请安装 prometheus_client）
+    接口与 prometheus_client 用到的部分一致：labels(...).inc/dec/set/observe
+    """
+
+    def __init__(self, kind: str, name: str, documentation: str, labelnames: Sequence[str],
+                 buckets: Sequence[float] = ()):
+        self.kind = kind
+        self.name = name if kind != 'counter' else name + '_total'
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._children: Dict[Tuple[str, ...], '_LocalChild'] = {}
+
+    def labels(self, *values: Any) -> '_LocalChild':
+        key = tuple(str(v) for v in values)
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(key, _LocalChild(self))
+        return child
+
+    def set(self, value: float) -> None:
+        """无标签指标直接赋值"""
+        self.labels().set(value)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            children = list(self._children.items())
+        for key, child in children:
+            labels = dict(zip(self.labelnames, key))
+            with self._lock:
+                value, bucket_counts, total = child.value, list(child.bucket_counts), child.sum
+            if self.kind != 'histogram':
+                lines.append(f"{self.name}{_format_labels(labels)} {_format_value(value)}")
+                continue
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), bucket_counts):
+                cumulative += count
+                le = '+Inf' if bound == float('inf') else _format_value(bound)
+                lines.append(f"{self.name}_bucket{_format_labels(dict(labels, le=le))} {cumulative}")
+            lines.append(f"{self.name}_count{_format_labels(labels)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(labels)} {_format_value(total)}")
+        return lines
+
+class _LocalChild:
+    """单个标签组合的取值；写入只在所属指标的锁内做一次加法"""
+
+    def __init__(self, metric: _LocalMetric):
+        self._metric = metric
+        self.value = 0.0
+        self.sum = 0.0
+        self.bucket_counts = [0] * (len(metric.buckets) + 1)
+
+    def inc(self, amount: float = 1) -> None:
+        with self._metric._lock:
+            self.value += amount
+
+    def dec(self, amount: float = 1) -> None:
+        with self._metric._lock:
+            self.value -= amount
+
+    def set(self, value: float) -> None:
+        self.value = float(value)
+
+    def observe(self, value: float) -> None:
+        index = bisect.bisect_left(self._metric.buckets, value)
+        with self._metric._lock:
+            self.bucket_counts[index] += 1
+            self.sum += value
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ''
+    escaped = (v.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for v in labels.values())
+    return '{' + ','.join(f'{k}="{v}"' for k, v in zip(labels, escaped)) + '}'
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+_local_metrics: List[_LocalMetric] = []
+
+def _counter(name: str, documentation: str, labelnames: Sequence[str]) -> Any:
+    if prometheus_client is not None:
+        return prometheus_client.Counter(name, documentation, labelnames)
+    metric = _LocalMetric('counter', name, documentation, labelnames)
+    _local_metrics.append(metric)
+    return metric
+
+def _gauge(name: str, documentation: str, labelnames: Sequence[str]) -> Any:
+    if prometheus_client is not None:
+        # 多进程模式下按存活进程求和（进程退出后其取值不再计入）
+        return prometheus_client.Gauge(name, documentation, labelnames, multiprocess_mode='livesum')
+    metric = _LocalMetric('gauge', name, documentation, labelnames)
+    _local_metrics.append(metric)
+    return metric
+
+def _histogram(name: str, documentation: str, labelnames: Sequence[str], buckets: Sequence[float]) -> Any:
+    if prometheus_client is not None:
+        return prometheus_client.Histogram(name, documentation, labelnames, buckets=buckets)
+    metric = _LocalMetric('histogram', name, documentation, labelnames, buckets)
+    _local_metrics.append(metric)
+    return metric
+
+
+# ---------- 指标定义 ----------
+# 标签取值均为有限集合（蓝图、路由端点名、状态码），不使用URL路径与用户输入，避免序列数膨胀
+
+REQUEST_DURATION = _histogram(
+    'studygroup_http_request_duration_seconds', '请求耗时（含事务提交）',
+    ('blueprint', 'endpoint', 'method'), REQUEST_BUCKETS
+)
+REQUESTS_IN_FLIGHT = _gauge('studygroup_http_requests_in_flight', '正在处理的请求数', ('blueprint',))
+RESPONSES = _counter(
+    'studygroup_http_responses', '响应数（status 为HTTP状态码，code 为JSON响应体中的 code 字段，非JSON响应为空）',
+    ('blueprint', 'endpoint', 'status', 'code')
+)
+DB_QUERY_DURATION = _histogram(
+    'studygroup_db_query_duration_seconds', 'SQL执行耗时（需 SQL_METRICS_MODE 不为 off）', ('operation',), DB_BUCKETS
+)
+DB_QUERY_ERRORS = _counter('studygroup_db_query_errors', 'SQL执行失败次数', ('operation',))
+UPLOAD_BYTES = _counter('studygroup_upload_bytes', '上传成功的请求体字节数', ('kind',))
+UPLOAD_DURATION = _histogram('studygroup_upload_duration_seconds', '上传请求耗时', ('kind',), UPLOAD_BUCKETS)
+DOWNLOAD_BYTES = _counter('studygroup_download_bytes', '应用直接发送的文件字节数（交给代理发送的不计）', ('endpoint',))
+
+# 以下为各进程内组件的状态快照，请求结束后按 SNAPSHOT_INTERVAL 节流刷新
+DB_POOL_CONNECTIONS = _gauge('studygroup_db_pool_connections', '连接池连接数', ('state',))
+DB_POOL_EVENTS = _gauge('studygroup_db_pool_events', '连接池累计事件数（进程启动以来）', ('event',))
+DB_POOL_WAIT_SECONDS = _gauge('studygroup_db_pool_wait_seconds', '连接池累计等待秒数（进程启动以来）', ())
+CACHE_ENTRIES = _gauge('studygroup_cache_entries', '进程内缓存条目数', ('cache',))
+CACHE_LOOKUPS = _gauge('studygroup_cache_lookups', '进程内缓存累计查找次数（进程启动以来）', ('cache', 'result'))
+STATS_WRITER_QUEUE = _gauge('studygroup_stats_writer_queue_depth', '成员统计待写入的行数', ())
+
+_POOL_EVENTS = ('checkouts', 'waits', 'timeouts', 'created', 'closed', 'recycled', 'evicted_idle', 'health_check_failures')
+_SQL_OPERATIONS = {'SELECT', 'INSERT', 'UPDATE', 'DELETE', 'REPLACE'}
+
+
+# ---------- 采集 ----------
+
+def observe_db_query(sql: str, elapsed: float, failed: bool) -> None:
+    """记录一条SQL的耗时（由 sql_metrics.record_query 调用），按语句类型分组"""
+    keyword = sql.lstrip()[:7].upper().rstrip()
+    operation = keyword if keyword in _SQL_OPERATIONS else 'OTHER'
+    DB_QUERY_DURATION.labels(operation).observe(elapsed)
+    if failed:
+        DB_QUERY_ERRORS.labels(operation).inc()
+
+def observe_upload(kind: str, size_bytes: Optional[int]) -> None:
+    """记录一次成功上传（kind：single 普通上传 / chunk 分片）的字节数与请求耗时"""
+    if not ENABLED:
+        return
+    UPLOAD_BYTES.labels(kind).inc(size_bytes or 0)
+    started = g.get('_metrics_started')
+    if started is not None:
+        UPLOAD_DURATION.labels(kind).observe(time.perf_counter() - started)
+
+def observe_download(size_bytes: Optional[int], endpoint: Optional[str] = None) -> None:
+    """记录应用发送的文件字节数（按路由端点分组，默认取当前请求的端点）"""
+    if ENABLED and size_bytes:
+        DOWNLOAD_BYTES.labels(endpoint or request.endpoint or 'unmatched').inc(size_bytes)
+
+def observe_request(blueprint: str, endpoint: str, method: str, status: int, code: str, elapsed: float) -> None:
+    """记录一次请求的耗时与响应（Flask 请求钩子与 ASGI 模式的异步接口共用，标签保持一致）"""
+    REQUEST_DURATION.labels(blueprint, endpoint, method).observe(elapsed)
+    RESPONSES.labels(blueprint, endpoint, str(status), code).inc()
+
+def count_download_bytes(chunks: Iterable[bytes]) -> Iterable[bytes]:
+    """包装流式响应：发送结束（或客户端断开）后按已发送字节数计入下载量"""
+    if not ENABLED:
+        return chunks
+    # 流式输出在请求上下文结束后才迭代，端点名在这里先取出
+    return _counting(chunks, DOWNLOAD_BYTES.labels(request.endpoint or 'unmatched'))
+
+def _counting(chunks: Iterable[bytes], counter: Any) -> Iterator[bytes]:
+    sent = 0
+    try:
+        for chunk in chunks:
+            sent += len(chunk)
+            yield chunk
+    finally:
+        if sent:
+            counter.inc(sent)
+
+# 响应体以 {"code": 数字 开头（各接口 code 写在第一个键；JSON按键排序输出时 code 也排在 data/msg 之前）
+_CODE_RE = re.compile(rb'\s*\{\s*"code"\s*:\s*(-?\d+)')
+
+def _json_code(response: Response) -> str:
+    """取JSON响应体中的 code；只看响应体开头，不解析整个JSON；流式/文件响应不读取"""
+    if response.is_streamed or response.direct_passthrough or response.mimetype != 'application/json':
+        return ''
+    return json_code_from_body(response.get_data())
+
+def json_code_from_body(body: bytes) -> str:
+    """JSON响应体开头的 code（ASGI 模式的异步接口直接传入第一段响应体）"""
+    match = _CODE_RE.match(body[:64])
+    return match.group(1).decode() if match else ''
+
+_next_snapshot = 0.0
+
+def refresh_snapshots(force: bool = False) -> None:
+    """刷新连接池/缓存/统计写入器的状态快照（SNAPSHOT_INTERVAL 内只刷新一次，并发时重复刷新无害）"""
+    global _next_snapshot
+    now = time.monotonic()
+    if not force and now < _next_snapshot:
+        return
+    _next_snapshot = now + METRICS_CONFIG["SNAPSHOT_INTERVAL"]
+    try:
+        from app.utils.db_utils import get_pool_stats
+        from app.utils.permission_utils import get_member_cache_stats
+        from app.utils.progress_utils import get_progress_cache_stats
+        from app.utils.stats_writer import get_stats_writer
+
+        pool_stats = get_pool_stats()
+        DB_POOL_CONNECTIONS.labels('in_use').set(pool_stats['in_use'])
+        DB_POOL_CONNECTIONS.labels('idle').set(pool_stats['idle'])
+        for event in _POOL_EVENTS:
+            DB_POOL_EVENTS.labels(event).set(pool_stats[event])
+        DB_POOL_WAIT_SECONDS.set(pool_stats['wait_time_total'])
+        for cache, cache_stats in (('member', get_member_cache_stats()), ('progress', get_progress_cache_stats())):
+            CACHE_ENTRIES.labels(cache).set(cache_stats['entries'])
+            CACHE_LOOKUPS.labels(cache, 'hit').set(cache_stats['hits'])
+            CACHE_LOOKUPS.labels(cache, 'miss').set(cache_stats['misses'])
+        STATS_WRITER_QUEUE.set(get_stats_writer().stats()['queue_depth'])
+    except Exception as e:
+        print(f"指标快照刷新失败：{str(e)}")
+
+def render_metrics() -> Tuple[bytes, str]:
+    """生成 Prometheus 文本格式的指标，返回 (内容, Content-Type)"""
+    if prometheus_client is None:
+        lines: List[str] = []
+        for metric in _local_metrics:
+            lines.extend(metric.render())
+        return ("\n".join(lines) + "\n").encode('utf-8'), 'text/plain; version=0.0.4; charset=utf-8'
+    if MULTIPROCESS:
+        registry = prometheus_client.CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = prometheus_client.REGISTRY
+    return prometheus_client.generate_latest(registry), prometheus_client.CONTENT_TYPE_LATEST
+
+def init_metrics(app: Flask) -> None:
+    """注册请求钩子与 /metrics 路由：按蓝图/路由端点记录请求耗时、处理中请求数与响应 code"""
+    if not ENABLED:
+        return
+
+    @app.before_request
+    def _metrics_request_started():
+        if request.endpoint == 'metrics':
+            return
+        g._metrics_started = time.perf_counter()
+        g._metrics_blueprint = request.blueprint or 'app'
+        REQUESTS_IN_FLIGHT.labels(g._metrics_blueprint).inc()
+
+    @app.after_request
+    def _metrics_record_response(response):
+        if g.get('_metrics_started') is not None:
+            g._metrics_status = response.status_code
+            g._metrics_code = _json_code(response)
+        return response
+
+    @app.teardown_request
+    def _metrics_request_finished(exc):
+        # teardown 在异常时也会执行，保证处理中请求数能减回去
+        started = g.pop('_metrics_started', None)
+        if started is None:
+            return
+        blueprint = g._metrics_blueprint
+        endpoint = request.endpoint or 'unmatched'
+        status = g.get('_metrics_status', 500 if exc is not None else 200)
+        observe_request(blueprint, endpoint, request.method, status, g.get('_metrics_code', ''),
+                        time.perf_counter() - started)
+        REQUESTS_IN_FLIGHT.labels(blueprint).dec()
+        refresh_snapshots()
+
+    def metrics():
+        token = METRICS_CONFIG["TOKEN"]
+        if token and not hmac.compare_digest(request.headers.get('Authorization', ''), f"Bearer {token}"):
+            return Response("unauthorized\n", status=401, mimetype='text/plain')
+        refresh_snapshots(force=True)
+        body, content_type = render_metrics()
+        response = Response(body, content_type=content_type)
+        response.cache_control.no_store = True
+        return response
+
+    app.add_url_rule('/metrics', 'metrics', metrics, methods=['GET'])
@@ -0,0 +1,74 @@
+import base64
+import json
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.config import PAGINATION_CONFIG
+
+def encode_cursor(sort_time: datetime, row_id: int) -> str:
+    """把排序键 (时间, 主键) 编码为不透明的游标字符串"""
+    raw = json.dumps([sort_time.isoformat(), int(row_id)], separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+def decode_cursor(cursor: str) -> Optional[Tuple[datetime, int]]:
+    """解析游标，格式非法时返回None"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        sort_time, row_id = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        return datetime.fromisoformat(sort_time), int(row_id)
+    except (ValueError, TypeError, UnicodeError):
+        return None
+
+def parse_page_params(args, allowed_fields: Dict[str, str]) -> Tuple[Optional[Dict[str, Any]], str]:
+    """
+    解析列表接口的分页与字段投影参数：page_size、cursor、fields（逗号分隔）、stream
+    返回：({'paginate', 'stream', 'page_size', 'cursor', 'fields'}, "") 或 (None, 错误信息)
+    未传 page_size/cursor 时不分页（兼容旧前端一次取全量）；stream=1 时全量结果流式输出
+    """
+    paginate = 'page_size' in args or 'cursor' in args
+    stream = args.get('stream') in ('1', 'true')
+    if stream and paginate:
+        return None, "stream不能与page_size/cursor同时使用"
+    page_size = PAGINATION_CONFIG["DEFAULT_PAGE_SIZE"]
+    if args.get('page_size'):
+        try:
+            page_size = int(args.get('page_size'))
+        except ValueError:
+            return None, "page_size必须为整数"
+        if page_size < 1 or page_size > PAGINATION_CONFIG["MAX_PAGE_SIZE"]:
+            return None, f"page_size需在1-{PAGINATION_CONFIG['MAX_PAGE_SIZE']}之间"
+
+    cursor = None
+    if args.get('cursor'):
+        cursor = decode_cursor(args.get('cursor'))
+        if cursor is None:
+            return None, "cursor无效"
+
+    fields: Optional[List[str]] = None
+    if args.get('fields'):
+        fields = [field.strip() for field in args.get('fields').split(',') if field.strip()]
+        unknown = [field for field in fields if field not in allowed_fields]
+        if unknown:
+            return None, f"不支持的字段：{','.join(unknown)}"
+
+    return {'paginate': paginate, 'stream': stream, 'page_size': page_size, 'cursor': cursor, 'fields': fields}, ""
+
+def build_select_columns(fields: Optional[List[str]], allowed_fields: Dict[str, str],
+                         required_fields: List[str], default_columns: str) -> str:
+    """按投影字段生成SELECT列（分页时排序/游标所需字段总会查出，输出前再剔除）"""
+    if not fields:
+        return default_columns
+    selected = list(dict.fromkeys(fields + required_fields))
+    return ", ".join(f"{allowed_fields[field]} AS {field}" for field in selected)
+
+def finish_page(rows: List[Dict[str, Any]], page: Dict[str, Any], time_field: str,
+                id_field: str) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """截取一页（查询时多取一条用来判断是否还有下一页），返回 (本页数据, next_cursor)"""
+    next_cursor = None
+    if page['paginate'] and len(rows) > page['page_size']:
+        rows = rows[:page['page_size']]
+        last = rows[-1]
+        next_cursor = encode_cursor(last[time_field], last[id_field])
+    if page['fields']:
+        rows = [{field: row[field] for field in page['fields']} for row in rows]
+    return rows, next_cursor
@@ -0,0 +1,136 @@
+from app.utils.db_utils import query_one, query_all, on_request_commit
+from app.utils.cache_utils import TTLCache
+from app.config import CACHE_CONFIG
+from typing import Dict, Any, List, Optional, Tuple
+
+# (user_id, group_id) -> 成员上下文
+_member_cache = TTLCache(
+    max_entries=CACHE_CONFIG["MEMBER_MAX_ENTRIES"],
+    ttl=CACHE_CONFIG["MEMBER_TTL"],
+    enabled=CACHE_CONFIG["MEMBER_ENABLED"]
+)
+
+def get_member_context(user_id: int, group_id: int) -> Optional[Dict[str, Any]]:
+    """一次联表查询得到：小组是否存在、用户是否存在、是否成员、角色与权限级别（查询失败返回None）"""
+    cache_key = (int(user_id), int(group_id))
+    cached = _member_cache.get(cache_key)
+    if cached is not None:
+        return dict(cached)
+    sql = """
+        SELECT
+            g.group_id IS NOT NULL AS group_exists,
+            u.user_id IS NOT NULL AS user_exists,
+            ug.user_id IS NOT NULL AS is_member,
+            ug.role, ug.permission_level
+        FROM (SELECT %s AS user_id, %s AS group_id) k
+        LEFT JOIN sg_group g ON g.group_id = k.group_id
+        LEFT JOIN sg_user u ON u.user_id = k.user_id
+        LEFT JOIN sg_user_group ug ON ug.user_id = k.user_id AND ug.group_id = k.group_id
+    """
+    row = query_one(sql, (user_id, group_id))
+    if not row:
+        return None
+    member = {
+        'group_exists': bool(row['group_exists']),
+        'user_exists': bool(row['user_exists']),
+        'is_member': bool(row['is_member']),
+        'role': row['role'],
+        'permission_level': row['permission_level']
+    }
+    # 小组或用户不存在的结果不缓存，避免新建后短时间内仍被判定为不存在
+    if member['group_exists'] and member['user_exists']:
+        _member_cache.set(cache_key, dict(member))
+    return member
+
+def invalidate_member(user_id: int, group_id: int) -> None:
+    """成员关系变更后失效缓存：立即失效一次，事务提交后再失效一次（防止提交前被并发请求回填旧值）"""
+    cache_key = (int(user_id), int(group_id))
+    _member_cache.delete(cache_key)
+    on_request_commit(lambda: _member_cache.delete(cache_key))
+
+def get_member_cache_stats() -> Dict[str, Any]:
+    """成员缓存命中率等指标"""
+    return _member_cache.stats()
+
+def require_group_member(user_id: int, group_id: int, forbidden_msg: str = "仅小组成员可操作",
+                         user_label: str = "用户", require_member: bool = True
+                         ) -> Tuple[Optional[Dict[str, Any]], Optional[Dict[str, Any]]]:
+    """
+    校验小组存在、用户存在且为小组成员（单次查询）
+    返回：(成员信息, None) 或 (None, 错误响应{"code","msg"})
+    """
+    member = get_member_context(user_id, group_id)
+    if member is None:
+        return None, {"code": 500, "msg": "权限校验失败"}
+    if not member['group_exists']:
+        return None, {"code": 404, "msg": f"小组ID={group_id}不存在"}
+    if not member['user_exists']:
+        return None, {"code": 404, "msg": f"{user_label}ID={user_id}不存在"}
+    if require_member and not member['is_member']:
+        return None, {"code": 403, "msg": forbidden_msg}
+    return member, None
+
+def get_group_member_ids(group_id: int, user_ids: List[int]) -> Optional[Dict[str, Any]]:
+    """
+    一次查询校验多个用户是否为小组成员（批量接口使用，不走成员缓存）
+    返回 {'group_exists': 小组是否存在, 'member_ids': 其中是成员的用户ID集合}；查询失败返回None
+    """
+    user_ids = list(dict.fromkeys(user_ids))
+    if not user_ids:
+        user_ids = [0]
+    sql = f"""
+        SELECT g.group_id, ug.user_id
+        FROM sg_group g
+        LEFT JOIN sg_user_group ug ON ug.group_id = g.group_id AND ug.user_id IN ({', '.join(['%s'] * len(user_ids))})
+        WHERE g.group_id = %s
+    """
+    rows = query_all(sql, (*user_ids, group_id))
+    if rows is None:
+        return None
+    return {
+        'group_exists': bool(rows),
+        'member_ids': {row['user_id'] for row in rows if row['user_id'] is not None}
+    }
+
+def get_tasks_with_member(task_ids: List[int], user_id: int) -> Optional[List[Dict[str, Any]]]:
+    """批量版 get_task_with_member：一次查询多个任务及请求用户在各任务所属小组的成员身份"""
+    if not task_ids:
+        return []
+    sql = f"""
+        SELECT t.*,
+            ug.user_id IS NOT NULL AS is_member,
+            ug.role AS member_role,
+            ug.permission_level AS member_permission_level
+        FROM sg_task t
+        LEFT JOIN sg_user_group ug ON ug.group_id = t.group_id AND ug.user_id = %s
+        WHERE t.task_id IN ({', '.join(['%s'] * len(task_ids))})
+    """
+    return query_all(sql, (user_id, *task_ids))
+
+# 文件信息 + 请求用户在文件所属小组的成员身份，参数 (user_id, file_id)；ASGI 模式的异步下载/预览共用
+FILE_WITH_MEMBER_SQL = """
+    SELECT f.*,
+        ug.user_id IS NOT NULL AS is_member,
+        ug.role AS member_role,
+        ug.permission_level AS member_permission_level
+    FROM sg_file f
+    LEFT JOIN sg_user_group ug ON ug.group_id = f.group_id AND ug.user_id = %s
+    WHERE f.file_id = %s
+"""
+
+def get_file_with_member(file_id: int, user_id: int) -> Optional[Dict[str, Any]]:
+    """查询文件信息，并附带请求用户在文件所属小组的成员身份（is_member/member_role/member_permission_level）"""
+    return query_one(FILE_WITH_MEMBER_SQL, (user_id, file_id))
+
+def get_task_with_member(task_id: int, user_id: int) -> Optional[Dict[str, Any]]:
+    """查询任务信息，并附带请求用户在任务所属小组的成员身份（is_member/member_role/member_permission_level）"""
+    sql = """
+        SELECT t.*,
+            ug.user_id IS NOT NULL AS is_member,
+            ug.role AS member_role,
+            ug.permission_level AS member_permission_level
+        FROM sg_task t
+        LEFT JOIN sg_user_group ug ON ug.group_id = t.group_id AND ug.user_id = %s
+        WHERE t.task_id = %s
+    """
+    return query_one(sql, (user_id, task_id))
@@ -0,0 +1,130 @@
+from typing import Any, Dict, Optional
+
+from app.config import PROGRESS_CONFIG
+from app.utils.cache_utils import TTLCache
+from app.utils.db_utils import query_one, execute_sql, on_request_commit
+
+# group_id -> {'total': 总任务数, 'completed': 已完成数}
+_progress_cache = TTLCache(
+    max_entries=PROGRESS_CONFIG["CACHE_MAX_ENTRIES"],
+    ttl=PROGRESS_CONFIG["CACHE_TTL"],
+    enabled=PROGRESS_CONFIG["CACHE_ENABLED"]
+)
+
+# 从 sg_task 整行计算小组计数（源表已包含本次变更）
+_COUNT_SELECT = """
+    SELECT g.group_id,
+        COUNT(t.task_id),
+        COALESCE(SUM(t.status = '完成'), 0)
+    FROM sg_group g
+    LEFT JOIN sg_task t ON t.group_id = g.group_id
+"""
+
+def apply_progress_delta(group_id: int, total_tasks: int = 0, completed_tasks: int = 0) -> bool:
+    """
+    在当前请求事务内按增量更新 sg_group_progress（失败时整个请求回滚，计数与任务表保持一致）
+    同一小组的任务写入会在该行上排队，直到事务提交；未启用计数（PROGRESS_CONFIG["ENABLED"]）时不做任何操作
+    """
+    if not PROGRESS_CONFIG["ENABLED"] or not (total_tasks or completed_tasks):
+        return True
+    _invalidate(group_id)
+    success, affected_rows = execute_sql("""
+        UPDATE sg_group_progress SET
+            total_tasks = GREATEST(CAST(total_tasks AS SIGNED) + %s, 0),
+            completed_tasks = GREATEST(CAST(completed_tasks AS SIGNED) + %s, 0)
+        WHERE group_id = %s
+    """, (total_tasks, completed_tasks, group_id))
+    if not success:
+        return False
+    if affected_rows:
+        return True
+    # 计数行不存在（旧小组尚未回填）：整行计算，并发插入时退化为增量
+    success, _ = execute_sql(f"""
+        INSERT INTO sg_group_progress (group_id, total_tasks, completed_tasks)
+        {_COUNT_SELECT}
+        WHERE g.group_id = %s
+        GROUP BY g.group_id
+        ON DUPLICATE KEY UPDATE
+            total_tasks = GREATEST(CAST(sg_group_progress.total_tasks AS SIGNED) + %s, 0),
+            completed_tasks = GREATEST(CAST(sg_group_progress.completed_tasks AS SIGNED) + %s, 0)
+    """, (group_id, total_tasks, completed_tasks))
+    return success
+
+def get_group_progress(group_id: int) -> Optional[Dict[str, Any]]:
+    """
+    读取小组任务计数：缓存命中直接返回，否则按主键查一行（同时校验小组存在）
+    未启用计数时直接从 sg_task COUNT（不缓存）
+    返回 {'group_exists', 'total', 'completed'}；查询失败返回None
+    """
+    if not PROGRESS_CONFIG["ENABLED"]:
+        return _count_group_progress(group_id)
+    cached = _progress_cache.get(int(group_id))
+    if cached is not None:
+        return dict(cached)
+    row = _load_progress_row(group_id)
+    if row and row['group_exists'] and row['total_tasks'] is None:
+        # 尚未回填的小组：首次读取时补建计数行
+        if not rebuild_group_progress(group_id):
+            return None
+        row = _load_progress_row(group_id)
+    if not row or (row['group_exists'] and row['total_tasks'] is None):
+        return None
+    if not row['group_exists']:
+        return {'group_exists': False, 'total': 0, 'completed': 0}
+    progress = {'group_exists': True, 'total': int(row['total_tasks']), 'completed': int(row['completed_tasks'])}
+    _progress_cache.set(int(group_id), progress)
+    return dict(progress)
+
+def _count_group_progress(group_id: int) -> Optional[Dict[str, Any]]:
+    """从 sg_task 实时统计（未执行 migrations/005 时使用）"""
+    row = query_one("""
+        SELECT g.group_id IS NOT NULL AS group_exists,
+            (SELECT COUNT(*) FROM sg_task WHERE group_id = %s) AS total_tasks,
+            (SELECT COUNT(*) FROM sg_task WHERE group_id = %s AND status = '完成') AS completed_tasks
+        FROM (SELECT %s AS group_id) k
+        LEFT JOIN sg_group g ON g.group_id = k.group_id
+    """, (group_id, group_id, group_id))
+    if not row:
+        return None
+    if not row['group_exists']:
+        return {'group_exists': False, 'total': 0, 'completed': 0}
+    return {'group_exists': True, 'total': int(row['total_tasks']), 'completed': int(row['completed_tasks'])}
+
+def _load_progress_row(group_id: int) -> Optional[Dict[str, Any]]:
+    return query_one("""
+        SELECT g.group_id IS NOT NULL AS group_exists, p.total_tasks, p.completed_tasks
+        FROM (SELECT %s AS group_id) k
+        LEFT JOIN sg_group g ON g.group_id = k.group_id
+        LEFT JOIN sg_group_progress p ON p.group_id = k.group_id
+    """, (group_id,))
+
+def rebuild_group_progress(group_id: Optional[int] = None) -> bool:
+    """从 sg_task 重新计算计数（group_id 为空时重建全部小组），用于回填与修正偏差"""
+    where_sql, params = "", ()
+    if group_id is not None:
+        where_sql, params = "WHERE g.group_id = %s", (group_id,)
+    success, _ = execute_sql(f"""
+        INSERT INTO sg_group_progress (group_id, total_tasks, completed_tasks)
+        {_COUNT_SELECT}
+        {where_sql}
+        GROUP BY g.group_id
+        ON DUPLICATE KEY UPDATE
+            total_tasks = VALUES(total_tasks),
+            completed_tasks = VALUES(completed_tasks)
+    """, params)
+    if success:
+        if group_id is None:
+            _progress_cache.clear()
+        else:
+            _invalidate(group_id)
+    return success
+
+def _invalidate(group_id: int) -> None:
+    """计数变更后失效缓存：立即失效一次，事务提交后再失效一次（防止提交前被并发请求回填旧值）"""
+    cache_key = int(group_id)
+    _progress_cache.delete(cache_key)
+    on_request_commit(lambda: _progress_cache.delete(cache_key))
+
+def get_progress_cache_stats() -> Dict[str, Any]:
+    """进度缓存命中率等指标"""
+    return _progress_cache.stats()
@@ -0,0 +1,110 @@
+import os
+import secrets
+from typing import Dict, List, Optional
+
+from app.config import RENDITION_CONFIG
+from app.utils.extract_utils import TEXT_SUFFIXES, PdfReader, extract_text
+from app.utils.worker_utils import BackgroundPool
+
+try:
+    from PIL import Image  # 可选依赖：pip install Pillow（未安装时不生成缩略图）
+except ImportError:
+    Image = None
+
+# 预览变体 -> 缓存文件后缀（缓存文件放在原文件旁：<原文件>.<变体><后缀>）
+VARIANTS = {
+    'thumb': '.jpg',   # 图片缩略图
+    'text': '.txt'     # 文档首页/首张幻灯片的文本摘录
+}
+VARIANT_MIMETYPES = {
+    'thumb': 'image/jpeg',
+    'text': 'text/plain; charset=utf-8'
+}
+THUMB_SUFFIXES = {'.jpg', '.jpeg', '.png', '.gif'}
+
+_pool = BackgroundPool('rendition', RENDITION_CONFIG["WORKERS"], RENDITION_CONFIG["QUEUE_SIZE"])
+
+def rendition_path(full_path: str, variant: str) -> str:
+    return f"{full_path}.{variant}{VARIANTS[variant]}"
+
+def supported_variants(original_name: str) -> List[str]:
+    """该文件类型在当前环境（可选依赖是否安装）下能生成的预览变体"""
+    suffix = os.path.splitext(original_name)[1].lower()
+    variants = []
+    if suffix in THUMB_SUFFIXES and Image is not None:
+        variants.append('thumb')
+    if suffix in TEXT_SUFFIXES and (suffix != '.pdf' or PdfReader is not None):
+        variants.append('text')
+    return variants
+
+def get_rendition(full_path: str, original_name: str, variant: str) -> Optional[str]:
+    """返回已生成的预览文件路径；尚未生成时提交后台生成（旧文件首次访问时补生成）并返回None"""
+    path = rendition_path(full_path, variant)
+    if os.path.exists(path):
+        return path
+    if variant in supported_variants(original_name):
+        schedule_renditions(full_path, original_name)
+    return None
+
+def schedule_renditions(full_path: str, original_name: str) -> bool:
+    """提交后台生成任务（上传提交后调用，立即返回）；未启用、无可生成变体、已在排队或队列已满时返回False"""
+    if not RENDITION_CONFIG["ENABLED"] or not supported_variants(original_name):
+        return False
+    return _pool.submit(full_path, render, full_path, original_name)
+
+def render(full_path: str, original_name: str) -> Dict[str, bool]:
+    """同步生成该文件全部缺失的预览变体（已存在的跳过），返回 {变体: 是否可用}"""
+    suffix = os.path.splitext(original_name)[1].lower()
+    result = {}
+    for variant in supported_variants(original_name):
+        target = rendition_path(full_path, variant)
+        if os.path.exists(target):
+            result[variant] = True
+            continue
+        # 先写临时文件再rename，读取方不会看到写了一半的预览
+        tmp_path = f"{target}.{secrets.token_hex(4)}.tmp"
+        try:
+            if variant == 'thumb':
+                ok = _render_thumb(full_path, tmp_path)
+            else:
+                ok = _render_text(full_path, suffix, tmp_path)
+            if ok:
+                os.replace(tmp_path, target)
+            result[variant] = ok
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+    return result
+
+def _render_thumb(src_path: str, dst_path: str) -> bool:
+    size = RENDITION_CONFIG["THUMB_SIZE"]
+    with Image.open(src_path) as img:
+        img.draft('RGB', (size, size))  # JPEG 按目标尺寸解码，大图省内存和CPU
+        img.thumbnail((size, size))
+        if img.mode in ('RGBA', 'LA', 'P'):
+            img = img.convert('RGBA')
+            background = Image.new('RGB', img.size, (255, 255, 255))
+            background.paste(img, mask=img.getchannel('A'))
+            img = background
+        elif img.mode != 'RGB':
+            img = img.convert('RGB')
+        img.save(dst_path, 'JPEG', quality=80, optimize=True)
+    return True
+
+def _render_text(src_path: str, suffix: str, dst_path: str) -> bool:
+    text = extract_text(src_path, suffix, first_page_only=True, max_chars=RENDITION_CONFIG["TEXT_MAX_CHARS"])
+    if text is None:
+        return False
+    with open(dst_path, 'w', encoding='utf-8') as f:
+        f.write(text)
+    return True
+
+def delete_renditions(full_path: str) -> None:
+    """原文件删除后清理其预览缓存"""
+    for variant in VARIANTS:
+        path = rendition_path(full_path, variant)
+        try:
+            if os.path.exists(path):
+                os.remove(path)
+        except OSError as e:
+            print(f"预览文件删除失败：{str(e)}")
@@ -0,0 +1,35 @@
+from flask import Response, current_app
+from typing import Any, Callable, Dict, Iterable, Optional
+
+def stream_json_response(rows: Iterable[Dict[str, Any]], transform: Optional[Callable[[Dict[str, Any]], Dict[str, Any]]] = None,
+                         msg: str = "查询成功", chunk_size: int = 64 * 1024) -> Response:
+    """
+    以 {"code":200,"msg":...,"data":[...]} 格式流式输出大列表：边迭代边序列化，内存占用与结果集大小无关
+    rows 通常为 query_stream() 的结果；transform 用于逐行加工（如格式化字段）
+    """
+    dumps = current_app.json.dumps  # 生成器在请求上下文之外执行，提前取出序列化函数
+    head = dumps({"code": 200, "msg": msg})[:-1]  # 去掉结尾的 }，在其后拼接 data 数组
+
+    def generate():
+        buffer = [head, ',"data":[']
+        size = 0
+        first = True
+        try:
+            for row in rows:
+                if transform:
+                    row = transform(row)
+                item = dumps(row) if first else "," + dumps(row)
+                first = False
+                buffer.append(item)
+                size += len(item)
+                if size >= chunk_size:
+                    yield "".join(buffer)
+                    buffer, size = [], 0
+            buffer.append("]}")
+            yield "".join(buffer)
+        finally:
+            close = getattr(rows, 'close', None)
+            if close:
+                close()
+
+    return Response(generate(), mimetype='application/json')
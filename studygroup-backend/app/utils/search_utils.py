@@ -0,0 +1,138 @@
+import math
+import os
+import re
+import unicodedata
+from collections import Counter
+from typing import Any, Dict, List, Optional
+
+import pymysql
+
+from app.config import SEARCH_CONFIG
+from app.utils.db_utils import (
+    get_db_connection, commit_transaction, rollback_transaction, close_db_resource, query_all, execute_sql, savepoint
+)
+from app.utils.extract_utils import TEXT_SUFFIXES, extract_text
+from app.utils.worker_utils import BackgroundPool
+
+# 中日韩文字连续段落按二元组（bigram）切分，其余按字母/数字串切分
+_CJK_CHARS = '\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\u3040-\u30ff\uac00-\ud7af'  # 中日韩统一表意文字、兼容汉字、假名、韩文
+_TOKEN_RE = re.compile(f'[{_CJK_CHARS}]+|[0-9a-z]+')
+_CJK_RE = re.compile(f'[{_CJK_CHARS}]')
+_MAX_TERM_LENGTH = 32
+_NAME_WEIGHT = 5.0  # 文件名命中的权重（正文按 1+ln(词频) 计）
+
+_pool = BackgroundPool('search-index', 1, SEARCH_CONFIG["QUEUE_SIZE"])
+
+def tokenize(text: str, name_mode: bool = False) -> Counter:
+    """
+    切分为索引词并计数：全角转半角、英文转小写；中文取相邻二字（单字段落取单字）
+    name_mode：文件名额外索引每个单字，使单字查询也能命中文件名
+    """
+    terms: Counter = Counter()
+    text = unicodedata.normalize('NFKC', text or '').lower()
+    for run in _TOKEN_RE.findall(text):
+        if not _CJK_RE.match(run):
+            terms[run[:_MAX_TERM_LENGTH]] += 1
+            continue
+        if len(run) == 1:
+            terms[run] += 1
+            continue
+        for i in range(len(run) - 1):
+            terms[run[i:i + 2]] += 1
+        if name_mode:
+            for char in run:
+                terms[char] += 1
+    return terms
+
+def build_term_weights(original_name: str, content: Optional[str]) -> Dict[str, float]:
+    """文件名与正文合并为 词 -> 权重（正文词过多时只保留权重最高的 MAX_TERMS 个）"""
+    weights: Dict[str, float] = {}
+    for term, count in tokenize(content or '').items():
+        weights[term] = 1.0 + math.log(count)
+    for term in tokenize(original_name, name_mode=True):
+        weights[term] = weights.get(term, 0.0) + _NAME_WEIGHT
+    if len(weights) > SEARCH_CONFIG["MAX_TERMS"]:
+        weights = dict(sorted(weights.items(), key=lambda item: item[1], reverse=True)[:SEARCH_CONFIG["MAX_TERMS"]])
+    return weights
+
+def index_file(file_id: int, group_id: int, original_name: str, full_path: Optional[str]) -> bool:
+    """重建单个文件的索引（删除旧词条后批量写入，同一事务内完成）"""
+    content = None
+    suffix = os.path.splitext(original_name)[1].lower()
+    if full_path and suffix in TEXT_SUFFIXES:
+        content = extract_text(full_path, suffix, max_chars=SEARCH_CONFIG["MAX_TEXT_CHARS"])
+    rows = [(term, group_id, file_id, round(weight, 3)) for term, weight in build_term_weights(original_name, content).items()]
+
+    conn, cursor = None, None
+    try:
+        conn, cursor = get_db_connection()
+        conn.begin()
+        # 先锁文件行（与删除文件的事务加锁顺序一致）；文件可能在排队期间已被删除，此时只清理词条
+        cursor.execute("SELECT 1 FROM sg_file WHERE file_id = %s FOR UPDATE", (file_id,))
+        file_exists = cursor.fetchone() is not None
+        cursor.execute("DELETE FROM sg_file_term WHERE file_id = %s", (file_id,))
+        if file_exists and rows:
+            cursor.executemany(
+                "INSERT INTO sg_file_term (term, group_id, file_id, weight) VALUES (%s, %s, %s, %s)", rows
+            )
+        commit_transaction(conn)
+        return True
+    except pymysql.MySQLError as e:
+        if conn:
+            rollback_transaction(conn)
+        print(f"搜索索引写入失败（文件ID={file_id}）：{str(e)}")
+        return False
+    finally:
+        close_db_resource(conn, cursor)
+
+def schedule_index(file_id: int, group_id: int, original_name: str, full_path: Optional[str]) -> bool:
+    """提交后台索引任务（上传提交后调用，立即返回）；队列已满时返回False，可用 flask reindex-files 补建"""
+    if not SEARCH_CONFIG["ENABLED"]:
+        return False
+    return _pool.submit(file_id, index_file, file_id, group_id, original_name, full_path)
+
+def remove_file_index(file_id: int) -> None:
+    """删除文件时在当前事务内清理其词条（失败只回滚词条删除，不影响删除文件）"""
+    if not SEARCH_CONFIG["ENABLED"]:
+        return
+    try:
+        with savepoint():
+            execute_sql("DELETE FROM sg_file_term WHERE file_id = %s", (file_id,))
+    except Exception as e:
+        print(f"清理搜索索引失败: {e}")
+
+def search_files(user_id: int, query: str, group_id: Optional[int] = None,
+                 limit: int = 20) -> Optional[List[Dict[str, Any]]]:
+    """
+    在用户所在小组的文件中检索：所有查询词都命中才返回，按权重和排序
+    查询失败返回None，查询串切不出索引词时返回空列表
+    """
+    terms = list(tokenize(query))[:SEARCH_CONFIG["MAX_QUERY_TERMS"]]
+    if not terms:
+        return []
+    placeholders = ", ".join(["%s"] * len(terms))
+    params: List[Any] = [user_id, *terms]
+    group_filter = ""
+    if group_id is not None:
+        group_filter = "AND t.group_id = %s"
+        params.append(group_id)
+    params.extend([len(terms), limit])
+    sql = f"""
+        SELECT f.file_id, f.original_name, f.file_size, f.upload_time, f.group_id,
+            g.group_name, u.user_name AS uploader_name, s.score
+        FROM (
+            SELECT t.file_id, SUM(t.weight) AS score
+            FROM sg_file_term t
+            JOIN sg_user_group ug ON ug.group_id = t.group_id AND ug.user_id = %s
+            WHERE t.term IN ({placeholders}) {group_filter}
+            GROUP BY t.file_id
+            HAVING COUNT(*) = %s
+            ORDER BY score DESC, t.file_id DESC
+            LIMIT %s
+        ) s
+        JOIN sg_file f ON f.file_id = s.file_id
+        LEFT JOIN sg_group g ON g.group_id = f.group_id
+        LEFT JOIN sg_user u ON u.user_id = f.uploader_id
+        ORDER BY s.score DESC, f.file_id DESC
+    """
+    return query_all(sql, tuple(params))
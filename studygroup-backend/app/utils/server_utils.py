@@ -0,0 +1,12 @@
+from app.utils.db_utils import get_pool
+from app.utils.stats_utils import start_stats_reconciler
+
+def init_worker_process() -> None:
+    """
+    pre-fork 服务器（gunicorn）在每个 worker 进程 fork 之后调用：
+    - 连接池：丢弃从主进程继承的连接状态，预建本进程的 MIN_SIZE 个连接（主进程预加载应用时不访问数据库，不会建立连接）
+    - 成员统计对账线程：线程不随 fork 继承，预加载模式下主进程不启动，由各 worker 自行启动（STATS_RECONCILE_INTERVAL>0 时）
+    其余进程内组件（统计写入器、后台线程池、事件推送、指标）在 fork 后首次使用时按 pid 自动重建
+    """
+    get_pool().prefill()
+    start_stats_reconciler()
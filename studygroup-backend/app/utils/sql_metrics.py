@@ -0,0 +1,140 @@
+import json
+import re
+import threading
+import time
+from datetime import datetime
+from functools import lru_cache
+from typing import Any, Dict, List, Optional
+
+from flask import Flask, g, has_request_context, request
+
+from app.config import SQL_METRICS_CONFIG
+from app.utils import metrics_utils
+
+# 统计模式：
+#   off   不统计
+#   basic 每条SQL只计时并累加到请求级计数（两次 perf_counter），超过阈值才计算指纹并写慢查询日志；适合生产常开
+#   full  另外按SQL指纹累计次数/耗时/行数（进程内，flask sql-stats 查看），用于压测和排查
+MODE = SQL_METRICS_CONFIG["MODE"]
+ENABLED = MODE in ('basic', 'full')
+
+_STRING_RE = re.compile(r"'(?:[^'\\]|\\.|'')*'|\"(?:[^\"\\]|\\.)*\"")
+_NUMBER_RE = re.compile(r"(?<![\w.])-?\d+(?:\.\d+)?\b")
+_PLACEHOLDER_RE = re.compile(r"%s|%\([^)]+\)s")
+_IN_LIST_RE = re.compile(r"\bIN\s*\(\s*\?(?:\s*,\s*\?)*\s*\)", re.IGNORECASE)
+_VALUES_RE = re.compile(r"\bVALUES\s*\([^()]*\)(?:\s*,\s*\([^()]*\))*", re.IGNORECASE)
+_COMMENT_RE = re.compile(r"/\*.*?\*/|--[^\n]*", re.DOTALL)
+_SPACE_RE = re.compile(r"\s+")
+
+_stats_lock = threading.Lock()
+_fingerprint_stats: Dict[str, Dict[str, Any]] = {}
+_slow_log_lock = threading.Lock()
+
+@lru_cache(maxsize=2048)
+def fingerprint(sql: str) -> str:
+    """
+    SQL指纹：去掉注释与多余空白，字面量与占位符替换为 ?，IN (?, ?, ...) 与多行 VALUES 折叠为一项
+    同一模板不同参数/不同IN长度得到相同指纹（SQL文本多为常量，结果按原文缓存）
+    """
+    text = _COMMENT_RE.sub(' ', sql)
+    text = _STRING_RE.sub('?', text)
+    text = _PLACEHOLDER_RE.sub('?', text)
+    text = _NUMBER_RE.sub('?', text)
+    text = _SPACE_RE.sub(' ', text).strip()
+    text = _IN_LIST_RE.sub('IN (...)', text)
+    text = _VALUES_RE.sub('VALUES (...)', text)
+    return text
+
+def record_query(sql: str, started: float, rows: Optional[int], error: Optional[BaseException] = None) -> None:
+    """记录一条SQL的执行结果（由 db_utils 在 execute 前后调用）；started 为 perf_counter() 读数"""
+    elapsed = time.perf_counter() - started
+    if has_request_context():
+        g._sql_count = g.get('_sql_count', 0) + 1
+        g._sql_time = g.get('_sql_time', 0.0) + elapsed
+    if metrics_utils.ENABLED:
+        metrics_utils.observe_db_query(sql, elapsed, error is not None)
+    elapsed_ms = elapsed * 1000
+    if MODE == 'full':
+        _accumulate(fingerprint(sql), elapsed_ms, rows, error is not None)
+    if elapsed_ms >= SQL_METRICS_CONFIG["SLOW_MS"]:
+        _write_slow_log(sql, elapsed_ms, rows, error)
+
+def _accumulate(key: str, elapsed_ms: float, rows: Optional[int], failed: bool) -> None:
+    with _stats_lock:
+        stats = _fingerprint_stats.get(key)
+        if stats is None:
+            if len(_fingerprint_stats) >= SQL_METRICS_CONFIG["MAX_FINGERPRINTS"]:
+                key = '(other)'
+                stats = _fingerprint_stats.get(key)
+            if stats is None:
+                stats = _fingerprint_stats[key] = {'count': 0, 'errors': 0, 'total_ms': 0.0, 'max_ms': 0.0, 'rows': 0}
+        stats['count'] += 1
+        stats['total_ms'] += elapsed_ms
+        if elapsed_ms > stats['max_ms']:
+            stats['max_ms'] = elapsed_ms
+        if rows is not None and rows > 0:
+            stats['rows'] += rows
+        if failed:
+            stats['errors'] += 1
+
+def _write_slow_log(sql: str, elapsed_ms: float, rows: Optional[int], error: Optional[BaseException]) -> None:
+    """慢查询日志：一行一个JSON（不含参数值，避免把用户数据写进日志）"""
+    record = {
+        'time': datetime.now().isoformat(' ', 'milliseconds'),
+        'duration_ms': round(elapsed_ms, 2),
+        'rows': rows,
+        'fingerprint': fingerprint(sql)
+    }
+    if has_request_context():
+        record['method'] = request.method
+        record['endpoint'] = request.endpoint
+        record['path'] = request.path
+    if error is not None:
+        record['error'] = str(error)
+    line = json.dumps(record, ensure_ascii=False)
+    path = SQL_METRICS_CONFIG["SLOW_LOG_PATH"]
+    if not path:
+        print(f"慢查询：{line}")
+        return
+    try:
+        with _slow_log_lock, open(path, 'a', encoding='utf-8') as f:
+            f.write(line + "\n")
+    except OSError as e:
+        print(f"慢查询日志写入失败：{str(e)}，{line}")
+
+def get_sql_stats(top: int = 20, order_by: str = 'total_ms') -> List[Dict[str, Any]]:
+    """按指纹汇总的SQL统计（仅 full 模式有数据），按 order_by 倒序取前 top 条"""
+    with _stats_lock:
+        items = [dict(stats, fingerprint=key) for key, stats in _fingerprint_stats.items()]
+    for item in items:
+        item['avg_ms'] = round(item['total_ms'] / item['count'], 3) if item['count'] else 0.0
+        item['total_ms'] = round(item['total_ms'], 3)
+        item['max_ms'] = round(item['max_ms'], 3)
+    items.sort(key=lambda item: item.get(order_by, 0), reverse=True)
+    return items[:top]
+
+def reset_sql_stats() -> None:
+    with _stats_lock:
+        _fingerprint_stats.clear()
+
+def init_sql_metrics(app: Flask) -> None:
+    """注册请求钩子：响应头 Server-Timing 附带本次请求的SQL条数与数据库耗时、请求总耗时"""
+    if not ENABLED or not SQL_METRICS_CONFIG["SERVER_TIMING"]:
+        return
+
+    @app.before_request
+    def _start_request_timer():
+        g._request_started = time.perf_counter()
+
+    @app.after_request
+    def _add_server_timing(response):
+        started = g.get('_request_started')
+        if started is None:
+            return response
+        db_ms = g.get('_sql_time', 0.0) * 1000
+        app_ms = (time.perf_counter() - started) * 1000
+        response.headers.add(
+            'Server-Timing',
+            f'db;dur={db_ms:.2f};desc="queries={g.get("_sql_count", 0)}", app;dur={app_ms:.2f}'
+        )
+        return response
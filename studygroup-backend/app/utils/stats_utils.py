@@ -1,57 +1,69 @@
-from app.utils.db_utils import query_one, query_all, execute_sql
-from typing import Dict, Any, Optional
+from app.utils.db_utils import query_one, query_all, execute_sql, savepoint, on_request_commit
+from app.config import STATS_CONFIG
+from typing import Dict, Any, List, Optional
+import threading
 
 def get_member_stats(user_id: int, group_id: int) -> Optional[Dict[str, Any]]:
-    """获取成员在小组中的贡献统计"""
+    """获取成员在小组中的贡献统计（直接读 sg_member_stats，缺失时从源表补齐）"""
     try:
-        # 1. 查询任务统计
-        task_stats = query_one("""
+        sql = """
             SELECT 
-                COUNT(*) as total_tasks,
-                SUM(CASE WHEN status = '完成' THEN 1 ELSE 0 END) as completed_tasks
-            FROM sg_task 
-            WHERE leader_id = %s AND group_id = %s
-        """, (user_id, group_id))
-        
-        # 2. 查询文件统计
-        file_stats = query_one("""
-            SELECT COUNT(*) as uploaded_files
-            FROM sg_file 
-            WHERE uploader_id = %s AND group_id = %s
-        """, (user_id, group_id))
+                ug.role, ug.join_time,
+                ms.user_id IS NOT NULL AS has_stats,
+                COALESCE(ms.total_tasks, 0) as total_tasks,
+                COALESCE(ms.completed_tasks, 0) as completed_tasks,
+                COALESCE(ms.uploaded_files, 0) as uploaded_files
+            FROM sg_user_group ug
+            LEFT JOIN sg_member_stats ms ON ug.user_id = ms.user_id AND ug.group_id = ms.group_id
+            WHERE ug.user_id = %s AND ug.group_id = %s
+        """
+        row = query_one(sql, (user_id, group_id))
+        if not row:
+            return None
         
-        # 3. 查询角色
-        role_info = query_one("""
-            SELECT role, join_time 
-            FROM sg_user_group 
-            WHERE user_id = %s AND group_id = %s
-        """, (user_id, group_id))
+        if not row['has_stats']:
+            # 历史数据尚未建立统计行：按源表计算一次并写入
+            counts = _count_member_stats(user_id, group_id)
+            if counts is None:
+                return None
+            update_stats(user_id, group_id, **counts)
+            row.update(counts)
         
-        if not task_stats or not file_stats or not role_info:
-            return None
-            
-        # 4. 计算完成率
-        total_tasks = task_stats['total_tasks'] or 0
-        completed_tasks = task_stats['completed_tasks'] or 0
-        uploaded_files = file_stats['uploaded_files'] or 0
+        # 计算完成率
+        total_tasks = row['total_tasks'] or 0
+        completed_tasks = row['completed_tasks'] or 0
+        uploaded_files = row['uploaded_files'] or 0
         completion_rate = int((completed_tasks / total_tasks * 100)) if total_tasks > 0 else 0
         
-        # 5. 更新统计表（保持数据同步）
-        update_stats(user_id, group_id, total_tasks, completed_tasks, uploaded_files)
-        
         return {
             'total_tasks': total_tasks,
             'completed_tasks': completed_tasks,
             'uploaded_files': uploaded_files,
             'completion_rate': completion_rate,
-            'role': role_info['role'],
-            'join_time': role_info['join_time'].strftime('%Y-%m-%d %H:%M:%S') if role_info['join_time'] else None
+            'role': row['role'],
+            'join_time': row['join_time']
         }
         
     except Exception as e:
         print(f"获取成员统计失败: {e}")
         return None
 
+def _count_member_stats(user_id: int, group_id: int) -> Optional[Dict[str, int]]:
+    """从 sg_task / sg_file 源表计算成员统计"""
+    row = query_one("""
+        SELECT 
+            (SELECT COUNT(*) FROM sg_task WHERE leader_id = %s AND group_id = %s) as total_tasks,
+            (SELECT COUNT(*) FROM sg_task WHERE leader_id = %s AND group_id = %s AND status = '完成') as completed_tasks,
+            (SELECT COUNT(*) FROM sg_file WHERE uploader_id = %s AND group_id = %s) as uploaded_files
+    """, (user_id, group_id, user_id, group_id, user_id, group_id))
+    if not row:
+        return None
+    return {
+        'total_tasks': int(row['total_tasks'] or 0),
+        'completed_tasks': int(row['completed_tasks'] or 0),
+        'uploaded_files': int(row['uploaded_files'] or 0)
+    }
+
 def update_stats(user_id: int, group_id: int, total_tasks: int, completed_tasks: int, uploaded_files: int) -> bool:
     """更新成员统计表"""
     try:
@@ -70,10 +82,167 @@ def update_stats(user_id: int, group_id: int, total_tasks: int, completed_tasks:
         print(f"更新统计失败: {e}")
         return False
 
-def get_group_members_with_stats(group_id: int) -> Optional[list]:
-    """获取小组成员及其统计信息"""
+def apply_stats_delta(user_id: int, group_id: int, total_tasks: int = 0,
+                      completed_tasks: int = 0, uploaded_files: int = 0) -> bool:
+    """按增量原子更新成员统计（写入代价与历史数据量无关）"""
+    if not (total_tasks or completed_tasks or uploaded_files):
+        return True
     try:
-        sql = """
+        update_sql = """
+            UPDATE sg_member_stats SET
+                total_tasks = GREATEST(CAST(total_tasks AS SIGNED) + %s, 0),
+                completed_tasks = GREATEST(CAST(completed_tasks AS SIGNED) + %s, 0),
+                uploaded_files = GREATEST(CAST(uploaded_files AS SIGNED) + %s, 0),
+                last_active = NOW()
+            WHERE user_id = %s AND group_id = %s
+        """
+        success, affected_rows = execute_sql(
+            update_sql, (total_tasks, completed_tasks, uploaded_files, user_id, group_id)
+        )
+        if not success:
+            return False
+        if affected_rows:
+            return True
+        # 统计行不存在：从源表整行计算（源表已包含本次变更），并发插入时退化为增量
+        insert_sql = """
+            INSERT INTO sg_member_stats (user_id, group_id, total_tasks, completed_tasks, uploaded_files, last_active)
+            SELECT %s, %s,
+                (SELECT COUNT(*) FROM sg_task WHERE leader_id = %s AND group_id = %s),
+                (SELECT COUNT(*) FROM sg_task WHERE leader_id = %s AND group_id = %s AND status = '完成'),
+                (SELECT COUNT(*) FROM sg_file WHERE uploader_id = %s AND group_id = %s),
+                NOW()
+            ON DUPLICATE KEY UPDATE 
+                total_tasks = GREATEST(CAST(sg_member_stats.total_tasks AS SIGNED) + %s, 0),
+                completed_tasks = GREATEST(CAST(sg_member_stats.completed_tasks AS SIGNED) + %s, 0),
+                uploaded_files = GREATEST(CAST(sg_member_stats.uploaded_files AS SIGNED) + %s, 0),
+                last_active = NOW()
+        """
+        success, _ = execute_sql(insert_sql, (
+            user_id, group_id,
+            user_id, group_id, user_id, group_id, user_id, group_id,
+            total_tasks, completed_tasks, uploaded_files
+        ))
+        return success
+    except Exception as e:
+        print(f"增量更新统计失败: {e}")
+        return False
+
+def record_stats_delta(user_id: int, group_id: int, total_tasks: int = 0,
+                       completed_tasks: int = 0, uploaded_files: int = 0) -> bool:
+    """
+    记录一次统计变更事件（任务创建/状态变更、文件上传/删除）
+    开启 write-behind 时在请求事务提交后放入后台队列批量写入；否则在当前事务内写入，失败只回滚统计本身
+    """
+    if STATS_CONFIG["WRITE_BEHIND"]:
+        from app.utils.stats_writer import get_stats_writer
+        on_request_commit(lambda: get_stats_writer().submit(
+            user_id, group_id, total_tasks, completed_tasks, uploaded_files
+        ))
+        return True
+    try:
+        with savepoint():
+            return apply_stats_delta(user_id, group_id, total_tasks, completed_tasks, uploaded_files)
+    except Exception as e:
+        print(f"记录统计变更失败: {e}")
+        return False
+
+def reconcile_member_stats(group_id: Optional[int] = None, fix: bool = True) -> Optional[Dict[str, Any]]:
+    """
+    对账：从源表重新计算成员统计，与 sg_member_stats 比较并报告偏差
+    fix=True 时将偏差行修正为源表结果；group_id 为空时检查全部小组
+    """
+    sql = """
+        SELECT 
+            ug.user_id, ug.group_id,
+            COALESCE(t.total_tasks, 0) as total_tasks,
+            COALESCE(t.completed_tasks, 0) as completed_tasks,
+            COALESCE(f.uploaded_files, 0) as uploaded_files,
+            ms.user_id IS NOT NULL AS has_stats,
+            ms.total_tasks as stored_total_tasks,
+            ms.completed_tasks as stored_completed_tasks,
+            ms.uploaded_files as stored_uploaded_files
+        FROM sg_user_group ug
+        LEFT JOIN (
+            SELECT leader_id, group_id,
+                COUNT(*) as total_tasks,
+                SUM(CASE WHEN status = '完成' THEN 1 ELSE 0 END) as completed_tasks
+            FROM sg_task GROUP BY leader_id, group_id
+        ) t ON t.leader_id = ug.user_id AND t.group_id = ug.group_id
+        LEFT JOIN (
+            SELECT uploader_id, group_id, COUNT(*) as uploaded_files
+            FROM sg_file GROUP BY uploader_id, group_id
+        ) f ON f.uploader_id = ug.user_id AND f.group_id = ug.group_id
+        LEFT JOIN sg_member_stats ms ON ms.user_id = ug.user_id AND ms.group_id = ug.group_id
+    """
+    params = ()
+    if group_id is not None:
+        sql += " WHERE ug.group_id = %s"
+        params = (group_id,)
+    rows = query_all(sql, params)
+    if rows is None:
+        return None
+    
+    drifted, fixed = [], 0
+    fields = ('total_tasks', 'completed_tasks', 'uploaded_files')
+    for row in rows:
+        expected = {field: int(row[field] or 0) for field in fields}
+        stored = {field: row[f'stored_{field}'] for field in fields} if row['has_stats'] else None
+        if stored == expected:
+            continue
+        drifted.append({
+            'user_id': row['user_id'],
+            'group_id': row['group_id'],
+            'expected': expected,
+            'stored': stored
+        })
+        if fix and update_stats(row['user_id'], row['group_id'], **expected):
+            fixed += 1
+    
+    return {'checked': len(rows), 'drifted': drifted, 'fixed': fixed}
+
+_reconciler_thread: Optional[threading.Thread] = None
+_reconciler_stop = threading.Event()
+
+def start_stats_reconciler(interval: float = None) -> bool:
+    """启动后台定期对账线程（interval<=0 时不启动；每个进程最多一个）"""
+    global _reconciler_thread
+    interval = STATS_CONFIG["RECONCILE_INTERVAL"] if interval is None else interval
+    if interval <= 0 or (_reconciler_thread is not None and _reconciler_thread.is_alive()):
+        return False
+    _reconciler_stop.clear()
+
+    def _run() -> None:
+        while not _reconciler_stop.wait(interval):
+            report = reconcile_member_stats(fix=True)
+            if report and report['drifted']:
+                print(f"成员统计对账：检查{report['checked']}条，偏差{len(report['drifted'])}条，已修正{report['fixed']}条")
+
+    _reconciler_thread = threading.Thread(target=_run, name='stats-reconciler', daemon=True)
+    _reconciler_thread.start()
+    return True
+
+def stop_stats_reconciler(timeout: float = 5.0) -> bool:
+    """停止定期对账线程（正在执行的一轮对账会先做完，最多等待 timeout 秒）；未在运行时返回False"""
+    global _reconciler_thread
+    thread = _reconciler_thread
+    if thread is None or not thread.is_alive():
+        return False
+    _reconciler_stop.set()
+    thread.join(timeout)
+    _reconciler_thread = None
+    return True
+
+def get_group_members_with_stats(group_id: int, user_ids: Optional[List[int]] = None) -> Optional[list]:
+    """获取小组成员及其统计信息（user_ids：只查指定成员）"""
+    try:
+        params: List[Any] = [group_id]
+        member_filter = ""
+        if user_ids is not None:
+            if not user_ids:
+                return []
+            member_filter = f"AND ug.user_id IN ({', '.join(['%s'] * len(user_ids))})"
+            params.extend(user_ids)
+        sql = f"""
             SELECT 
                 u.user_id, u.user_name, u.contact,
                 ug.role, ug.join_time,
@@ -88,7 +257,7 @@ def get_group_members_with_stats(group_id: int) -> Optional[list]:
             FROM sg_user_group ug
             LEFT JOIN sg_user u ON ug.user_id = u.user_id
             LEFT JOIN sg_member_stats ms ON ug.user_id = ms.user_id AND ug.group_id = ms.group_id
-            WHERE ug.group_id = %s
+            WHERE ug.group_id = %s {member_filter}
             ORDER BY 
                 CASE ug.role 
                     WHEN 'creator' THEN 1
@@ -97,13 +266,7 @@ def get_group_members_with_stats(group_id: int) -> Optional[list]:
                 END,
                 u.user_name
         """
-        members = query_all(sql, (group_id,))
-        
-        if members:
-            for member in members:
-                if member['join_time']:
-                    member['join_time'] = member['join_time'].strftime('%Y-%m-%d %H:%M:%S')
-        return members
+        return query_all(sql, tuple(params))
         
     except Exception as e:
         print(f"获取成员统计列表失败: {e}")
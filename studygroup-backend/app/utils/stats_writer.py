@@ -0,0 +1,247 @@
+import atexit
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.utils.db_utils import execute_sql, query_all
+
+_FIELDS = ('total_tasks', 'completed_tasks', 'uploaded_files')
+
+class StatsWriter:
+    """
+    成员统计的后台批量写入器（write-behind）
+    - 同一 (user_id, group_id) 的多次变更在内存中合并为一个增量
+    - 按间隔或积压量触发，已有统计行用一条多行 INSERT ... ON DUPLICATE KEY UPDATE 批量累加；统计行不存在的逐行从源表补齐
+    - 写入失败的增量放回队列，连续失败时按指数退避拉长间隔；同一增量失败超过 max_retries 次后丢弃（flask reconcile-stats 可修复）
+    - 进程退出时把剩余增量刷入数据库
+    """
+
+    def __init__(self, flush_interval: float = 1.0, max_batch: int = 500, max_retries: int = 5,
+                 max_backoff: float = 60.0):
+        self.flush_interval = flush_interval
+        self.max_batch = max(1, max_batch)
+        self.max_retries = max(0, max_retries)
+        self.max_backoff = max(flush_interval, max_backoff)
+        self._cond = threading.Condition()
+        self._pending: Dict[Tuple[int, int], List[int]] = {}
+        self._retries: Dict[Tuple[int, int], int] = {}  # 积压中各增量已失败的次数
+        self._failed_flushes = 0  # 连续失败的写入次数（决定退避间隔）
+        self._thread: Optional[threading.Thread] = None
+        self._pid = os.getpid()
+        self._stopping = False
+        self._flush_lock = threading.Lock()  # 保证同一时刻只有一个批次在写
+        self._stats = {
+            'events': 0,           # 收到的变更事件数
+            'coalesced': 0,        # 被合并进已有增量的事件数
+            'flushes': 0,          # 批量写入次数
+            'rows_flushed': 0,     # 写入的 (user_id, group_id) 行数
+            'failures': 0,         # 写入失败次数（失败的增量会放回队列重试）
+            'dropped': 0,          # 超过重试次数被丢弃的增量数
+            'last_flush_ms': 0.0,
+            'max_flush_ms': 0.0,
+            'total_flush_ms': 0.0
+        }
+
+    def submit(self, user_id: int, group_id: int, total_tasks: int = 0,
+               completed_tasks: int = 0, uploaded_files: int = 0) -> None:
+        """加入一条统计增量（立即返回，不访问数据库）"""
+        if not (total_tasks or completed_tasks or uploaded_files):
+            return
+        with self._cond:
+            self._check_fork()
+            key = (int(user_id), int(group_id))
+            delta = self._pending.get(key)
+            if delta is None:
+                self._pending[key] = [total_tasks, completed_tasks, uploaded_files]
+            else:
+                delta[0] += total_tasks
+                delta[1] += completed_tasks
+                delta[2] += uploaded_files
+                self._stats['coalesced'] += 1
+            self._stats['events'] += 1
+            self._ensure_thread()
+            if len(self._pending) >= self.max_batch:
+                self._cond.notify()
+
+    def flush(self) -> int:
+        """把当前积压的增量写入数据库，返回写入的行数"""
+        with self._flush_lock:
+            with self._cond:
+                self._check_fork()
+                batch, self._pending = self._pending, {}
+            batch = {key: delta for key, delta in batch.items() if any(delta)}
+            if not batch:
+                return 0
+            start = time.perf_counter()
+            failed = self._write_batch(batch)
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            dropped = 0
+            with self._cond:
+                for key in batch:
+                    if key in failed:
+                        continue
+                    # 写入成功；写入期间又有新增量时从头计数
+                    self._retries.pop(key, None)
+                for key, delta in failed.items():
+                    attempts = self._retries.get(key, 0) + 1
+                    if attempts > self.max_retries:
+                        self._retries.pop(key, None)
+                        dropped += 1
+                        continue
+                    self._retries[key] = attempts
+                    pending = self._pending.setdefault(key, [0, 0, 0])
+                    for i in range(3):
+                        pending[i] += delta[i]
+                self._failed_flushes = self._failed_flushes + 1 if failed else 0
+                self._stats['flushes'] += 1
+                self._stats['rows_flushed'] += len(batch) - len(failed)
+                self._stats['failures'] += 1 if failed else 0
+                self._stats['dropped'] += dropped
+                self._stats['last_flush_ms'] = round(elapsed_ms, 3)
+                self._stats['max_flush_ms'] = max(self._stats['max_flush_ms'], round(elapsed_ms, 3))
+                self._stats['total_flush_ms'] += elapsed_ms
+            if dropped:
+                print(f"成员统计写入连续失败{self.max_retries + 1}次，已丢弃{dropped}条增量（运行 flask reconcile-stats 修复）")
+            return len(batch) - len(failed)
+
+    def _write_batch(self, batch: Dict[Tuple[int, int], List[int]]) -> Dict[Tuple[int, int], List[int]]:
+        """写入一个批次，返回写入失败的增量"""
+        from app.utils.stats_utils import apply_stats_delta
+
+        # 只有非负增量可以安全地用 VALUES() 合并进多行UPSERT；含负数的（删除文件、取消完成）逐行走带下限的UPDATE
+        increments = {key: delta for key, delta in batch.items() if min(delta) >= 0}
+        failed: Dict[Tuple[int, int], List[int]] = {}
+        missing: List[Tuple[Tuple[int, int], List[int]]] = []
+        items = list(increments.items())
+        for offset in range(0, len(items), self.max_batch):
+            chunk = items[offset:offset + self.max_batch]
+            existing = self._existing_keys([key for key, _ in chunk])
+            if existing is None:
+                failed.update(chunk)
+                continue
+            # 统计行不存在时增量不能当作总数写入（历史任务/文件未计入），交给 apply_stats_delta 从源表整行计算
+            missing.extend((key, delta) for key, delta in chunk if key not in existing)
+            chunk = [(key, delta) for key, delta in chunk if key in existing]
+            if not chunk:
+                continue
+            sql = """
+                INSERT INTO sg_member_stats (user_id, group_id, total_tasks, completed_tasks, uploaded_files, last_active)
+                VALUES {}
+                ON DUPLICATE KEY UPDATE
+                    total_tasks = total_tasks + VALUES(total_tasks),
+                    completed_tasks = completed_tasks + VALUES(completed_tasks),
+                    uploaded_files = uploaded_files + VALUES(uploaded_files),
+                    last_active = NOW()
+            """.format(", ".join(["(%s, %s, %s, %s, %s, NOW())"] * len(chunk)))
+            params = tuple(value for (user_id, group_id), delta in chunk for value in (user_id, group_id, *delta))
+            success, _ = execute_sql(sql, params)
+            if not success:
+                # 整批失败时逐行重试，个别写不进的行不拖累同批的其他行
+                failed.update(self._write_rows(chunk, apply_stats_delta))
+        missing.extend((key, delta) for key, delta in batch.items() if key not in increments)
+        failed.update(self._write_rows(missing, apply_stats_delta))
+        return failed
+
+    @staticmethod
+    def _existing_keys(keys: List[Tuple[int, int]]) -> Optional[set]:
+        """查询已有统计行的 (user_id, group_id)，查询失败返回None"""
+        rows = query_all(
+            "SELECT user_id, group_id FROM sg_member_stats WHERE (user_id, group_id) IN ({})".format(
+                ", ".join(["(%s, %s)"] * len(keys))),
+            tuple(value for key in keys for value in key)
+        )
+        if rows is None:
+            return None
+        return {(int(row['user_id']), int(row['group_id'])) for row in rows}
+
+    @staticmethod
+    def _write_rows(rows: List[Tuple[Tuple[int, int], List[int]]], apply: Any,
+                    max_consecutive_failures: int = 3) -> Dict[Tuple[int, int], List[int]]:
+        """逐行写入，返回失败的增量；连续多行失败时视为数据库不可用，剩余行不再尝试"""
+        failed: Dict[Tuple[int, int], List[int]] = {}
+        consecutive = 0
+        for index, (key, delta) in enumerate(rows):
+            if apply(key[0], key[1], *delta):
+                consecutive = 0
+                continue
+            failed[key] = delta
+            consecutive += 1
+            if consecutive >= max_consecutive_failures:
+                failed.update(rows[index + 1:])
+                break
+        return failed
+
+    def stats(self) -> Dict[str, Any]:
+        """队列深度与写入耗时"""
+        with self._cond:
+            self._check_fork()
+            snapshot = dict(self._stats)
+            snapshot['queue_depth'] = len(self._pending)
+            snapshot['avg_flush_ms'] = round(snapshot['total_flush_ms'] / snapshot['flushes'], 3) if snapshot['flushes'] else 0.0
+            snapshot['total_flush_ms'] = round(snapshot['total_flush_ms'], 3)
+        return snapshot
+
+    def stop(self) -> None:
+        """停止后台线程并刷入剩余增量（进程退出时自动调用）"""
+        with self._cond:
+            self._stopping = True
+            self._cond.notify()
+            thread = self._thread
+        if thread is not None and thread.is_alive() and thread is not threading.current_thread():
+            thread.join(timeout=max(5.0, self.flush_interval * 2))
+        self.flush()
+
+    def _ensure_thread(self) -> None:
+        if self._stopping or (self._thread is not None and self._thread.is_alive()):
+            return
+        self._thread = threading.Thread(target=self._run, name='stats-writer', daemon=True)
+        self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                if self._failed_flushes:
+                    # 连续写入失败（如数据库不可用）时按指数退避，积压达到上限也不提前重试
+                    deadline = time.monotonic() + min(self.flush_interval * 2 ** self._failed_flushes, self.max_backoff)
+                    while not self._stopping and time.monotonic() < deadline:
+                        self._cond.wait(deadline - time.monotonic())
+                elif not self._stopping and len(self._pending) < self.max_batch:
+                    self._cond.wait(self.flush_interval)
+                stopping = self._stopping
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"统计批量写入异常：{str(e)}")
+            if stopping:
+                return
+
+    def _check_fork(self) -> None:
+        """fork 出的子进程不继承父进程的积压（由父进程负责写入），后台线程在子进程中按需重建"""
+        if os.getpid() != self._pid:
+            self._pid = os.getpid()
+            self._pending = {}
+            self._retries = {}
+            self._failed_flushes = 0
+            self._thread = None
+            self._stopping = False
+
+
+_writer: Optional[StatsWriter] = None
+_writer_lock = threading.Lock()
+
+def get_stats_writer() -> StatsWriter:
+    """进程内共享的统计写入器（首次调用时创建，并注册退出时刷盘）"""
+    global _writer
+    if _writer is None:
+        from app.config import STATS_CONFIG
+        with _writer_lock:
+            if _writer is None:
+                _writer = StatsWriter(
+                    flush_interval=STATS_CONFIG["FLUSH_INTERVAL"],
+                    max_batch=STATS_CONFIG["MAX_BATCH"],
+                    max_retries=STATS_CONFIG["MAX_RETRIES"],
+                    max_backoff=STATS_CONFIG["MAX_BACKOFF"]
+                )
+                atexit.register(_writer.stop)
+    return _writer
@@ -0,0 +1,192 @@
+import json
+import os
+import re
+import secrets
+import shutil
+import threading
+import time
+from typing import Any, BinaryIO, Dict, List, Optional, Tuple
+
+from app.config import CHUNK_UPLOAD_CONFIG
+
+# 上传会话目录结构：STAGING_PATH/<upload_id>/meta.json、<序号>.part、.commit（合并锁）
+_UPLOAD_ID_RE = re.compile(r'^[0-9a-f]{32}$')
+_COPY_BUFFER = 64 * 1024
+
+_gc_lock = threading.Lock()
+_last_gc = 0.0
+
+def _session_dir(upload_id: str) -> str:
+    return os.path.join(CHUNK_UPLOAD_CONFIG["STAGING_PATH"], upload_id)
+
+def _chunk_path(upload_id: str, index: int) -> str:
+    return os.path.join(_session_dir(upload_id), f"{index}.part")
+
+def chunk_length(session: Dict[str, Any], index: int) -> int:
+    """第 index 个分片应有的字节数（最后一片可能不足 chunk_size）"""
+    if index < session['total_chunks'] - 1:
+        return session['chunk_size']
+    return session['file_size'] - session['chunk_size'] * (session['total_chunks'] - 1)
+
+def create_upload_session(group_id: int, uploader_id: int, file_name: str,
+                          file_size: int, chunk_size: int) -> Dict[str, Any]:
+    """创建上传会话（只写暂存目录，不访问数据库）"""
+    upload_id = secrets.token_hex(16)
+    session = {
+        'upload_id': upload_id,
+        'group_id': group_id,
+        'uploader_id': uploader_id,
+        'file_name': file_name,
+        'file_size': file_size,
+        'chunk_size': chunk_size,
+        'total_chunks': max(1, -(-file_size // chunk_size)),
+        'created_at': time.time()
+    }
+    session_dir = _session_dir(upload_id)
+    os.makedirs(session_dir)
+    tmp_path = os.path.join(session_dir, 'meta.json.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(session, f, ensure_ascii=False)
+    os.replace(tmp_path, os.path.join(session_dir, 'meta.json'))
+    return session
+
+def load_upload_session(upload_id: str) -> Optional[Dict[str, Any]]:
+    """读取上传会话，upload_id 非法或会话不存在（已合并/已清理）时返回None"""
+    if not _UPLOAD_ID_RE.match(upload_id or ''):
+        return None
+    try:
+        with open(os.path.join(_session_dir(upload_id), 'meta.json'), encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def save_chunk(session: Dict[str, Any], index: int, stream: BinaryIO) -> Tuple[bool, str]:
+    """
+    流式写入一个分片：先写临时文件，长度校验通过后原子替换（同一分片重复上传以最后一次为准）
+    返回：(是否成功, 错误信息)
+    """
+    expected = chunk_length(session, index)
+    final_path = _chunk_path(session['upload_id'], index)
+    tmp_path = f"{final_path}.{secrets.token_hex(4)}.tmp"
+    received = 0
+    try:
+        with open(tmp_path, 'wb') as f:
+            while True:
+                block = stream.read(_COPY_BUFFER)
+                if not block:
+                    break
+                received += len(block)
+                if received > expected:
+                    break
+                f.write(block)
+        if received != expected:
+            os.remove(tmp_path)
+            return False, f"分片{index}大小应为{expected}字节"
+        os.replace(tmp_path, final_path)
+        return True, ""
+    except OSError as e:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        print(f"分片写入失败：{str(e)}")
+        return False, "分片写入失败"
+
+def get_received_chunks(session: Dict[str, Any]) -> List[int]:
+    """已完整收到的分片序号（升序）"""
+    received = []
+    try:
+        names = os.listdir(_session_dir(session['upload_id']))
+    except OSError:
+        return received
+    for name in names:
+        index = name[:-len('.part')]
+        if name.endswith('.part') and index.isdigit() and int(index) < session['total_chunks']:
+            received.append(int(index))
+    return sorted(received)
+
+def assemble_upload(session: Dict[str, Any], hasher: Any = None) -> Tuple[Optional[str], str]:
+    """
+    按序合并全部分片为暂存目录中的完整文件，并持有合并锁（防止重复commit）
+    传入 hasher（如 hashlib.sha256()）时合并过程中顺带计算内容哈希
+    返回：(合并后的文件路径, "") 或 (None, 错误信息)；失败时锁已释放
+    """
+    upload_id = session['upload_id']
+    lock_path = os.path.join(_session_dir(upload_id), '.commit')
+    try:
+        os.close(os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+    except FileExistsError:
+        return None, "该上传正在合并，请勿重复提交"
+    except OSError:
+        return None, "上传会话不存在或已过期"
+
+    missing = sorted(set(range(session['total_chunks'])) - set(get_received_chunks(session)))
+    if missing:
+        release_upload_lock(upload_id)
+        return None, f"缺少分片：{','.join(str(i) for i in missing[:20])}"
+
+    assembled_path = os.path.join(_session_dir(upload_id), 'assembled')
+    try:
+        with open(assembled_path, 'wb') as out:
+            for index in range(session['total_chunks']):
+                with open(_chunk_path(upload_id, index), 'rb') as chunk:
+                    if hasher is None:
+                        shutil.copyfileobj(chunk, out, _COPY_BUFFER)
+                        continue
+                    for block in iter(lambda: chunk.read(_COPY_BUFFER), b''):
+                        hasher.update(block)
+                        out.write(block)
+        if os.path.getsize(assembled_path) != session['file_size']:
+            raise OSError("合并后文件大小与声明不一致")
+        return assembled_path, ""
+    except OSError as e:
+        print(f"分片合并失败：{str(e)}")
+        if os.path.exists(assembled_path):
+            os.remove(assembled_path)
+        release_upload_lock(upload_id)
+        return None, "分片合并失败，请重新上传"
+
+def release_upload_lock(upload_id: str) -> None:
+    """释放合并锁（入库失败后允许客户端重新commit）"""
+    try:
+        os.remove(os.path.join(_session_dir(upload_id), '.commit'))
+    except OSError:
+        pass
+
+def delete_upload_session(upload_id: str) -> None:
+    """删除上传会话及其全部分片"""
+    if _UPLOAD_ID_RE.match(upload_id or ''):
+        shutil.rmtree(_session_dir(upload_id), ignore_errors=True)
+
+def gc_upload_sessions(ttl: Optional[float] = None) -> int:
+    """清理超过 ttl 秒无活动（目录内无新分片写入）的上传会话，返回清理数量"""
+    ttl = CHUNK_UPLOAD_CONFIG["SESSION_TTL"] if ttl is None else ttl
+    staging_path = CHUNK_UPLOAD_CONFIG["STAGING_PATH"]
+    if not os.path.isdir(staging_path):
+        return 0
+    deadline = time.time() - ttl
+    removed = 0
+    for name in os.listdir(staging_path):
+        session_dir = os.path.join(staging_path, name)
+        try:
+            if os.path.getmtime(session_dir) >= deadline:
+                continue
+        except OSError:
+            continue
+        shutil.rmtree(session_dir, ignore_errors=True)
+        removed += 1
+    return removed
+
+def maybe_gc_upload_sessions() -> None:
+    """按 GC_INTERVAL 节流的自动清理（在创建上传会话时顺带触发）"""
+    global _last_gc
+    now = time.monotonic()
+    if now - _last_gc < CHUNK_UPLOAD_CONFIG["GC_INTERVAL"] or not _gc_lock.acquire(blocking=False):
+        return
+    try:
+        _last_gc = now
+        removed = gc_upload_sessions()
+        if removed:
+            print(f"已清理过期上传会话{removed}个")
+    except Exception as e:
+        print(f"上传会话清理失败：{str(e)}")
+    finally:
+        _gc_lock.release()
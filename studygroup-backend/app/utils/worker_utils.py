@@ -0,0 +1,52 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Hashable, Optional, Set
+
+class BackgroundPool:
+    """
+    有界的后台线程池（预览生成、搜索索引等上传后的异步任务共用）
+    - 排队+执行中的任务数不超过 queue_size，超出时 submit 返回False（任务被丢弃，由调用方决定是否补做）
+    - 同一 key 的任务在完成前不重复排队
+    - fork 出的子进程中首次提交时重建线程池（线程不会被继承）
+    """
+
+    def __init__(self, name: str, workers: int, queue_size: int):
+        self.name = name
+        self.workers = max(1, workers)
+        self.queue_size = max(1, queue_size)
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._pid: Optional[int] = None
+        self._slots: Optional[threading.BoundedSemaphore] = None
+        self._pending: Set[Hashable] = set()
+
+    def submit(self, key: Hashable, fn: Callable[..., Any], *args: Any) -> bool:
+        with self._lock:
+            if self._executor is None or self._pid != os.getpid():
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix=self.name)
+                self._pid = os.getpid()
+                self._slots = threading.BoundedSemaphore(self.queue_size)
+                self._pending = set()
+            if key in self._pending:
+                return False
+            if not self._slots.acquire(blocking=False):
+                return False
+            self._pending.add(key)
+            self._executor.submit(self._run, self._slots, self._pending, key, fn, args)
+        return True
+
+    def _run(self, slots: threading.BoundedSemaphore, pending: Set[Hashable], key: Hashable,
+             fn: Callable[..., Any], args: tuple) -> None:
+        try:
+            fn(*args)
+        except Exception as e:
+            print(f"后台任务执行失败（{self.name}）：{str(e)}")
+        finally:
+            with self._lock:
+                pending.discard(key)
+            slots.release()
+
+    def pending_count(self) -> int:
+        with self._lock:
+            return len(self._pending) if self._pid == os.getpid() else 0
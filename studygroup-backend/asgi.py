@@ -0,0 +1,4 @@
+# ASGI 入口：uvicorn asgi:app（或 python run.py --asgi）；下载/预览为异步接口，其余接口复用 Flask 视图
+from app.asgi import application
+
+app = application
@@ -0,0 +1,333 @@
+"""
+接口压测：在独立的压测库中生成数据，用 Flask test client 按比例混合调用真实接口
+不经过网络与WSGI服务器，测量的是应用代码 + 数据库的耗时；单进程多线程，结果用于同一台机器上前后两次对比
+
+用法（在 studygroup-backend 目录下执行）：
+    python -m benchmarks.bench --database study_group_hub_bench --duration 30 --threads 8 --output before.json
+    python -m benchmarks.bench --database study_group_hub_bench --duration 30 --threads 8 --compare before.json
+本机没有MySQL时可临时启动一个：docker run -d -p 3306:3306 -e MYSQL_ALLOW_EMPTY_PASSWORD=yes mysql:8.0
+
+每次运行默认重建压测库并按 --seed 生成相同的数据（库名必须包含 bench，防止误删业务库）
+SQL条数与数据库耗时取自响应头 Server-Timing（需 SQL_METRICS_MODE 不为 off）
+--compare 时任一接口 p95 变慢超过 --threshold 或平均SQL条数增加超过 0.5 条，退出码为1
+"""
+import argparse
+import io
+import json
+import math
+import os
+import platform
+import random
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from benchmarks.seed import DEFAULT_SCALE, create_database, seed_data, load_dataset
+
+# 接口混合比例（按前端页面的实际调用频率估计：看板/进度/成员列表最频繁，上传最少）
+DEFAULT_MIX = {
+    "login": 5,
+    "list_groups": 15,
+    "task_board": 20,
+    "progress": 20,
+    "members": 15,
+    "download": 15,
+    "upload": 10
+}
+
+_SERVER_TIMING_RE = re.compile(r'db;dur=([\d.]+);desc="queries=(\d+)"')
+
+# ---------- 接口调用 ----------
+# 每个函数发起一次请求，返回响应；dataset 为 seed.load_dataset 的结果
+
+def _pick_membership(rng: random.Random, dataset: Dict[str, Any]) -> Tuple[int, int]:
+    return rng.choice(dataset["memberships"])
+
+def op_login(client: Any, rng: random.Random, dataset: Dict[str, Any], options: Dict[str, Any]) -> Any:
+    user_id = rng.choice(list(dataset["contacts"]))
+    return client.post("/api/user/login", json={"user_id": user_id, "contact": dataset["contacts"][user_id]})
+
+def op_list_groups(client: Any, rng: random.Random, dataset: Dict[str, Any], options: Dict[str, Any]) -> Any:
+    user_id, _ = _pick_membership(rng, dataset)
+    return client.get(f"/api/group/user/{user_id}")
+
+def op_task_board(client: Any, rng: random.Random, dataset: Dict[str, Any], options: Dict[str, Any]) -> Any:
+    _, group_id = _pick_membership(rng, dataset)
+    return client.get(f"/api/task/group/{group_id}")
+
+def op_progress(client: Any, rng: random.Random, dataset: Dict[str, Any], options: Dict[str, Any]) -> Any:
+    _, group_id = _pick_membership(rng, dataset)
+    return client.get(f"/api/task/group/{group_id}/progress")
+
+def op_members(client: Any, rng: random.Random, dataset: Dict[str, Any], options: Dict[str, Any]) -> Any:
+    user_id, group_id = _pick_membership(rng, dataset)
+    return client.get(f"/api/group/{group_id}/members", query_string={"user_id": user_id})
+
+def op_download(client: Any, rng: random.Random, dataset: Dict[str, Any], options: Dict[str, Any]) -> Any:
+    file_id, group_id = rng.choice(dataset["files"])
+    user_id = rng.choice(dataset["group_members"][group_id])
+    return client.get(f"/api/file/download/{file_id}", query_string={"user_id": user_id})
+
+def op_upload(client: Any, rng: random.Random, dataset: Dict[str, Any], options: Dict[str, Any]) -> Any:
+    user_id, group_id = _pick_membership(rng, dataset)
+    return client.post("/api/file/upload", content_type="multipart/form-data", data={
+        "group_id": str(group_id),
+        "uploader_id": str(user_id),
+        "file": (io.BytesIO(options["upload_payload"]), f"压测上传{rng.randint(1, 10 ** 6)}.txt")
+    })
+
+OPERATIONS: Dict[str, Callable[..., Any]] = {
+    "login": op_login,
+    "list_groups": op_list_groups,
+    "task_board": op_task_board,
+    "progress": op_progress,
+    "members": op_members,
+    "download": op_download,
+    "upload": op_upload
+}
+
+def _is_success(name: str, response: Any, body: bytes) -> bool:
+    """下载接口要求返回文件内容，其余接口要求JSON中 code 为200"""
+    if response.status_code != 200:
+        return False
+    if name == "download":
+        return response.mimetype != "application/json" and len(body) > 0
+    try:
+        return json.loads(body).get("code") == 200
+    except ValueError:
+        return False
+
+# ---------- 执行 ----------
+
+def _run_worker(app: Any, worker_id: int, names: List[str], weights: List[int], dataset: Dict[str, Any],
+                options: Dict[str, Any], deadline: float, samples: Dict[str, List[Tuple[float, Optional[int], Optional[float], bool]]]) -> None:
+    client = app.test_client()
+    rng = random.Random(options["seed"] * 1000 + worker_id)
+    while time.perf_counter() < deadline:
+        name = rng.choices(names, weights)[0]
+        started = time.perf_counter()
+        try:
+            response = OPERATIONS[name](client, rng, dataset, options)
+            body = response.get_data()  # 读完响应体（下载接口边读文件边发送）
+        except Exception as e:
+            print(f"请求异常（{name}）：{str(e)}")
+            samples[name].append((time.perf_counter() - started, None, None, False))
+            continue
+        elapsed = time.perf_counter() - started
+        ok = _is_success(name, response, body)
+        response.close()
+        queries, db_ms = None, None
+        match = _SERVER_TIMING_RE.search(response.headers.get("Server-Timing", ""))
+        if match:
+            db_ms, queries = float(match.group(1)), int(match.group(2))
+        samples[name].append((elapsed, queries, db_ms, ok))
+
+def run_phase(app: Any, mix: Dict[str, int], dataset: Dict[str, Any], options: Dict[str, Any],
+              threads: int, duration: float) -> Tuple[Dict[str, List[Tuple[float, Optional[int], Optional[float], bool]]], float]:
+    """threads 个线程各用一个 test client 持续发请求 duration 秒，返回 (各接口样本, 实际耗时)"""
+    names = [name for name, weight in mix.items() if weight > 0]
+    weights = [mix[name] for name in names]
+    per_worker = [defaultdict(list) for _ in range(threads)]
+    started = time.perf_counter()
+    deadline = started + duration
+    workers = [
+        threading.Thread(target=_run_worker, args=(app, i, names, weights, dataset, options, deadline, per_worker[i]), daemon=True)
+        for i in range(threads)
+    ]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - started
+    samples: Dict[str, List[Tuple[float, Optional[int], Optional[float], bool]]] = defaultdict(list)
+    for worker_samples in per_worker:
+        for name, items in worker_samples.items():
+            samples[name].extend(items)
+    return samples, elapsed
+
+# ---------- 统计 ----------
+
+def percentile(sorted_values: List[float], p: float) -> float:
+    """最近秩法百分位（sorted_values 已升序）"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(p / 100 * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+def summarize(items: List[Tuple[float, Optional[int], Optional[float], bool]], elapsed: float) -> Dict[str, Any]:
+    latencies = sorted(item[0] * 1000 for item in items)
+    queries = [item[1] for item in items if item[1] is not None]
+    db_times = [item[2] for item in items if item[2] is not None]
+    count = len(items)
+    return {
+        "count": count,
+        "errors": sum(1 for item in items if not item[3]),
+        "rps": round(count / elapsed, 2) if elapsed else 0.0,
+        "mean_ms": round(sum(latencies) / count, 3) if count else 0.0,
+        "p50_ms": round(percentile(latencies, 50), 3),
+        "p95_ms": round(percentile(latencies, 95), 3),
+        "p99_ms": round(percentile(latencies, 99), 3),
+        "max_ms": round(latencies[-1], 3) if latencies else 0.0,
+        "queries_avg": round(sum(queries) / len(queries), 3) if queries else None,
+        "db_ms_avg": round(sum(db_times) / len(db_times), 3) if db_times else None
+    }
+
+def build_results(samples: Dict[str, List[Any]], elapsed: float, meta: Dict[str, Any]) -> Dict[str, Any]:
+    all_items = [item for items in samples.values() for item in items]
+    return {
+        "meta": dict(meta, duration_s=round(elapsed, 3)),
+        "total": summarize(all_items, elapsed),
+        "endpoints": {name: summarize(samples[name], elapsed) for name in sorted(samples)}
+    }
+
+def print_results(results: Dict[str, Any]) -> None:
+    header = f"{'endpoint':<12}{'count':>8}{'errors':>7}{'rps':>9}{'p50_ms':>9}{'p95_ms':>9}{'p99_ms':>9}{'queries':>9}{'db_ms':>9}"
+    print(header)
+    rows = list(results["endpoints"].items()) + [("(total)", results["total"])]
+    for name, stats in rows:
+        queries = "-" if stats["queries_avg"] is None else f"{stats['queries_avg']:.2f}"
+        db_ms = "-" if stats["db_ms_avg"] is None else f"{stats['db_ms_avg']:.2f}"
+        print(f"{name:<12}{stats['count']:>8}{stats['errors']:>7}{stats['rps']:>9.1f}"
+              f"{stats['p50_ms']:>9.2f}{stats['p95_ms']:>9.2f}{stats['p99_ms']:>9.2f}{queries:>9}{db_ms:>9}")
+
+def compare_results(results: Dict[str, Any], baseline: Dict[str, Any], threshold: float) -> List[str]:
+    """与基准结果逐接口对比，返回回归说明（空列表表示没有回归）"""
+    regressions = []
+    for name, stats in results["endpoints"].items():
+        base = baseline.get("endpoints", {}).get(name)
+        if not base:
+            continue
+        if base["p95_ms"] and stats["p95_ms"] > base["p95_ms"] * (1 + threshold):
+            regressions.append(f"{name}: p95 {base['p95_ms']:.2f}ms -> {stats['p95_ms']:.2f}ms")
+        if base["queries_avg"] is not None and stats["queries_avg"] is not None \
+                and stats["queries_avg"] - base["queries_avg"] > 0.5:
+            regressions.append(f"{name}: 平均SQL条数 {base['queries_avg']:.2f} -> {stats['queries_avg']:.2f}")
+        if stats["errors"] > base["errors"]:
+            regressions.append(f"{name}: 错误数 {base['errors']} -> {stats['errors']}")
+    return regressions
+
+# ---------- 命令行 ----------
+
+def parse_mix(text: Optional[str]) -> Dict[str, int]:
+    """--mix "task_board=30,upload=0"：覆盖默认比例中的部分接口"""
+    mix = dict(DEFAULT_MIX)
+    for part in filter(None, (text or "").split(",")):
+        name, _, weight = part.partition("=")
+        if name.strip() not in OPERATIONS or not weight.strip().isdigit():
+            raise argparse.ArgumentTypeError(f"无效的接口比例：{part}（可选接口：{', '.join(OPERATIONS)}）")
+        mix[name.strip()] = int(weight)
+    if not any(mix.values()):
+        raise argparse.ArgumentTypeError("至少需要一个接口的比例大于0")
+    return mix
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="学习小组后端接口压测")
+    parser.add_argument("--mysql-host", default=os.getenv("MYSQL_HOST", "127.0.0.1"))
+    parser.add_argument("--mysql-port", type=int, default=int(os.getenv("MYSQL_PORT", 3306)))
+    parser.add_argument("--mysql-user", default=os.getenv("MYSQL_USER", "root"))
+    parser.add_argument("--mysql-password", default=os.getenv("MYSQL_PASSWORD", ""))
+    parser.add_argument("--database", default="study_group_hub_bench", help="压测库名（会被删除重建，必须包含 bench）")
+    parser.add_argument("--skip-seed", action="store_true", help="复用已有压测库与 --upload-dir 中的文件，不重新生成")
+    parser.add_argument("--upload-dir", help="上传目录（默认使用临时目录，结束后删除）")
+    for key, value in DEFAULT_SCALE.items():
+        parser.add_argument(f"--{key.replace('_', '-')}", type=int, default=value, dest=key)
+    parser.add_argument("--seed", type=int, default=42, help="随机种子（数据生成与请求顺序）")
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--duration", type=float, default=30.0, help="压测秒数")
+    parser.add_argument("--warmup", type=float, default=3.0, help="预热秒数（不计入结果）")
+    parser.add_argument("--mix", type=parse_mix, default=dict(DEFAULT_MIX), help="接口比例，如 task_board=30,upload=0")
+    parser.add_argument("--upload-kb", type=int, default=32, help="上传接口每次上传的文件大小")
+    parser.add_argument("--output", default="bench-results.json", help="结果JSON文件")
+    parser.add_argument("--compare", help="与之对比的基准结果JSON文件")
+    parser.add_argument("--threshold", type=float, default=0.2, help="p95 允许变慢的比例")
+    return parser
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    if "bench" not in args.database:
+        print(f"压测库名必须包含 bench（会被删除重建）：{args.database}")
+        return 2
+    if args.skip_seed and not args.upload_dir:
+        print("--skip-seed 需要同时指定上次生成数据时的 --upload-dir")
+        return 2
+    conn_params = {
+        "host": args.mysql_host, "port": args.mysql_port,
+        "user": args.mysql_user, "password": args.mysql_password
+    }
+    upload_dir = args.upload_dir or tempfile.mkdtemp(prefix="sg-bench-")
+    scale = {key: getattr(args, key) for key in DEFAULT_SCALE}
+    started_at = datetime.now().isoformat(timespec="seconds")
+
+    try:
+        if not args.skip_seed:
+            started = time.perf_counter()
+            create_database(conn_params, args.database)
+            counts = seed_data(conn_params, args.database, scale, upload_dir, args.seed)
+            print(f"数据生成完成（{time.perf_counter() - started:.1f}s）：{counts}")
+        dataset = load_dataset(conn_params, args.database)
+
+        # 应用读取环境变量完成配置，须在导入 app 之前设置
+        os.environ.update({
+            "MYSQL_HOST": args.mysql_host, "MYSQL_PORT": str(args.mysql_port),
+            "MYSQL_USER": args.mysql_user, "MYSQL_PASSWORD": args.mysql_password,
+            "MYSQL_DATABASE": args.database, "UPLOAD_BASE_PATH": upload_dir,
+            "FLASK_DEBUG": "False", "SQL_SERVER_TIMING": "True"
+        })
+        os.environ.setdefault("SQL_METRICS_MODE", "basic")
+        # 压测库已执行全部迁移并写好计数行
+        os.environ.setdefault("PROGRESS_ENABLED", "True")
+        os.environ.setdefault("CHANGES_ENABLED", "True")
+        os.environ.setdefault("DB_POOL_MAX_SIZE", str(max(20, args.threads * 2)))
+        from app import app
+
+        options = {"seed": args.seed, "upload_payload": b"benchmark upload\n" * (args.upload_kb * 1024 // 17 + 1)}
+        if args.warmup > 0:
+            run_phase(app, args.mix, dataset, options, args.threads, args.warmup)
+        samples, elapsed = run_phase(app, args.mix, dataset, options, args.threads, args.duration)
+    finally:
+        if not args.upload_dir:
+            shutil.rmtree(upload_dir, ignore_errors=True)
+
+    results = build_results(samples, elapsed, {
+        "started_at": started_at,
+        "git_commit": _git_commit(),
+        "python": platform.python_version(),
+        "database": args.database,
+        "threads": args.threads,
+        "mix": args.mix,
+        "scale": scale,
+        "seed": args.seed,
+        "sql_metrics_mode": os.environ["SQL_METRICS_MODE"]
+    })
+    print_results(results)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+    print(f"结果已保存：{args.output}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare_results(results, baseline, args.threshold)
+        if regressions:
+            print(f"与 {args.compare} 相比出现回归：")
+            for line in regressions:
+                print(f"  {line}")
+            return 1
+        print(f"与 {args.compare} 相比无回归")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,73 @@
+-- 压测库基础表结构（按各接口使用的列整理；压测时先建这些表，再依次执行 migrations/*.sql）
+-- 仅用于 benchmarks/，不要在线上库执行
+CREATE TABLE sg_user (
+    user_id INT NOT NULL AUTO_INCREMENT PRIMARY KEY,
+    user_name VARCHAR(50) NOT NULL,
+    contact VARCHAR(50) NOT NULL
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+CREATE TABLE sg_course (
+    course_id INT NOT NULL AUTO_INCREMENT PRIMARY KEY,
+    course_name VARCHAR(100) NOT NULL,
+    course_code VARCHAR(20) NOT NULL,
+    semester VARCHAR(20) NOT NULL
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+CREATE TABLE sg_group (
+    group_id INT NOT NULL AUTO_INCREMENT PRIMARY KEY,
+    group_name VARCHAR(100) NOT NULL,
+    course_id INT NOT NULL,
+    create_time DATETIME NOT NULL,
+    KEY idx_group_course (course_id)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+CREATE TABLE sg_user_group (
+    user_id INT NOT NULL,
+    group_id INT NOT NULL,
+    role VARCHAR(20) NOT NULL DEFAULT 'member',
+    permission_level TINYINT NOT NULL DEFAULT 1,
+    join_time DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (user_id, group_id),
+    KEY idx_user_group_group (group_id)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+CREATE TABLE sg_task (
+    task_id INT NOT NULL AUTO_INCREMENT PRIMARY KEY,
+    task_desc VARCHAR(500) NOT NULL,
+    create_time DATETIME NOT NULL,
+    status VARCHAR(10) NOT NULL DEFAULT '待办',
+    complete_time DATETIME NULL DEFAULT NULL,
+    group_id INT NOT NULL,
+    leader_id INT NOT NULL,
+    KEY idx_task_leader (leader_id, group_id)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+CREATE TABLE sg_file (
+    file_id INT NOT NULL AUTO_INCREMENT PRIMARY KEY,
+    original_name VARCHAR(255) NOT NULL,
+    store_name VARCHAR(255) NOT NULL,
+    file_size INT NOT NULL,
+    upload_time DATETIME NOT NULL,
+    group_id INT NOT NULL,
+    uploader_id INT NOT NULL,
+    KEY idx_file_uploader (uploader_id, group_id)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+CREATE TABLE sg_member_stats (
+    user_id INT NOT NULL,
+    group_id INT NOT NULL,
+    total_tasks INT UNSIGNED NOT NULL DEFAULT 0,
+    completed_tasks INT UNSIGNED NOT NULL DEFAULT 0,
+    uploaded_files INT UNSIGNED NOT NULL DEFAULT 0,
+    last_active DATETIME NULL DEFAULT NULL,
+    PRIMARY KEY (user_id, group_id),
+    KEY idx_member_stats_group (group_id)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+CREATE TABLE sg_invitation (
+    invitation_id INT NOT NULL AUTO_INCREMENT PRIMARY KEY,
+    group_id INT NOT NULL,
+    inviter_id INT NOT NULL,
+    invitee_id INT NOT NULL,
+    invite_time DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
@@ -0,0 +1,180 @@
+import os
+import random
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import pymysql
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+SCHEMA_PATH = os.path.join(BENCH_DIR, "schema.sql")
+MIGRATIONS_DIR = os.path.join(os.path.dirname(BENCH_DIR), "migrations")
+
+# 默认数据规模（命令行可覆盖）
+DEFAULT_SCALE = {
+    "users": 500,
+    "courses": 20,
+    "groups": 100,
+    "members_per_group": 8,
+    "tasks_per_group": 50,
+    "files_per_group": 20,
+    "file_size_kb": 64
+}
+
+BATCH_SIZE = 1000
+
+def connect(conn_params: Dict[str, Any], database: Optional[str] = None) -> pymysql.connections.Connection:
+    return pymysql.connect(
+        host=conn_params["host"], port=conn_params["port"], user=conn_params["user"],
+        password=conn_params["password"], database=database, charset="utf8mb4", autocommit=False
+    )
+
+def split_sql(text: str) -> List[str]:
+    """按分号拆分SQL脚本（去掉 -- 注释行；脚本中不含存储过程等带分号的语句体）"""
+    lines = [line for line in text.splitlines() if not line.strip().startswith("--")]
+    return [stmt.strip() for stmt in "\n".join(lines).split(";") if stmt.strip()]
+
+def create_database(conn_params: Dict[str, Any], database: str) -> None:
+    """重建压测库：删除同名库后建表，并按文件名顺序执行 migrations/*.sql"""
+    scripts = [SCHEMA_PATH] + sorted(
+        os.path.join(MIGRATIONS_DIR, name) for name in os.listdir(MIGRATIONS_DIR) if name.endswith(".sql")
+    )
+    conn = connect(conn_params)
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(f"DROP DATABASE IF EXISTS `{database}`")
+            cursor.execute(f"CREATE DATABASE `{database}` DEFAULT CHARSET utf8mb4")
+            cursor.execute(f"USE `{database}`")
+            for path in scripts:
+                with open(path, encoding="utf-8") as f:
+                    for stmt in split_sql(f.read()):
+                        cursor.execute(stmt)
+        conn.commit()
+    finally:
+        conn.close()
+
+def _insert_rows(cursor: Any, sql: str, rows: Sequence[Tuple[Any, ...]]) -> None:
+    """分批多行插入（pymysql 会把 executemany 的 INSERT ... VALUES 合并为一条语句）"""
+    for start in range(0, len(rows), BATCH_SIZE):
+        cursor.executemany(sql, rows[start:start + BATCH_SIZE])
+
+def seed_data(conn_params: Dict[str, Any], database: str, scale: Dict[str, int],
+              upload_dir: str, rng_seed: int = 42) -> Dict[str, int]:
+    """
+    按 scale 生成用户、课程、小组、成员、任务、文件，并写出文件内容到 upload_dir/<group_id>/
+    成员统计与小组进度按生成的数据直接算好写入（与增量维护的结果一致），返回各表行数
+    同一 rng_seed 生成的数据完全相同，便于前后两次压测对比
+    """
+    if scale["members_per_group"] > scale["users"]:
+        raise ValueError("members_per_group 不能大于 users")
+    rng = random.Random(rng_seed)
+    now = datetime.now().replace(microsecond=0)
+
+    users = [(uid, f"用户{uid}", f"138{uid:08d}") for uid in range(1, scale["users"] + 1)]
+    courses = [(cid, f"课程{cid}", f"CS{cid:04d}", "2025-2026-1") for cid in range(1, scale["courses"] + 1)]
+    groups, memberships, tasks, files = [], [], [], []
+    member_counts: Dict[Tuple[int, int], List[int]] = {}
+    progress: Dict[int, List[int]] = {}
+    task_id = file_id = 0
+    for gid in range(1, scale["groups"] + 1):
+        group_time = now - timedelta(days=rng.randint(30, 180))
+        groups.append((gid, f"学习小组{gid}", (gid - 1) % scale["courses"] + 1, group_time))
+        members = rng.sample(range(1, scale["users"] + 1), scale["members_per_group"])
+        for index, uid in enumerate(members):
+            # 第一个成员为创建者（管理员权限），其余为普通成员
+            role, level = ("creator", 2) if index == 0 else ("member", 1)
+            memberships.append((uid, gid, role, level, group_time + timedelta(minutes=index)))
+            member_counts[(uid, gid)] = [0, 0, 0]  # 负责任务数、已完成数、上传文件数
+        progress[gid] = [0, 0]
+        for _ in range(scale["tasks_per_group"]):
+            task_id += 1
+            leader_id = rng.choice(members)
+            create_time = group_time + timedelta(minutes=rng.randint(10, 60 * 24 * 30))
+            done = rng.random() < 0.4
+            tasks.append((
+                task_id, f"任务{task_id}：整理第{rng.randint(1, 16)}周资料", create_time,
+                "完成" if done else "待办", create_time + timedelta(hours=rng.randint(1, 72)) if done else None,
+                gid, leader_id
+            ))
+            member_counts[(leader_id, gid)][0] += 1
+            member_counts[(leader_id, gid)][1] += done
+            progress[gid][0] += 1
+            progress[gid][1] += done
+        for _ in range(scale["files_per_group"]):
+            file_id += 1
+            uploader_id = rng.choice(members)
+            files.append((
+                file_id, f"资料{file_id}.txt", f"{gid}_seed{file_id}.txt", scale["file_size_kb"],
+                group_time + timedelta(minutes=rng.randint(10, 60 * 24 * 30)), gid, uploader_id
+            ))
+            member_counts[(uploader_id, gid)][2] += 1
+
+    conn = connect(conn_params, database)
+    try:
+        with conn.cursor() as cursor:
+            _insert_rows(cursor, "INSERT INTO sg_user (user_id, user_name, contact) VALUES (%s, %s, %s)", users)
+            _insert_rows(cursor, "INSERT INTO sg_course (course_id, course_name, course_code, semester) VALUES (%s, %s, %s, %s)", courses)
+            _insert_rows(cursor, "INSERT INTO sg_group (group_id, group_name, course_id, create_time) VALUES (%s, %s, %s, %s)", groups)
+            _insert_rows(cursor, """
+                INSERT INTO sg_user_group (user_id, group_id, role, permission_level, join_time)
+                VALUES (%s, %s, %s, %s, %s)
+            """, memberships)
+            _insert_rows(cursor, """
+                INSERT INTO sg_task (task_id, task_desc, create_time, status, complete_time, group_id, leader_id)
+                VALUES (%s, %s, %s, %s, %s, %s, %s)
+            """, tasks)
+            _insert_rows(cursor, """
+                INSERT INTO sg_file (file_id, original_name, store_name, file_size, upload_time, group_id, uploader_id)
+                VALUES (%s, %s, %s, %s, %s, %s, %s)
+            """, files)
+            _insert_rows(cursor, """
+                INSERT INTO sg_member_stats (user_id, group_id, total_tasks, completed_tasks, uploaded_files, last_active)
+                VALUES (%s, %s, %s, %s, %s, %s)
+            """, [(uid, gid, *counts, now) for (uid, gid), counts in member_counts.items()])
+            _insert_rows(cursor, """
+                INSERT INTO sg_group_progress (group_id, total_tasks, completed_tasks) VALUES (%s, %s, %s)
+            """, [(gid, total, completed) for gid, (total, completed) in progress.items()])
+        conn.commit()
+    finally:
+        conn.close()
+
+    _write_files(upload_dir, ((gid, store_name) for _, _, store_name, _, _, gid, _ in files), scale["file_size_kb"])
+    return {
+        "users": len(users), "courses": len(courses), "groups": len(groups),
+        "memberships": len(memberships), "tasks": len(tasks), "files": len(files)
+    }
+
+def _write_files(upload_dir: str, entries: Iterable[Tuple[int, str]], size_kb: int) -> None:
+    """写出文件内容（所有文件内容相同，只为下载接口提供真实大小的文件）"""
+    line = "学习小组压测文件 benchmark payload 0123456789\n".encode("utf-8")
+    payload = (line * (size_kb * 1024 // len(line) + 1))[:size_kb * 1024]
+    for gid, store_name in entries:
+        group_dir = os.path.join(upload_dir, str(gid))
+        os.makedirs(group_dir, exist_ok=True)
+        with open(os.path.join(group_dir, store_name), "wb") as f:
+            f.write(payload)
+
+def load_dataset(conn_params: Dict[str, Any], database: str) -> Dict[str, Any]:
+    """读取压测要用到的ID：用户联系方式、成员关系、文件所属小组（复用已有压测库时也从这里取）"""
+    conn = connect(conn_params, database)
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT user_id, contact FROM sg_user")
+            contacts = dict(cursor.fetchall())
+            cursor.execute("SELECT user_id, group_id FROM sg_user_group")
+            memberships = list(cursor.fetchall())
+            cursor.execute("SELECT file_id, group_id FROM sg_file")
+            files = list(cursor.fetchall())
+    finally:
+        conn.close()
+    group_members: Dict[int, List[int]] = defaultdict(list)
+    for uid, gid in memberships:
+        group_members[gid].append(uid)
+    if not memberships or not files:
+        raise ValueError(f"压测库 {database} 中没有成员或文件数据，请先生成数据")
+    return {
+        "contacts": contacts,
+        "memberships": memberships,
+        "group_members": dict(group_members),
+        "files": files
+    }
@@ -0,0 +1,84 @@
+# gunicorn 生产部署配置：gunicorn -c gunicorn.conf.py wsgi:app
+# 多个 worker 进程 × 每进程多个线程（gthread），主进程预加载应用后 fork，worker 处理一定请求数后自动重启
+# 所有参数均可用环境变量覆盖；平滑重启：kill -HUP <主进程pid>（新 worker 就绪后旧 worker 处理完在途请求再退出）
+# 依赖：pip install -r requirements-server.txt（gunicorn、prometheus-client）
+import importlib.util
+import os
+
+# 必须在加载应用之前设置：关闭调试模式；标记 pre-fork 部署（主进程不启动后台线程，见 app/__init__.py）
+os.environ["FLASK_DEBUG"] = "False"
+os.environ["SERVER_PREFORK"] = "True"
+# 多进程指标目录需在加载应用前存在（安装 prometheus-client 并设置 PROMETHEUS_MULTIPROC_DIR 时）
+if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+    os.makedirs(os.environ["PROMETHEUS_MULTIPROC_DIR"], exist_ok=True)
+
+# 事件推送（SSE）：进程内实现（EVENTS_BACKEND=memory，默认）只能推送给同一进程的订阅者，此时默认只启动一个 worker；
+# 多个 worker 需设置 EVENTS_BACKEND=redis 并安装redis，否则启动时报错
+EVENTS_BACKEND = os.getenv("EVENTS_BACKEND", "memory")
+
+# 每个 SSE 连接在 gthread 下占用一个线程，最长 EVENTS_MAX_STREAM_SECONDS 秒：
+# 每个 worker 额外预留 SERVER_EVENT_THREADS 个线程，同时打开的连接数也以此为上限（超出时让客户端稍后重连），
+# 打开任务看板的页面再多也不会占满处理普通请求的 SERVER_THREADS 个线程；须在加载应用之前设置
+EVENT_THREADS = int(os.getenv("SERVER_EVENT_THREADS", 16))
+os.environ.setdefault("EVENTS_MAX_STREAMS", str(EVENT_THREADS))
+
+bind = os.getenv("SERVER_BIND", "127.0.0.1:5000")  # 与 deploy/nginx.conf 的 upstream 一致
+workers = int(os.getenv("SERVER_WORKERS", 0)) or ((os.cpu_count() or 1) if EVENTS_BACKEND == "redis" else 1)
+worker_class = "gthread"
+# 每个 worker 的线程数：普通请求 SERVER_THREADS 个（DB_POOL_MAX_SIZE 不应小于该值；SSE 连接在推送期间不占用数据库连接）+ SSE 预留
+threads = int(os.getenv("SERVER_THREADS", 4)) + EVENT_THREADS
+
+# 预加载：应用只在主进程导入一次，worker 通过 fork 共享只读内存（写时复制）
+# 注意：预加载时修改代码后需重启主进程（kill -HUP 只重新 fork，不重新导入应用代码）
+preload_app = os.getenv("SERVER_PRELOAD", "True") == "True"
+
+# worker 处理 max_requests 个请求后重启（加随机抖动避免同时重启），防止内存缓慢增长
+max_requests = int(os.getenv("SERVER_MAX_REQUESTS", 2000))
+max_requests_jitter = int(os.getenv("SERVER_MAX_REQUESTS_JITTER", 200))
+
+# 平滑重启/停止时等待在途请求（包括大文件上传与下载）完成的最长秒数，超时后强制结束
+# SSE 长连接（/api/group/<id>/events）会一直占用到该时间，客户端随后自动重连到新 worker
+graceful_timeout = int(os.getenv("SERVER_GRACEFUL_TIMEOUT", 120))
+timeout = int(os.getenv("SERVER_TIMEOUT", 60))       # worker 无响应多少秒后被主进程重启（gthread 下由主线程心跳，不受慢请求影响）
+keepalive = int(os.getenv("SERVER_KEEPALIVE", 5))   # nginx 到应用的长连接保持秒数
+
+# 心跳文件放在内存文件系统，避免磁盘繁忙时 worker 被误判超时
+if os.path.isdir("/dev/shm"):
+    worker_tmp_dir = "/dev/shm"
+
+accesslog = os.getenv("SERVER_ACCESS_LOG", "-")
+errorlog = os.getenv("SERVER_ERROR_LOG", "-")
+loglevel = os.getenv("SERVER_LOG_LEVEL", "info")
+proc_name = "studygroup-backend"
+
+
+def on_starting(server):
+    """
+    主进程启动时：
+    - 多个 worker 而事件推送没有跨进程后端时拒绝启动（一个 worker 发布的事件到不了连在其他 worker 上的订阅者）
+    - 清空多进程指标目录中上次运行遗留的文件（worker 在 fork 后各自新建）
+    """
+    if server.cfg.workers > 1:
+        if EVENTS_BACKEND != "redis":
+            raise RuntimeError(f"{server.cfg.workers}个worker进程时事件推送不能使用 EVENTS_BACKEND={EVENTS_BACKEND}："
+                               f"请设置 EVENTS_BACKEND=redis（pip install redis），或设置 SERVER_WORKERS=1")
+        if importlib.util.find_spec("redis") is None:
+            raise RuntimeError("EVENTS_BACKEND=redis 但未安装redis（pip install redis），或设置 SERVER_WORKERS=1")
+    metrics_dir = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+    if metrics_dir:
+        for name in os.listdir(metrics_dir):
+            if name.endswith(".db"):
+                os.remove(os.path.join(metrics_dir, name))
+
+
+def post_fork(server, worker):
+    """每个 worker 初始化自己的连接池与后台线程"""
+    from app.utils.server_utils import init_worker_process
+    init_worker_process()
+
+
+def child_exit(server, worker):
+    """worker 退出后清理其存活类指标（主进程中执行，不导入应用）"""
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)
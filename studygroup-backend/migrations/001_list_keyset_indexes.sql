@@ -0,0 +1,4 @@
+-- 文件/任务列表游标分页索引：WHERE group_id = ? AND (time, id) < (?, ?) ORDER BY time DESC, id DESC
+-- InnoDB 二级索引自带主键，(group_id, time) 即可覆盖排序与游标比较
+ALTER TABLE sg_file ADD INDEX idx_file_group_upload_time (group_id, upload_time);
+ALTER TABLE sg_task ADD INDEX idx_task_group_create_time (group_id, create_time);
@@ -0,0 +1,5 @@
+-- 内容寻址存储：sg_file.content_hash 为文件内容的 SHA-256（十六进制）
+-- 为 NULL 的记录仍按 <BASE_PATH>/<group_id>/<store_name> 读取；非空时读取 <BLOB_PATH>/<hash[0:2]>/<hash[2:4]>/<hash>
+-- 引用计数即 COUNT(*) ... WHERE content_hash = ?，由该索引支撑
+ALTER TABLE sg_file ADD COLUMN content_hash CHAR(64) NULL DEFAULT NULL AFTER file_size;
+ALTER TABLE sg_file ADD INDEX idx_file_content_hash (content_hash);
@@ -0,0 +1,11 @@
+-- 文件搜索倒排索引：一行 = 一个词条在一个文件中的权重（文件名命中 + 正文词频）
+-- 查询：WHERE term IN (...) 按主键前缀范围扫描，JOIN sg_user_group 限定用户所在小组
+-- term 使用二进制排序规则，避免不同字符被排序规则视为相同而冲突主键
+CREATE TABLE IF NOT EXISTS sg_file_term (
+    term VARCHAR(32) CHARACTER SET utf8mb4 COLLATE utf8mb4_bin NOT NULL,
+    group_id INT NOT NULL,
+    file_id INT NOT NULL,
+    weight FLOAT NOT NULL,
+    PRIMARY KEY (term, group_id, file_id),
+    KEY idx_file_term_file (file_id)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
@@ -0,0 +1,21 @@
+-- 小组变更日志（增量同步：GET /api/group/<group_id>/changes?since=<cursor>）
+-- sg_group_change_seq：每个小组一行，last_seq 为已分配的最大序号；写入变更时对该行加锁直到事务提交，
+--   同一小组的序号顺序与提交顺序一致，客户端按序号推进游标不会漏掉晚提交的变更
+--   min_seq 为已清理的最大序号，游标小于它时无法增量同步，客户端需全量刷新
+-- sg_change_log：一行 = 一次实体变更（upsert/delete），按 (group_id, seq) 范围扫描
+CREATE TABLE IF NOT EXISTS sg_group_change_seq (
+    group_id INT NOT NULL PRIMARY KEY,
+    last_seq BIGINT NOT NULL DEFAULT 0,
+    min_seq BIGINT NOT NULL DEFAULT 0
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+CREATE TABLE IF NOT EXISTS sg_change_log (
+    group_id INT NOT NULL,
+    seq BIGINT NOT NULL,
+    entity VARCHAR(16) NOT NULL,
+    entity_id INT NOT NULL,
+    op VARCHAR(8) NOT NULL,
+    change_time DATETIME NOT NULL,
+    PRIMARY KEY (group_id, seq),
+    KEY idx_change_log_time (change_time)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
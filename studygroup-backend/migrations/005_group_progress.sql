@@ -0,0 +1,7 @@
+-- 小组任务进度计数：创建任务/变更状态时在同一事务内按增量更新，/progress 只按主键读一行
+-- 已有小组执行 flask rebuild-progress 回填（未回填的小组在首次查询进度时自动补建）
+CREATE TABLE IF NOT EXISTS sg_group_progress (
+    group_id INT NOT NULL PRIMARY KEY,
+    total_tasks INT UNSIGNED NOT NULL DEFAULT 0,
+    completed_tasks INT UNSIGNED NOT NULL DEFAULT 0
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
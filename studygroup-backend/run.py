@@ -1,9 +1,47 @@
-from app import app
+import os
+import sys
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+def run_production() -> None:
+    """生产模式：用 gunicorn 按 gunicorn.conf.py 启动（多进程 + 多线程，参数见该文件）"""
+    try:
+        from gunicorn.app.wsgiapp import run  # 可选依赖：pip install -r requirements-server.txt（仅支持 Linux/macOS）
+    except ImportError:
+        print("未安装gunicorn，请先运行: pip install -r requirements-server.txt（Windows 下请使用开发模式）")
+        sys.exit(1)
+    # 应用由 gunicorn 在读取配置之后加载，这里不能提前导入 app
+    sys.argv = [sys.argv[0], "-c", os.path.join(BASE_DIR, "gunicorn.conf.py"), "--chdir", BASE_DIR, "wsgi:app"]
+    run()
+
+def run_asgi() -> None:
+    """ASGI 模式：用 uvicorn 启动 asgi:app（参数见 ASGI_CONFIG），适合大量慢速下载/上传的客户端"""
+    try:
+        import uvicorn  # 可选依赖：pip install -r requirements-server.txt
+    except ImportError:
+        print("未安装uvicorn，请先运行: pip install -r requirements-server.txt")
+        sys.exit(1)
+    from app.config import ASGI_CONFIG, EVENTS_CONFIG
+    from app.utils.event_utils import redis
+    if ASGI_CONFIG["WORKERS"] > 1 and (EVENTS_CONFIG["BACKEND"] != "redis" or redis is None):
+        # 进程内事件推送只能送达同一进程的订阅者
+        print("多进程时事件推送需要 EVENTS_BACKEND=redis 并安装redis（pip install redis），或设置 ASGI_WORKERS=1")
+        sys.exit(1)
+    host, _, port = ASGI_CONFIG["BIND"].rpartition(":")
+    # 多进程时 uvicorn 需要按字符串在子进程中导入应用
+    uvicorn.run("asgi:app", host=host or "127.0.0.1", port=int(port), workers=ASGI_CONFIG["WORKERS"],
+                app_dir=BASE_DIR, lifespan="on", proxy_headers=True)
 
 if __name__ == "__main__":
-    # 启动Flask服务（开发环境）
-    app.run(
-        host='0.0.0.0',  # 允许局域网访问
-        port=5000,        # 端口（可修改）
-        debug=app.config['DEBUG']  # 调试模式（生产环境关闭）
-    )
\ No newline at end of file
+    if "--production" in sys.argv[1:]:
+        run_production()
+    elif "--asgi" in sys.argv[1:]:
+        run_asgi()
+    else:
+        from app import app
+        # 启动Flask服务（开发环境）
+        app.run(
+            host='0.0.0.0',  # 允许局域网访问
+            port=5000,        # 端口（可修改）
+            debug=app.config['DEBUG']  # 调试模式（生产环境关闭）
+        )
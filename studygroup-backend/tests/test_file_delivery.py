@@ -0,0 +1,80 @@
+# 文件下载/预览交给前端代理发送（UPLOAD_CONFIG["DELIVERY_MODE"] = x-accel / x-sendfile）时的响应头
+# 不连接数据库：查询文件与成员身份的函数被替换为返回固定记录
+from urllib.parse import quote
+
+import pytest
+
+from app import app
+from app.config import UPLOAD_CONFIG
+import app.file.views as file_views
+
+GROUP_ID = 7
+CONTENT_HASH = 'ab' * 32
+
+@pytest.fixture
+def upload_dir(tmp_path, monkeypatch):
+    """上传目录与内容存储目录指向临时目录，并各放一个文件"""
+    base_path = tmp_path / 'uploads'
+    blob_path = base_path / '.blobs'
+    (base_path / str(GROUP_ID)).mkdir(parents=True)
+    (base_path / str(GROUP_ID) / 'stored.pdf').write_bytes(b'%PDF-1.4 test')
+    (blob_path / CONTENT_HASH[:2] / CONTENT_HASH[2:4]).mkdir(parents=True)
+    (blob_path / CONTENT_HASH[:2] / CONTENT_HASH[2:4] / CONTENT_HASH).write_bytes(b'blob content')
+    monkeypatch.setitem(UPLOAD_CONFIG, 'BASE_PATH', str(base_path))
+    monkeypatch.setitem(UPLOAD_CONFIG, 'BLOB_PATH', str(blob_path))
+    monkeypatch.setitem(UPLOAD_CONFIG, 'DOWNLOAD_CACHE_MAX_AGE', 0)
+    return base_path
+
+def _use_file(monkeypatch, original_name, content_hash=None):
+    file_info = {
+        'file_id': 1, 'original_name': original_name, 'store_name': 'stored.pdf', 'file_size': 1,
+        'content_hash': content_hash, 'group_id': GROUP_ID, 'uploader_id': 1,
+        'is_member': 1, 'member_role': 'member', 'member_permission_level': 1
+    }
+    monkeypatch.setattr(file_views, 'get_file_with_member', lambda file_id, user_id: dict(file_info))
+
+def _assert_offloaded(response, mimetype, disposition):
+    assert response.status_code == 200
+    assert response.mimetype == mimetype
+    assert response.headers['Content-Disposition'] == disposition
+    assert response.cache_control.private
+    assert response.cache_control.max_age == 0
+    assert not response.cache_control.public
+    assert not response.cache_control.no_cache
+    assert response.get_data() == b''
+
+def test_x_accel_download(upload_dir, monkeypatch):
+    monkeypatch.setitem(UPLOAD_CONFIG, 'DELIVERY_MODE', 'x-accel')
+    _use_file(monkeypatch, 'report.pdf')
+    response = app.test_client().get('/api/file/download/1?user_id=1')
+    _assert_offloaded(response, 'application/octet-stream', 'attachment; filename=report.pdf')
+    assert response.headers['X-Accel-Redirect'] == f'/_protected/files/{GROUP_ID}/stored.pdf'
+    assert 'X-Sendfile' not in response.headers
+    assert response.headers['Content-Length'] == '0'
+
+def test_x_accel_blob_with_non_ascii_name(upload_dir, monkeypatch):
+    monkeypatch.setitem(UPLOAD_CONFIG, 'DELIVERY_MODE', 'x-accel')
+    _use_file(monkeypatch, '课程 报告.pdf', content_hash=CONTENT_HASH)
+    response = app.test_client().get('/api/file/download/1?user_id=1')
+    _assert_offloaded(
+        response, 'application/octet-stream',
+        f"attachment; filename=\" .pdf\"; filename*=UTF-8''{quote('课程 报告.pdf')}"
+    )
+    assert response.headers['X-Accel-Redirect'] == (
+        f'/_protected/blobs/{CONTENT_HASH[:2]}/{CONTENT_HASH[2:4]}/{CONTENT_HASH}'
+    )
+
+def test_x_sendfile_preview(upload_dir, monkeypatch):
+    monkeypatch.setitem(UPLOAD_CONFIG, 'DELIVERY_MODE', 'x-sendfile')
+    _use_file(monkeypatch, '报告.pdf')
+    response = app.test_client().get('/api/file/preview/1?user_id=1')
+    _assert_offloaded(response, 'application/pdf', f"inline; filename=.pdf; filename*=UTF-8''{quote('报告.pdf')}")
+    assert response.headers['X-Sendfile'] == str(upload_dir / str(GROUP_ID) / 'stored.pdf')
+    assert 'X-Accel-Redirect' not in response.headers
+
+def test_x_sendfile_download_forces_attachment(upload_dir, monkeypatch):
+    monkeypatch.setitem(UPLOAD_CONFIG, 'DELIVERY_MODE', 'x-sendfile')
+    _use_file(monkeypatch, 'notes.txt')
+    response = app.test_client().get('/api/file/download/1?user_id=1')
+    _assert_offloaded(response, 'application/octet-stream', 'attachment; filename=notes.txt')
+    assert response.headers['X-Sendfile'] == str(upload_dir / str(GROUP_ID) / 'stored.pdf')
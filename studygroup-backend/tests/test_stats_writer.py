@@ -0,0 +1,73 @@
+# 成员统计批量写入：统计行不存在的成员不能把增量当作总数写入
+# 不连接数据库：stats_writer / stats_utils 中的 SQL 函数被替换为按语句返回固定结果
+import pytest
+
+import app.utils.stats_utils as stats_utils
+import app.utils.stats_writer as stats_writer
+
+GROUP_ID = 7
+
+@pytest.fixture
+def sql_log(monkeypatch):
+    """记录执行的SQL；只有 (2, GROUP_ID) 已有统计行，UPDATE 对不存在的行影响0行"""
+    log = []
+    existing = {(2, GROUP_ID)}
+
+    def query_all(sql, params=()):
+        log.append((sql, params))
+        keys = set(zip(params[0::2], params[1::2]))
+        return [{'user_id': user_id, 'group_id': group_id} for user_id, group_id in keys & existing]
+
+    def execute_sql(sql, params=()):
+        log.append((sql, params))
+        if sql.lstrip().startswith('UPDATE'):
+            return True, 1 if (params[-2], params[-1]) in existing else 0
+        return True, 1
+
+    monkeypatch.setattr(stats_writer, 'query_all', query_all)
+    monkeypatch.setattr(stats_writer, 'execute_sql', execute_sql)
+    monkeypatch.setattr(stats_utils, 'execute_sql', execute_sql)
+    return log
+
+def _writer():
+    # 后台线程不在测试期间自动刷盘，只由测试显式调用 flush()
+    return stats_writer.StatsWriter(flush_interval=3600)
+
+def _inserts(log):
+    return [(sql, params) for sql, params in log if sql.lstrip().startswith('INSERT')]
+
+def test_missing_stats_row_is_counted_from_source_tables(sql_log):
+    writer = _writer()
+    writer.submit(1, GROUP_ID, total_tasks=1)
+    assert writer.flush() == 1
+
+    inserts = _inserts(sql_log)
+    assert len(inserts) == 1
+    sql, params = inserts[0]
+    # 走 apply_stats_delta 的 INSERT ... SELECT COUNT(*)，而不是把增量1写成 total_tasks
+    assert 'SELECT COUNT(*) FROM sg_task' in sql
+    assert 'VALUES (%s, %s, %s, %s, %s, NOW())' not in sql
+    assert params[:2] == (1, GROUP_ID)
+
+def test_existing_and_missing_rows_in_one_batch(sql_log):
+    writer = _writer()
+    writer.submit(1, GROUP_ID, uploaded_files=1)
+    writer.submit(2, GROUP_ID, total_tasks=1)
+    writer.submit(2, GROUP_ID, total_tasks=1, completed_tasks=1)
+    assert writer.flush() == 2
+
+    batched = [(sql, params) for sql, params in _inserts(sql_log) if 'VALUES' in sql and 'COUNT' not in sql]
+    assert len(batched) == 1
+    assert batched[0][1] == (2, GROUP_ID, 2, 1, 0)
+    backfilled = [params for sql, params in _inserts(sql_log) if 'COUNT(*)' in sql]
+    assert len(backfilled) == 1 and backfilled[0][:2] == (1, GROUP_ID)
+    assert writer.stats()['queue_depth'] == 0
+
+def test_lookup_failure_requeues_delta(sql_log, monkeypatch):
+    monkeypatch.setattr(stats_writer, 'query_all', lambda sql, params=(): None)
+    writer = _writer()
+    writer.submit(1, GROUP_ID, total_tasks=1)
+    assert writer.flush() == 0
+    assert _inserts(sql_log) == []
+    assert writer.stats()['queue_depth'] == 1
+    assert writer.stats()['failures'] == 1
@@ -0,0 +1,4 @@
+# 生产环境 WSGI 入口：gunicorn -c gunicorn.conf.py wsgi:app（或 python run.py --production）
+from app import app
+
+application = app